@@ -15,75 +15,86 @@ __date__ = "14/04/2020"
 #
 # The results of the Covid questionnaires are in "../../data/raw/covid_questionnaires/week1/covid19-week1-1.dat"
 # this can be changed with the option -d ("--datasources") to specify another path.
+# Several weeks can be given as arguments (files, patterns or directories), e.g. "../../data/raw/covid_questionnaires/week*/*.dat".
+# In this case there is one output file per week ("Medication_use_multiplechoice_week1.tsv", ...).
+# Only the ID and the columns of the hardcoded questions are read from it (see "Pipeline tools/questionnaire_reader.py").
 # 
 
 
 import csv
 import codecs
+import os
+import sys
+import numpy as np
 from optparse import OptionParser
 
-def extractAnswer(name, participants_answers, atc_code):
-    drugs = []  #Empty arry
-    column = 0  #Column of the identifier
-    for question in range(0, len(participants_answers[0])):                         # check each column
-        if participants_answers[0][question] == name:                               # if the column with the answer to the identifier of the question is found
-            #print("found: " + participants_answers[0][question])
-            column+=1
-            for participant in range(1, len(participants_answers)):                 # check each participant (each row), skipping the headers
-                if (participants_answers[participant][question] == "1"):            # the answer is 1 in case the participani takes the drug
-                    #print(participants_answers[participant][question] +" "+ participants_answers[0][question])
-                    drugs.append([participants_answers[participant][0], atc_code])  # in this case we store the PseudoID and the atc code in the drug dictionary
-    if column == 0:                                                                 # if the identifier hasn't been found at all
-        print(name + " not found")                                                  # then this identifier was probably wrong - therefore inform the user
-    return(drugs)                                                                   # return the dictionary
-
-
+#the questionnaire reader is shared by the programs of all steps
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Pipeline tools"))
+import questionnaire_reader
+
+def readHardcodedQuestions(path):
+    # The Column names are hardcoded per question. Since the drug is part of the question, the ATC code is also known.
+    with codecs.open(path, 'r', encoding="iso-8859-1", errors='ignore') as f:
+        contents2 = f.readlines()
+    # Splitting the file:
+    return [line.strip("\n").split("\t") for line in contents2]
+
+def extractAnswers(hardcoded, participants_answers, id_column):
+    names = [row[0] for row in hardcoded]
+    for name in names:
+        if name not in participants_answers:                                        # if the identifier hasn't been found at all
+            print(name + " not found")                                              # then this identifier was probably wrong - therefore inform the user
+    found = [i for i in range(len(names)) if names[i] in participants_answers]
+    atc_codes = np.array([hardcoded[i][1] for i in found], dtype=object)
+
+    # Matrix of the 0/1 flags with one row per hardcoded drug and one column per participant,
+    # the flag is 1 in case the participant takes the drug
+    flags = participants_answers[[names[i] for i in found]].to_numpy(dtype=np.int8).T
+    drug, participant = np.nonzero(flags)                                           # ordered by drug, then by participant
+    ids = participants_answers[id_column].to_numpy(dtype=object)
+    return zip(ids[participant], atc_codes[drug])                                   # the PseudoID and the atc code of each selected drug
+
+def writeResults(path, results):
+    # Write the output file:
+    with open(path, "w") as csvfile:
+        writer = csv.writer(csvfile, delimiter='\t', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(["PSEUDOIDEXT","ATC"])
+        writer.writerows(results)
 
 
 class Extractor:
     def __init__(self):
         # Open file
-        parser = OptionParser()
+        parser = OptionParser(usage="%prog [options] [week files, patterns or directories]")
         parser.add_option("-d", "--datasources", help="use the parameter -d to specify the datasource file")
         (options, args) = parser.parse_args()
 
        #In case no datasource is given the first questionnaire is evaluated instead.
         defaultPath = "../../data/raw/covid_questionnaires/week1/covid19-week1-1.dat"
-        path = defaultPath
+        paths = [defaultPath]
 
         if options.datasources:
-            path = options.datasources
-#            print("loading "+path)
-        # Open file
-        with codecs.open(path, 'r', encoding="iso-8859-1", errors='ignore') as f:
-            contents = f.readlines()
-        f.close
+            paths = [options.datasources]
+        if args:
+            paths = questionnaire_reader.weekFiles(([options.datasources] if options.datasources else []) + args)
 
-        # Splitting the file into columns:
-        for i in range(len(contents)):
-            contents[i] = contents[i].split("\t")
+        hardcoded = readHardcodedQuestions("./hardcoded_ATC_questions_week1-6.tsv")
 
-        # The Column names are hardcoded per question. Since the drug is part of the question, the ATC code is also known.
-        with codecs.open("./hardcoded_ATC_questions_week1-6.tsv", 'r', encoding="iso-8859-1", errors='ignore') as f:
-            contents2 = f.readlines()
-        f.close
+        # One output file, or one per week if several weeks are given (Medication_use_multiplechoice_week1.tsv, ...)
+        outputs = {paths[0]: "./Medication_use_multiplechoice.tsv"}
+        if len(paths) > 1:
+            weeks = questionnaire_reader.weekNames(paths)
+            outputs = {path: "./Medication_use_multiplechoice_" + weeks[path] + ".tsv" for path in paths}
 
-        # Splitting the file:
-        for i in range(len(contents2)):
-            contents2[i] = contents2[i].strip("\n").split("\t")
+        for path in paths:
+            # Open file, only the ID (first column) and the columns of the hardcoded questions are read
+            id_column = questionnaire_reader.readHeader(path)[0]
+            contents = questionnaire_reader.readColumns(path, lambda col: False, [row[0] for row in hardcoded], id_column)
+            print(questionnaire_reader.report())
 
-
-        # Creating a table for the results
-        results=[["PSEUDOIDEXT","ATC"]]
-        for i in range(len(contents2)): #For each hardcoded drug get PSEUDOIDEXT and ATC code 
-            results+=(extractAnswer(contents2[i][0], contents, contents2[i][1]))
-
-        # Write the output file:
-        with open("./Medication_use_multiplechoice.tsv", "w") as csvfile:
-            writer = csv.writer(csvfile, delimiter='\t', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-            writer.writerows(results)
+            # For each hardcoded drug get PSEUDOIDEXT and ATC code
+            writeResults(outputs[path], extractAnswers(hardcoded, contents, id_column))
 
 
 if __name__ == '__main__':
     Extractor()
-
@@ -0,0 +1,101 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This module contains a memo cache for the processed free text answers of extract_drugs4.py.
+#
+# The same answers (e.g., "paracetamol" or "omeprazol 20mg") are given thousands of times per week.
+# The cache stores the result of the cleaning and splitting for each raw answer, so every distinct answer
+# is only processed once - within a question, across the questions and (if a path is given) across the weeks.
+#
+# - The cache holds at most max_size answers. If it gets bigger, the least recently used answers are removed.
+# - With a path the cache is loaded at the start and saved at the end of a run (as pickle file).
+# - With track_new_entries, answers that were added since the cache was loaded can be taken out with take_new_entries() and added to another
+#   cache with update(). This is used to collect the results of the worker processes of batch_extract.py.
+# - With --profile the statistics of each answer (the rules that changed it and the terms they dropped, see rule_profile.py) are
+#   kept with its result, so the cells of answers that come from the cache are counted as well. An answer in the cache without
+#   statistics (processed without --profile) is processed again when they are needed.
+# - The fingerprint identifies the term lists and the program code that produced the results.
+#   A cache file with another fingerprint is not used, since its results could be outdated.
+
+import os
+import pickle
+from collections import OrderedDict
+
+
+class AnswerCache:
+    def __init__(self, path=None, max_size=500000, fingerprint="", track_new_entries=False):
+        self.path = path
+        self.max_size = max_size
+        self.fingerprint = fingerprint
+        self.entries = OrderedDict()
+        self.stats = {}
+        self.track_new_entries = track_new_entries
+        self.new_entries = {}
+        self.hits = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            with open(path, 'rb') as f:
+                stored = pickle.load(f)
+            if stored.get("fingerprint") == fingerprint:
+                self.entries = stored["entries"]
+                self.stats = stored.get("stats", {})
+                self.evict()
+            else:
+                print("The answer cache " + path + " was made with other term lists or another version of the program, it is not used")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def evict(self):
+        #remove the least recently used answers
+        while len(self.entries) > self.max_size:
+            answer, result = self.entries.popitem(last=False)
+            self.stats.pop(answer, None)
+
+    def lookup(self, answers, compute, stats=None):
+        #Returns the result for each answer. Answers that are not in the cache yet are computed and added.
+        #stats: a function that returns the statistics of the answer computed last, they are kept with the result
+        #(answers in the cache without statistics are computed again)
+        results = []
+        for answer in answers:
+            result = self.entries.get(answer)
+            if result is None or (stats is not None and answer not in self.stats):
+                result = compute(answer)
+                self.entries[answer] = result
+                if stats is not None:
+                    self.stats[answer] = stats()
+                if self.track_new_entries:
+                    self.new_entries[answer] = result
+                self.misses += 1
+            else:
+                self.entries.move_to_end(answer)
+                self.hits += 1
+            results.append(result)
+        self.evict()
+        return results
+
+    def take_new_entries(self):
+        new_entries = self.new_entries
+        self.new_entries = {}
+        return new_entries
+
+    def update(self, entries):
+        for answer, result in entries.items():
+            self.entries[answer] = result
+            self.entries.move_to_end(answer)
+        self.evict()
+
+    def save(self):
+        if self.path is None:
+            return
+        #write to a temporary file first, so an interrupted run doesn't leave a broken cache
+        with open(self.path + ".tmp", 'wb') as f:
+            pickle.dump({"fingerprint": self.fingerprint, "entries": self.entries, "stats": self.stats}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.path + ".tmp", self.path)
+
+    def report(self):
+        return "%d answers in cache, %d hits, %d misses" % (len(self.entries), self.hits, self.misses)
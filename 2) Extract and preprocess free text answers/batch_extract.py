@@ -0,0 +1,149 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This program runs the extraction of extract_drugs4.py for many weeks at once.
+#
+# The week files are given as arguments, either as files, as patterns (e.g., "../../data/raw/covid_questionnaires/week*/*.dat")
+# or as directories (all .dat files in the directory are used).
+# Each file is read once. The questions 2-10 of all the weeks are independent from each other, they are processed in parallel
+# by a pool of worker processes (option -p, default: number of CPUs). Every worker loads the term lists, the compiled patterns,
+# the stopwords and the tokenizer only once.
+#
+# The results are written in the same layout as extract_drugs4.py uses, one directory per week:
+# ./extractedColumns4_week1/COVID24A2TXT_column.csv and ./extractedColumns4_week1/anonymous/COVID24A2TXT_column_anonymous.csv
+# The directory name is taken from the week number in the file name (or the whole file name if the week number isn't unique).
+# With the option -o the directories are created somewhere else.
+#
+# With the option --curation-store only the synonyms that are not in the curation store are written into the anonymous files.
+# With the option --spelling the misspelled words of the terms are corrected (see spelling_corrector.py), every worker builds the index once.
+# With the option --without-punkt the answers are tokenized without sentence splitting if the punkt model of NLTK is missing (see resources.py).
+#
+# The processed answers of all workers are collected in the answer cache (see answer_cache.py), so the next run only has to
+# process answers that weren't seen before.
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from optparse import OptionParser
+
+import extract_drugs4
+import resources
+from answer_cache import AnswerCache
+from term_dictionary import TermDictionary
+from extract_drugs4 import questionnaire_reader
+from curation_store import CurationStore
+
+
+def outputDirectories(paths, output):
+    #extractedColumns4_week1 for covid19-week1-1.dat
+    weeks = questionnaire_reader.weekNames(paths)
+    return {path: os.path.join(output, "extractedColumns4_" + weeks[path]) for path in paths}
+
+
+#The cache and the curation store of each worker process
+worker_cache = None
+worker_store = None
+
+def initWorker(cache_path, cache_size, fingerprint, excludefiles, store_path=None, spelling=False, without_punkt=False):
+    global worker_cache, worker_store
+    for termfile in excludefiles:
+        extract_drugs4.exclude_words.extend(TermDictionary.from_file(termfile))
+    if spelling:
+        extract_drugs4.useSpellingCorrection()
+    if without_punkt:
+        resources.allowLineTokenizer()
+    resources.dutch_stopwords()
+    resources.word_tokenizer()
+    #the workers only read the cache file, the main process collects their new answers and saves it
+    worker_cache = AnswerCache(cache_path, cache_size, fingerprint, track_new_entries=True)
+    if store_path:
+        worker_store = CurationStore(store_path)
+
+def extractTask(df, question, output_dir):
+    start = time.time()
+    if worker_store is not None:
+        worker_store.hits = worker_store.misses = 0
+    extract_drugs4.extractQuestion(df, question, worker_cache, output_dir, worker_store)
+    known = (worker_store.hits, worker_store.misses) if worker_store is not None else (0, 0)
+    return output_dir, question, time.time() - start, worker_cache.take_new_entries(), known
+
+
+
+class BatchExtractor:
+    def __init__(self):
+        parser = OptionParser(usage="%prog [options] week files, patterns or directories")
+        parser.add_option("-p","--processes", type="int", default=os.cpu_count(), help="number of worker processes (default: number of CPUs)")
+        parser.add_option("-o","--output", default=".", help="directory for the extractedColumns4_week* directories (default: .)")
+        parser.add_option("-c","--cache", default="./answer_cache.pickle", help="file to keep the processed answers between runs (default: ./answer_cache.pickle)")
+        parser.add_option("--cache-size", type="int", default=500000, help="maximal number of answers in the cache (default: 500000)")
+        parser.add_option("--no-cache", action="store_true", help="don't load or save the answer cache file")
+        parser.add_option("-e","--excludefile", action="append", default=[], help="file with additional words to exclude (one per line), can be used multiple times")
+        parser.add_option("--curation-store", help="write only the synonyms that are not in this curation store into the anonymous files (see curation_store.py)")
+        parser.add_option("--spelling", action="store_true", help="correct misspelled drug and manufacturer names in the terms (see spelling_corrector.py)")
+        parser.add_option("--without-punkt", action="store_true", help="tokenize the answers without sentence splitting if the punkt model of NLTK is missing (the terms can differ from the ones with the model)")
+        (options, args) = parser.parse_args()
+
+        paths = questionnaire_reader.weekFiles(args)
+        if len(paths) == 0:
+            print("please specify the week files")
+            return
+        directories = outputDirectories(paths, options.output)
+        start = time.time()
+
+        for termfile in options.excludefile:
+            extract_drugs4.exclude_words.extend(TermDictionary.from_file(termfile))
+        if options.spelling:
+            extract_drugs4.useSpellingCorrection()
+        if options.without_punkt:
+            resources.allowLineTokenizer()
+        if options.no_cache:
+            cache_path = None
+            fingerprint = ""
+        else:
+            cache_path = options.cache
+            fingerprint = extract_drugs4.cacheFingerprint()
+        cache = AnswerCache(cache_path, options.cache_size, fingerprint)
+
+        known = [0, 0]
+
+        def collect(futures):
+            for future in futures:
+                output_dir, question, seconds, new_entries, (hits, misses) = future.result()
+                cache.update(new_entries)
+                known[0] += hits
+                known[1] += misses
+                print("%s COVID24A%dTXT: %.2f s, %d new answers" % (output_dir, question, seconds, len(new_entries)))
+
+        pending = set()
+        with ProcessPoolExecutor(max_workers=options.processes, initializer=initWorker,
+                                 initargs=(cache_path, options.cache_size, fingerprint, options.excludefile, options.curation_store, options.spelling,
+                                           options.without_punkt)) as pool:
+            for path in paths:
+                #Each week file is read once, the workers get the columns of one question
+                print(path)
+                df = extract_drugs4.readAnswers(path)
+                print(questionnaire_reader.report())
+                output_dir = directories[path]
+                os.makedirs(os.path.join(output_dir, "anonymous"), exist_ok=True)
+                for question in range(2, 11):
+                    columns = ['PSEUDOIDEXT'] + extract_drugs4.questionColumns(df, question)
+                    pending.add(pool.submit(extractTask, df[columns], question, output_dir))
+                #Don't keep more weeks in memory than the workers can handle
+                while len(pending) > 2 * 9 * options.processes:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(pending)
+
+        cache.save()
+        print("Answer cache: %d answers" % len(cache))
+        if options.curation_store:
+            print("Curation store: %d synonyms known, %d new" % (known[0], known[1]))
+        print("%d weeks in %.2f s" % (len(paths), time.time() - start))
+
+
+if __name__ == '__main__':
+    BatchExtractor()
@@ -15,8 +15,8 @@ __date__ = "15/05/2020"
 # - a transformation of the text into lower case 
 # - adding missing spaces after commas
 # - removal/escaping of special and escape characters (tabs, quotes, brackets, semicolon, "--")
-# - a removal of Dutch stop words by using the NLP-toolkit 
-# - a removal of manufacturers names, descriptions and fill words (e.g., “elke dag”, “plus”) based on a list of terms
+# - a removal of Dutch stop words (the list of the NLP-toolkit, shipped in dutch_stopwords.txt)
+# - a removal of manufacturers names, descriptions and fill words (e.g., "elke dag", "plus") based on a list of terms
 # - removal of dosage information, concentrations, volumes (by using regular expressions)
 #   (Using regular expressions on free text may lead to unwanted changes !!!)
 #
@@ -37,53 +37,379 @@ __date__ = "15/05/2020"
 # The second file is anonymized (pseudonomized) since it doesn't contain the participants ID anymore.
 # It is supposed to be loaded into Molgenis SORTA to map the answers to ATC codes. 
 # The first file is to map the results from SORTA back to the participants ID by using the slightly filtered answer as key.
+#
+# With the option --curation-store only the synonyms that were not curated in earlier weeks are written into the anonymous files
+# (see "Pipeline tools/curation_store.py"), the first file still contains all the answers.
+#
+# With the option --chunksize the file is read and processed in parts of this number of rows, and the results are appended
+# to the output files. The memory use then doesn't depend on the size of the file, the output files are the same.
+#
+# With the option --profile the time, the changed cells and the dropped rows of every cleaning rule are measured per question and
+# column, written into a JSON file and shown as a table (see rule_profile.py).
+#
+# With the option --spelling misspelled words of the terms are corrected to the drug names of dbpedia and the SFK and the words
+# of the term lists (see spelling_corrector.py), e.g. "paracetemol" to "paracetamol". The Original answer isn't changed.
+#
+# The tokenizer needs the punkt model of NLTK (the option --download-resources stores it next to this program, see resources.py).
+# Without it the program stops, unless the option --without-punkt is given: the answers are then tokenized without sentence splitting.
+
 
 
 
 
+import time
+startup_begin = time.time()
 
 import csv
 import pandas as pd
 import re
 import numpy as np
-import nltk
-from nltk.corpus import stopwords
-from nltk import word_tokenize
-nltk.download('stopwords')
-nltk.download('punkt')
-dutch_stopwords = set(stopwords.words("dutch"))
+import resources
 manufacturers=[x.lower() for x in ['ACTAVIS', 'APO', 'APOTEX', 'AUR', 'AURO', 'BIPHA', 'BIPHARMA', 'CF', 'DCB ', 'DUMEX', 'FNA ', 'FOC', 'FRES', 'GL', 'HEXAL', 'HIKMA', 'IDYL', 'KABI', 'LEYDEN', 'MDQ', 'MICRON', 'MYL', 'MYLA', 'MYLAN', 'PCH', 'PFIZ', 'PHARBITA', 'PHB', 'RANB', 'RP', 'SAN', 'SANDOZ', 'SDZ', 'TEVA', 'VOGEL', 'WELEDA', 'lilly', 'janssen-cilag', 'ratiopharm','SADOZ', 'dandoz', 'sandox']]
 #other terms consists out of fillwords - they should appear in the Original terms, but not as seperated ones
 other_terms=[x.lower() for x in['ALP', 'BERNA', 'BIOTEST', 'BRIST', 'BROC', 'DEP', 'DRP', 'DU', 'EB', 'EBE', 'EU', 'FA', 'FAULD', 'FIS', 'FLACON', 'FLOS', 'FLX', 'FORTE', 'FRE', 'GF', 'HCL', 'HO', 'HOS', 'HOSP', 'HTP', 'HYDROFIELE', 'ICN', 'INTRAFLEX', 'JC', 'JJC', 'JUB', 'KAR', 'KARIB', 'KATW', 'KRI', 'KRIST', 'KTW', 'KW', 'KWIKPEN', 'LIC', 'MAYNE', 'MEDICINAAL', 'MINIPL', 'MP', 'normaal', 'NOVOL', 'NOVOLET', 'NX', 'OP', 'OPG', 'ora', 'OROS', 'PB', 'PENFILL', 'PHBT', 'PSI', 'RADIX', 'RET', 'RETARD', 'RIVM', 'SM', 'SUDCO', 'TRAM', 'TTS', 'WWSP ', 'conc', 'extract', 'geel', 'dis', 'plus', 'hci', 'hcl', 'tert', 'auto', 'combinatie', 'remmer', 'remmers', 'mono', 'neuro','sun','card','car','pro','hart','med','extra','sterk']]
+#entries that are just application forms
+application_forms=['aerosol', 'applicatievl', 'applicatievloeist', 'applicatievlst', 'applvlst', 'blaassp', 'blaasspoeling', 'bruisgr', 'bruisgran', 'bruisgranulaat', 'bruistab', 'bruistablet', 'capsule', 'concentraat', 'creme', 'dispertabl', 'dragee', 'drank', 'druppels', 'emulsie', 'gel', 'gorgeldrank', 'granulaat', 'huidspray', 'implantaat', 'implantatiestift', 'inf', 'infopl', 'infusievloeistof', 'infusion', 'infuus', 'infvls', 'infvlst', 'inhalatiepoeder', 'inhalatievloeistof/gas', 'inhalatievlst/gas', 'inhalcaps', 'inhpdr', 'inj', 'inj/infopl', 'injectie', 'injectie/infuus', 'injectiepoeder', 'injpdr', 'injsusp', 'injv', 'injvls', 'kauw-/dispertab', 'kauwtab', 'kauwtablet', 'kauwtb', 'klysma', 'lotion', 'mondpasta', 'mondspoeling', 'mondspray', 'neusspray', 'oogdruppel', 'ooginsert', 'oogwassing', 'oogzalf', 'oordr', 'oordrup', 'oordrupp', 'oordruppel', 'oordruppels', 'opl', 'OPLOS', 'oplossing', 'pasta', 'pdr', 'poeder', 'schudmixtuur', 'SIROOP', 'smeersel', 'smelttablet', 'SOLUTAB', 'spoeling', 'spray', 'strooipoeder', 'STROOP', 'SUPP', 'sus', 'susp', 'susp.', 'suspensie', 'tab', 'tablet', 'tabletten', 'tandpasta', 'tinctuur', 'vaginaalcapsule', 'vaginaalcreme', 'vaginaaltablet', 'vernevel', 'vernevelvlst', 'vlst', 'Weefsellijm', 'zalf', 'zetpil', 'zuigtablet', 'OLEOGEL']
 words_to_exclude=[x.lower() for x in['teva', 'accord', 'focus', 'schildklier', 'pd', 'x', 'auro ', 'aurobindo', 'retard', 'foc', 'glenmark', 'glen', 'm/gr', 'glaucoom', 'zonodig', 'microgram', 'ochtend', 'medicijn', 'mcg', 'migraine ', 'profylaxe', 'tegen', 'jicht ', 'pharmathen', 'halve', 'opvliegers', 'allergie', 'pillen', 'van', 'ochtends', 'avonds', 'pompkracht', 'maart', 'mee', 'begonnen', 'hooikoorts', 'i.v.m.', 'eenogigheid', 'ziekte', 'van', 'crohn', 'voor', 'depressie', 'hoge', 'een', 'andere', 'medicatie', 'mijn', 'spiegel', 'was', 'te', 'laag', 'homeopatisch', 'ivm', 'gordelroos', 'om', 'op', 'houden', 'medicijnen', 'hartritme', 'geen', 'idee', 'milli', 'micro', 'gram/ml', 'slijmbeursontsteking', 'hartkloppingen', 'zwangerschap', 'gebruik', 'als', 'onderhoudsmedicatie', 'hoofdpijn', 'migraine', 'plassen', 'middelen', 'weet', 'niet', 'wekelijks', 'bloeddrukverlager', 'houden', 'jeukbestrijding', 'door', 'dermatoloog', 'aangeraden', 'ter', 'voorkoming', 'op', 'voorschrift', 'neuroloog', 'alternatief', 'voor', 'prostaat', 'gewrichten', 'bloeddrukpillen', 'onafhankelijk', 'het', 'preventief', 'heb', 'gehad', 'ritme', 'storing', 'kon', 'ik', 'invullen', 'onderstaande', 'vraag', 'pijnremmers','per', 'dag', 'mylan', 'bloeddruk', 'bloedvaten', 'aurobindo', 'ide','week','elk','nemen','ieder','di e', 'toe','rug','nodig','hom','uur','neus','parkinson','mood','naam','weet','t b v','via','huisarts']]
 
 
+import hashlib
+import os
+import shutil
+import sys
 from optparse import OptionParser
+from normalizer import Normalizer
+from term_dictionary import TermDictionary, TermSplitter
+from answer_cache import AnswerCache
+from rule_profile import NoProfile, RuleProfile
+from spelling_corrector import SpellingCorrector
+
+#the questionnaire reader is shared by the programs of all steps
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Pipeline tools"))
+import questionnaire_reader
+from curation_store import CurationStore
 
 def remove_duplicats_from_list(liste):
     return list( dict.fromkeys(liste) )
 
-def splitItUp(df, name):
-    df["Original"] = df[name]
-    df[name]=df[name].apply(word_tokenize)
-    df[name]=df[name].apply(lambda text: " ".join([x for x in text if x not in dutch_stopwords]))
-    df[name]=df[name].apply(word_tokenize)
-    df[name]=df[name].apply(lambda text: " ".join([x for x in text if x not in manufacturers]))
-    df.columns=['PSEUDOIDEXT', name, "Original"]
-    target_column=name
-    separator=r"(?<!rode)(?<!multi )(?<!multi)(?<!vitamin)(?<!vitamine)(?!<vit)(?!<vit\.)(?<!tert-)(?<!tert)[ \\\/](?!aerosol)(?!applicatievl)(?!applicatievloeist)(?!applicatievlst)(?!applvlst)(?!blaassp)(?!blaasspoeling)(?!bruisgr)(?!bruisgran)(?!bruisgranulaat)(?!bruistab)(?!bruistablet)(?!capsule)(?!caps)(?!chew)(?!concentraat)(?!creme)(?!dispertabl)(?!disp)(?!dsp)(?!dragee)(?!drank)(?!druppels)(?!emulsie)(?!gel)(?!gorgeldrank)(?!granulaat)(?!huidspray)(?!implantaat)(?!implantatiestift)(?!inf)(?!infopl)(?!infusievloeistof)(?!infusion)(?!infuus)(?!infvls)(?!infvlst)(?!inhalatiepoeder)(?!inhalatievloeistof/gas)(?!inhalatievlst/gas)(?!inhalcaps)(?!inhpdr)(?!inj)(?!inj/infopl)(?!injectie)(?!injectie/infuus)(?!injectiepoeder)(?!injpdr)(?!injsusp)(?!injv)(?!injvls)(?!kauw-/dispertab)(?!kauwtab)(?!kauwtablet)(?!kauwtb)(?!klysma)(?!lotion)(?!mondpasta)(?!mondspoeling)(?!mondspray)(?!neusspray)(?!omh tabl)(?!omh)(?!oogdruppel)(?!ooginsert)(?!oogwassing)(?!oogzalf)(?!oordr)(?!oordrup)(?!oordrupp)(?!oordruppel)(?!oog druppels)(?!oordruppels)(?!opl)(?!OPLOS)(?!oplossing)(?!pasta)(?!pdr)(?!pleister)(?!poeder)(?!schudmixtuur)(?!SIROOP)(?!smeersel)(?!smelttablet)(?!SOLUTAB)(?!spoeling)(?!spray)(?!strooipoeder)(?!STROOP)(?!SUPP)(?!sus)(?!susp)(?!susp.)(?!suspensie)(?!tabl omh)(?!tab)(?!tablet)(?!tabletten)(?!tabl)(?!tandpasta)(?!tea)(?!tinctuur)(?!vaginaalcapsule)(?!vaginaalcreme)(?!vaginaaltablet)(?!vernevel)(?!vernevelvlst)(?!vlst)(?!Weefsellijm)(?!zalf)(?!zetpil)(?!zuigtablet)(?!OLEOGEL)"
-    def splitListToRows(row,row_accumulator,target_column,separator):
-        split_row = re.split(separator,row[target_column])
-        for s in split_row:
-            new_row = row.to_dict()
-            new_row[target_column] = s
-            row_accumulator.append(new_row)
-    new_rows = []
-    df.apply(splitListToRows,axis=1,args = (new_rows,target_column,separator))
-    new_df = pd.DataFrame(new_rows)
+#The answers are split into terms at spaces or slashes, except for known word groups (e.g., "vitamine d")
+#and application forms following the drug name
+no_split_after=['rode', 'multi ', 'multi', 'vitamin', 'vitamine', 'tert-', 'tert']
+no_split_before=['aerosol', 'applicatievl', 'applicatievloeist', 'applicatievlst', 'applvlst', 'blaassp', 'blaasspoeling', 'bruisgr', 'bruisgran', 'bruisgranulaat', 'bruistab', 'bruistablet', 'capsule', 'caps', 'chew', 'concentraat', 'creme', 'dispertabl', 'disp', 'dsp', 'dragee', 'drank', 'druppels', 'emulsie', 'gel', 'gorgeldrank', 'granulaat', 'huidspray', 'implantaat', 'implantatiestift', 'inf', 'infopl', 'infusievloeistof', 'infusion', 'infuus', 'infvls', 'infvlst', 'inhalatiepoeder', 'inhalatievloeistof/gas', 'inhalatievlst/gas', 'inhalcaps', 'inhpdr', 'inj', 'inj/infopl', 'injectie', 'injectie/infuus', 'injectiepoeder', 'injpdr', 'injsusp', 'injv', 'injvls', 'kauw-/dispertab', 'kauwtab', 'kauwtablet', 'kauwtb', 'klysma', 'lotion', 'mondpasta', 'mondspoeling', 'mondspray', 'neusspray', 'omh tabl', 'omh', 'oogdruppel', 'ooginsert', 'oogwassing', 'oogzalf', 'oordr', 'oordrup', 'oordrupp', 'oordruppel', 'oog druppels', 'oordruppels', 'opl', 'OPLOS', 'oplossing', 'pasta', 'pdr', 'pleister', 'poeder', 'schudmixtuur', 'SIROOP', 'smeersel', 'smelttablet', 'SOLUTAB', 'spoeling', 'spray', 'strooipoeder', 'STROOP', 'SUPP', 'sus', 'susp', 'susp.', 'suspensie', 'tabl omh', 'tab', 'tablet', 'tabletten', 'tabl', 'tandpasta', 'tea', 'tinctuur', 'vaginaalcapsule', 'vaginaalcreme', 'vaginaaltablet', 'vernevel', 'vernevelvlst', 'vlst', 'Weefsellijm', 'zalf', 'zetpil', 'zuigtablet', 'OLEOGEL']
+
+#Characters at which a second tokenization of already tokenized text can lead to different tokens
+retokenize_chars=re.compile(r"[.?!'\"`:,]")
+
+#The term lists are loaded once into term dictionaries
+manufacturer_set=set(manufacturers)
+splitter=TermSplitter(TermDictionary(no_split_after), TermDictionary(no_split_before))
+exclude_words=TermDictionary([x.strip() for x in words_to_exclude])
+excluded_terms=TermDictionary(application_forms + manufacturers + other_terms)
+normalizer=Normalizer()
+#measures the rules with the option --profile
+profile=NoProfile()
+#corrects the spelling of the terms with the option --spelling
+speller=None
+
+#Answers that stand for an empty answer
+irrelevant_terms=["9999", "8888", " ", ""]
+
+#Filters after splitting
+leading_bracket=re.compile(r'^[\(\/\\]')
+trailing_bracket=re.compile(r'[\)\/\\,]$')
+non_word=re.compile(r'(^-( ?)*$)|(?!-)\W+')
+short_term=re.compile(r'^(\W*)?[a-zA-Z Ã¢]{1,2}?(\W*)?$')
+
+def removeStopwordsAndManufacturers(text, word_tokenize, dutch_stopwords):
+    text = " ".join([x for x in word_tokenize(text) if x not in dutch_stopwords])
+    #Tokenizing the joined tokens again only makes a difference at punctuation marks,
+    #otherwise splitting at the spaces gives the same tokens
+    if retokenize_chars.search(text):
+        tokens = word_tokenize(text)
+    else:
+        tokens = text.split()
+    return " ".join([x for x in tokens if x not in manufacturer_set])
+
+def removeBrackets(term):
+    term = leading_bracket.sub(' ', term)
+    return trailing_bracket.sub(' ', term)
+
+def cleanTerm(term):
+    #Strip whitspaces at beginning and end
+    term = term.strip()
+    #remove words
+    term = profile.apply("exclude words", exclude_words.remove_words, term)
+    #remove words with less than 3 letters
+    term = profile.apply("brackets", removeBrackets, term)
+    term = profile.apply("non word", lambda term: non_word.sub(' ', term).strip(), term)
+    term = profile.apply("short term", lambda term: short_term.sub('', term), term)
+    if speller is not None and term != "":
+        term = profile.apply("spelling", speller.correctTerm, term)
+    return term
+
+def processAnswer(answer):
+    #The whole chain for one raw answer. Returns the slightly filtered answer ("Original") and the terms split from it.
+    #Every rule goes through the profile, which measures it with the option --profile (see rule_profile.py)
+    profile.begin()
+    original = normalizer.normalize(answer, profile)
+    if original in irrelevant_terms:
+        profile.drop("irrelevant answer")
+        profile.end(answer)
+        return (original, ())
+    text = profile.apply("stopwords and manufacturers",
+                         lambda text: removeStopwordsAndManufacturers(text, resources.word_tokenizer(), resources.dutch_stopwords()), original)
+    terms = [cleanTerm(term) for term in profile.apply("split", splitter.split, text)]
+    #Remove empty terms and entries that are just application forms, manufacturers or other terms - fillwords like "plus":
+    kept = tuple(term for term in terms if term != "" and term not in excluded_terms)
+    empty = terms.count("")
+    profile.drop("empty term", empty)
+    profile.drop("excluded terms", len(terms) - empty - len(kept))
+    profile.end(answer)
+    return (original, kept)
+
+def meltQuestion(df, filter_col, name):
+    #Stacks all the text fields of a question into one column (the first field for all participants, then the second, ...)
+    df_qn = df.melt(id_vars=['PSEUDOIDEXT'], value_vars=filter_col, var_name='field', value_name='answer')
+    df_qn = df_qn[['PSEUDOIDEXT', 'answer']]
+    df_qn.columns = ['PSEUDOIDEXT', name]
+    return df_qn
+
+def splitItUp(df, name, cache):
+    #Every distinct answer is processed only once (or taken from the cache),
+    #the results are mapped back to the participants by the integer codes of the answers
+    codes, answers = pd.factorize(df[name])
+    results = cache.lookup(answers, processAnswer, profile.answerStats if profile.measuring else None)
+    originals = np.array([result[0] for result in results], dtype=object)
+    counts = np.array([len(result[1]) for result in results], dtype=np.int64)
+    terms = np.array([term for result in results for term in result[1]], dtype=object)
+    starts = np.cumsum(counts) - counts
+
+    #each term gets its own row: row i of df is repeated once for every term of its answer
+    row_counts = counts[codes]
+    rows = np.repeat(np.arange(len(codes)), row_counts)
+    positions = np.arange(len(rows)) - np.repeat(np.cumsum(row_counts) - row_counts, row_counts)
+    new_df = pd.DataFrame({'PSEUDOIDEXT': df['PSEUDOIDEXT'].to_numpy()[rows],
+                           name: terms[np.repeat(starts[codes], row_counts) + positions],
+                           'Original': originals[codes][rows]})
     print(new_df.head())
+    print("%d answers, %d distinct" % (len(codes), len(answers)))
     return new_df
 
+def cacheFingerprint():
+    #identifies the program code, the term lists and the tokenizer that produced the cached results
+    fingerprint = hashlib.md5()
+    for filename in ["extract_drugs4.py", "normalizer.py", "term_dictionary.py", "resources.py", "answer_cache.py", "rule_profile.py",
+                     "dutch_stopwords.txt"]:
+        with open(os.path.join(resources.resource_dir, filename), 'rb') as f:
+            fingerprint.update(f.read())
+    fingerprint.update("\n".join(exclude_words).encode("utf-8"))
+    fingerprint.update(resources.tokenizer_mode().encode("utf-8"))
+    if speller is not None:
+        fingerprint.update(speller.fingerprint().encode("utf-8"))
+    return fingerprint.hexdigest()
+
+def useSpellingCorrection():
+    #The dictionary contains the drug names and the words of all the term lists (after the exclude files have been added),
+    #the stop words are only protected from changes
+    global speller
+    speller = SpellingCorrector.fromSources(manufacturers + other_terms + application_forms + no_split_after + no_split_before
+                                            + list(exclude_words), resources.dutch_stopwords())
+    return speller
+
+
+
+def potentialColumns():
+    #Specify all the relevant columns that could potentially be in the file:
+    #The ID is there:
+    potential_columns = ['PSEUDOIDEXT']
+    #Question 2-9 have 2 text fields
+    for question in range(2, 10):
+        potential_columns.append(str('COVID24A'+ str(question) +'TXT'))
+        for line in range(1, 3):
+            potential_columns.append(str('COVID24A'+ str(question) +'TXT' + str(line)))
+    #Question 10 is special, it can have a variing amount of text fields
+    for line in range(1, 11):
+        potential_columns.append(str('COVID24A'+ str(10) +'TXT' + str(line)))
+    potential_columns.append(str('COVID24A'+ str(10) +'TXT'))
+    return potential_columns
+
+def readAnswers(path, chunksize=None):
+    #Reading only the columns that exist out of the expected, the ID is stored as category
+    #With a chunksize the file is returned in parts of this number of rows
+    expected = re.compile('|'.join(potentialColumns()))
+    if chunksize:
+        return questionnaire_reader.readChunks(path, lambda col: expected.search(col) is not None, chunksize)
+    return questionnaire_reader.readColumns(path, lambda col: expected.search(col) is not None)
+
+def questionColumns(df, question):
+    #Get all the columns for this question
+    return [col for col in df if col.startswith('COVID24A'+str(question)+"TXT")]
+
+def questionRows(df, filter_col, name, cache):
+    #Create a new dataframe that consists out of 2 Columns: PSEUDOINDEX and the matching column for this question
+    #It contains the answers of all Text field belonging to the actual question
+    df_qn = meltQuestion(df, filter_col, name)
+    #for debugging purpose:
+    #print(df_qn.head())
+
+    profile.question = name
+
+    #Remove rows with empty values
+    df_qn = df_qn.dropna(subset=[name])
+
+    if df_qn.shape[0]==0:
+        profile.countCells(df, filter_col, cache)
+        return None
+
+    #clean the answers, split the whole line into words and remove stopwords
+    #(this also removes irrelevant lines and filters the terms after splitting)
+    df_qn = splitItUp(df_qn, name, cache)
+    profile.countCells(df, filter_col, cache)
+
+    #Remove rows with empty values
+    rows = len(df_qn)
+    df_qn.replace(r'^ ', "", inplace=True)
+    df_qn.replace("", np.nan, inplace=True)
+    df_qn.dropna(how='any', axis=0, inplace=True)
+    profile.countRows("empty rows", rows - len(df_qn))
+    return df_qn
+
+def columnFile(output_dir, question):
+    return os.path.join(output_dir, 'COVID24A'+str(question)+"TXT"+"_column.csv")
+
+def anonymousFile(output_dir, question):
+    return os.path.join(output_dir, "anonymous", 'COVID24A'+str(question)+"TXT"+"_column_anonymous.csv")
+
+def writeColumnFile(df_qn, path, mode="w", header=True):
+    #Saving the File with 3 Columns
+    df_qn.to_csv(path, sep= "\t", index = False, quotechar='"', quoting = csv.QUOTE_MINIMAL, mode=mode, header=header)
+
+def writeAnonymousFile(df_qn_anonymous, path, mode="w", header=True):
+    df_qn_anonymous.to_csv(path, sep= ";", header = header, index = False, quotechar='"', quoting = csv.QUOTE_MINIMAL, mode=mode)
+
+def unknownSynonyms(df_qn_anonymous, store):
+    #Only the synonyms that are not in the curation store go to SORTA
+    if store is None:
+        return df_qn_anonymous
+    return df_qn_anonymous[~store.known(df_qn_anonymous['Synonym'])]
+
+def extractQuestion(df, question, cache, output_dir="./extractedColumns4/", store=None):
+    #Concatenate the answers for the question with and without the PSEUDOINDEX
+    #Removing irrelevant lines and duplicate entries
+    print("Question:COVID24A"+str(question))
+    filter_col = questionColumns(df, question)
+
+    df_qn = questionRows(df, filter_col, 'COVID24A'+str(question)+"TXT", cache)
+    if df_qn is None:
+        print("skipping empty table")
+        return
+
+    #Saving the File with 3 Columns
+    writeColumnFile(df_qn, columnFile(output_dir, question))
+
+    #Taking just the answers
+    #Changing the column head to "Name" because this is a keyword for SORTA.
+    df_qn.columns = ['PSEUDOIDEXT', 'Name', 'Synonym']
+    #Drop the Identifiers
+    df_qn_anonymous = df_qn.drop(columns="PSEUDOIDEXT")
+
+    #Remove duplicates
+    df_qn_anonymous.drop_duplicates(inplace = True)
+
+    #Write the second file
+    writeAnonymousFile(unknownSynonyms(df_qn_anonymous, store), anonymousFile(output_dir, question))
+
+
+class SeenHashes:
+    #The 64 bit hashes of the rows that were already written, kept as a few sorted arrays ("runs"). The new hashes of a part are
+    #a new run, which is merged with the previous run while that one is less than twice as big. So there are only about log2(n)
+    #runs and every hash is merged about log2(n) times, instead of sorting all the hashes again for every part.
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    def contains(self, hashes):
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, hashes), len(run) - 1)
+            found |= run[positions] == hashes
+        return found
+
+    def add(self, hashes):
+        #hashes: new hashes without duplicates
+        if len(hashes) == 0:
+            return
+        self.runs.append(np.sort(hashes))
+        while len(self.runs) > 1 and len(self.runs[-2]) < 2 * len(self.runs[-1]):
+            last = self.runs.pop()
+            self.runs[-1] = np.sort(np.concatenate([self.runs[-1], last]))
+
+
+class QuestionStream:
+    #Streaming version of extractQuestion for files that are read in parts (option --chunksize).
+    #
+    #The results of every part are appended to one temporary file per text field of the question.
+    #finish() concatenates them in the order of the fields, so the _column.csv file is the same as the one of extractQuestion
+    #(which has all the answers of the first text field first, then the ones of the second, ...).
+    #The anonymous file is then written by reading the _column.csv file again in parts. Rows that were already written are
+    #recognized by a 64 bit hash of Name and Synonym, so only the hashes of the distinct rows are kept in memory (see SeenHashes).
+    def __init__(self, question, output_dir="./extractedColumns4/", chunksize=100000, store=None):
+        self.question = question
+        self.store = store
+        self.name = 'COVID24A'+str(question)+"TXT"
+        self.output_dir = output_dir
+        self.chunksize = chunksize
+        self.fields = []
+        self.answers = 0
+        self.empty_part = None
+
+    def partFile(self, field):
+        return columnFile(self.output_dir, self.question) + "." + field + ".part"
+
+    def add(self, df, cache):
+        for field in questionColumns(df, self.question):
+            if field not in self.fields:
+                self.fields.append(field)
+                open(self.partFile(field), 'w').close()
+            df_qn = questionRows(df, [field], self.name, cache)
+            if df_qn is None:
+                continue
+            self.answers += len(df_qn)
+            self.empty_part = df_qn.iloc[:0]
+            writeColumnFile(df_qn, self.partFile(field), mode="a", header=False)
+
+    def finish(self):
+        print("Question:COVID24A"+str(self.question))
+        if self.empty_part is None:
+            print("skipping empty table")
+            for field in self.fields:
+                os.remove(self.partFile(field))
+            return
+
+        #the header, then the parts in the order of the text fields
+        path = columnFile(self.output_dir, self.question)
+        writeColumnFile(self.empty_part, path)
+        with open(path, 'ab') as f:
+            for field in self.fields:
+                with open(self.partFile(field), 'rb') as part:
+                    shutil.copyfileobj(part, f)
+                os.remove(self.partFile(field))
+
+        #Taking just the answers, without duplicates
+        seen = SeenHashes()
+        anonymous = anonymousFile(self.output_dir, self.question)
+        writeAnonymousFile(pd.DataFrame(columns=['Name', 'Synonym']), anonymous)
+        with pd.read_csv(path, sep="\t", dtype=str, na_filter=False, chunksize=self.chunksize) as reader:
+            for df_qn in reader:
+                df_qn.columns = ['PSEUDOIDEXT', 'Name', 'Synonym']
+                df_qn_anonymous = df_qn.drop(columns="PSEUDOIDEXT")
+                hashes = pd.util.hash_pandas_object(df_qn_anonymous, index=False).to_numpy()
+                new = ~pd.Series(hashes).duplicated().to_numpy() & ~seen.contains(hashes)
+                seen.add(hashes[new])
+                writeAnonymousFile(unknownSynonyms(df_qn_anonymous[new], self.store), anonymous, mode="a", header=False)
+        print("%d answers, %d distinct terms and answers" % (self.answers, len(seen)))
 
 
 class Extractor:
@@ -91,6 +417,16 @@ class Extractor:
         # Open file
         parser = OptionParser()
         parser.add_option("-d","--datasources",  help="load the datasource file")
+        parser.add_option("--download-resources", action="store_true", dest="download", help="download the NLTK tokenizer model into the local cache (needs internet access)")
+        parser.add_option("-c","--cache", default="./answer_cache.pickle", help="file to keep the processed answers between runs (default: ./answer_cache.pickle)")
+        parser.add_option("--cache-size", type="int", default=500000, help="maximal number of answers in the cache (default: 500000)")
+        parser.add_option("--no-cache", action="store_true", help="don't load or save the answer cache file")
+        parser.add_option("-e","--excludefile", action="append", help="file with additional words to exclude (one per line), can be used multiple times")
+        parser.add_option("--curation-store", help="write only the synonyms that are not in this curation store into the anonymous files (see curation_store.py)")
+        parser.add_option("--chunksize", type="int", help="read and process the datasource file in parts of this number of rows (for files that don't fit in memory)")
+        parser.add_option("--profile", help="measure the time and the changes of every cleaning rule, write them into this JSON file and show a summary")
+        parser.add_option("--spelling", action="store_true", help="correct misspelled drug and manufacturer names in the terms (see spelling_corrector.py)")
+        parser.add_option("--without-punkt", action="store_true", help="tokenize the answers without sentence splitting if the punkt model of NLTK is missing (the terms can differ from the ones with the model)")
         (options, args) = parser.parse_args()
 
         defaultPath = "../../data/raw/covid_questionnaires/week1/covid19-week1-1.dat"
@@ -100,152 +436,66 @@ class Extractor:
         if options.datasources:
             path=options.datasources
         print(path)
-        #Open file
-        df = pd.read_csv(path, sep="\t", encoding="iso-8859-1", dtype=np.dtype('str'))
-
-        #Specify all the relevant columns that could potentially be in the file:
-        #The ID is there:
-        potential_columns = ['PSEUDOIDEXT']
-        #Question 2-9 have 2 text fields
-        for question in range(2, 10):
-            potential_columns.append(str('COVID24A'+ str(question) +'TXT'))
-            for line in range(1, 3):
-                potential_columns.append(str('COVID24A'+ str(question) +'TXT' + str(line)))
-        #Question 10 is special, it can have a variing amount of text fields
-        for line in range(1, 11):
-            potential_columns.append(str('COVID24A'+ str(10) +'TXT' + str(line)))
-        potential_columns.append(str('COVID24A'+ str(10) +'TXT'))
-
-        #Reading the answers
-        df = pd.read_csv(path, sep="\t", encoding="iso-8859-1", dtype=np.dtype('str'))
-        #Filtering the columns that exist out of the expected
-        df_col = [col for col in df.columns if re.search('|'.join(potential_columns), col)]
-
-        #Data cleaning
-        words = words_to_exclude
-        for x in range(0, len(words)):
-            words[x] = re.escape(words[x].strip()) 
-        #print(words)
-        for col in df_col:
-            #skip the PSEUDOIDEXT column
-            if col in ['PSEUDOIDEXT']:
-                continue
-
-            #use lowercase for all the relevant columns
-            df[col]= df[col].str.lower()
-
-            #add a space after commas without of a space
-            df[col] = df[col].str.replace(r',\w', ', ')
-
-#           #remove special signs and escape characters)
-            spec_chars = ['"',"'","`","\t","--"]
-            for char in spec_chars:
-                df[col] = df[col].str.replace(char, ' ')
-            
-            print("#remove things like volume or weight")
-            df[col] = df[col].replace(to_replace ='(elke( +)?)?\d+((,\d*)|(\.\d*))?( *)?(m?\.?((gram)|(gr)|(g)|(l)))?\.?( *)?\/?( +)?(m?\.?((gram)|(gr)|(g)|(l)))?\.?( +)?(half(e)?)?(pch)?(pcn)?(ie)?(keer)?(kker)?(st)?(st\.)?((( +)?(per\W|x|\*))+)?( +)?((dag)(\w{0,2}))?(p\/d)?(p\/dag)?( +)?(daags)?(dgs)?(dg)?(smorgens)?(savonds)?(\d?( +)?dd( +)?\d?( +)?t?)?(dgs)?( +)?(week)?', value = '', regex = True)
-
-            #replace semicoli with comma, since this is a key for SORTA
-            df[col] = df[col].str.replace(';', ',' , regex = False)
-
-            #remove entries with less than 3 letters
-            df[col] = df[col].str.replace(r'^(\W*)?[a-zA-Z]{0,2}(\W*)?$', '')
-
-            #remove kommas at the end of the line
-            df[col] = df[col].str.replace("(,|( \.))\s*$", "")
-
-            #Strip whitspaces at beginning and end
-            df[col]= df[col].str.strip()
-           
-            #replace multiple Whitespaces
-            df[col] = df[col].str.split().str.join(" ")
-
-            #replace some regex symbols
-            df[col] = df[col].str.replace("()", ' ', regex = False)
-            df[col] = df[col].str.replace("( )", ' ', regex = False)
-            df[col] = df[col].str.replace("( / )", ' ', regex = False)
-            df[col] = df[col].str.replace("+", ' ', regex = False)
-            df[col] = df[col].str.replace("i.v.m.", ' ', regex = False)
-
-        #Concatenate the answers for each questions with and without the PSEUDOINDEX
-        #Removing irrelevant lines and duplicate entries
-        for question in range(2,11):
-            print("Question:COVID24A"+str(question))
-            #Get all the columns for this question
-            filter_col = [col for col in df if col.startswith('COVID24A'+str(question)+"TXT")]
-
-            #Create a new dataframe that consists out of 2 Columns: PSEUDOINDEX and the matching column for this question
-            #It contains the answers of all Text field belonging to the actual question
-            df_qn = pd.DataFrame()
-            for n in range(0, len(filter_col)):
-                df_tmp = df.loc[:,['PSEUDOIDEXT', filter_col[n]]]
-                df_tmp.columns = ['PSEUDOIDEXT', 'COVID24A'+str(question)+"TXT"]
-                df_qn = df_qn.append(df_tmp,  ignore_index=True)
-            #for debugging purpose:
-            #print(df_qn.head())
-
-            # Removing irrelevant lines
-            irrelevant_terms=["9999", "8888", " ", "", np.nan]
-            for term in irrelevant_terms:
-                indexNames = df_qn[df_qn['COVID24A'+ str(question)+ "TXT"] == term ].index
-                df_qn.drop(indexNames, inplace=True)
-
-            #Remove rows with empty values
-            df_qn.dropna(how='any')
-
-            #split the whole line into words and remove stopwords
-            df_qn = splitItUp(df_qn, 'COVID24A'+ str(question)+ "TXT")
-
-            if df_qn.shape[1]==0:
-                print("skipping empty table")
-                continue
-#            print(df_qn.head())
-#           Filter after splitting:
-
-            #Strip whitspaces at beginning and end
-            df_qn['COVID24A'+ str(question)+ "TXT"]= df_qn['COVID24A'+ str(question)+ "TXT"].str.strip()
-
-            #remove words
-            pat = r'\b(?:{})\b'.format('|'.join(words))
-            df_qn['COVID24A'+str(question)+"TXT"] = df_qn['COVID24A'+str(question)+"TXT"].str.replace(pat, '')
-
-            #remove words with less than 3 letters
-            df_qn['COVID24A'+str(question)+"TXT"].replace(r'^[\(\/\\]', ' ', regex=True, inplace=True)
-            df_qn['COVID24A'+str(question)+"TXT"].replace(r'[\)\/\\,]$', ' ', regex=True, inplace=True)
-            df_qn['COVID24A'+str(question)+"TXT"].replace(r'(^-( ?)*$)|(?!-)\W+', ' ', regex=True, inplace=True)
-            df_qn['COVID24A'+str(question)+"TXT"]= df_qn['COVID24A'+str(question)+"TXT"].str.strip()
-            pat=r'^(\W*)?[a-zA-Z Ã¢]{1,2}?(\W*)?$'
-            df_qn["COVID24A"+str(question)+"TXT"] = df_qn['COVID24A'+str(question)+"TXT"].str.replace(pat, '')
-
-            #Remove rows with empty values
-            df_qn.replace(r'^ ', "", inplace=True)
-            df_qn.replace("", np.nan, inplace=True)
-            df_qn.dropna(how='any', axis=0, inplace=True)
-
-            #Remove entries that are just application forms:
-            application_forms = ['aerosol', 'applicatievl', 'applicatievloeist', 'applicatievlst', 'applvlst', 'blaassp', 'blaasspoeling', 'bruisgr', 'bruisgran', 'bruisgranulaat', 'bruistab', 'bruistablet', 'capsule', 'concentraat', 'creme', 'dispertabl', 'dragee', 'drank', 'druppels', 'emulsie', 'gel', 'gorgeldrank', 'granulaat', 'huidspray', 'implantaat', 'implantatiestift', 'inf', 'infopl', 'infusievloeistof', 'infusion', 'infuus', 'infvls', 'infvlst', 'inhalatiepoeder', 'inhalatievloeistof/gas', 'inhalatievlst/gas', 'inhalcaps', 'inhpdr', 'inj', 'inj/infopl', 'injectie', 'injectie/infuus', 'injectiepoeder', 'injpdr', 'injsusp', 'injv', 'injvls', 'kauw-/dispertab', 'kauwtab', 'kauwtablet', 'kauwtb', 'klysma', 'lotion', 'mondpasta', 'mondspoeling', 'mondspray', 'neusspray', 'oogdruppel', 'ooginsert', 'oogwassing', 'oogzalf', 'oordr', 'oordrup', 'oordrupp', 'oordruppel', 'oordruppels', 'opl', 'OPLOS', 'oplossing', 'pasta', 'pdr', 'poeder', 'schudmixtuur', 'SIROOP', 'smeersel', 'smelttablet', 'SOLUTAB', 'spoeling', 'spray', 'strooipoeder', 'STROOP', 'SUPP', 'sus', 'susp', 'susp.', 'suspensie', 'tab', 'tablet', 'tabletten', 'tandpasta', 'tinctuur', 'vaginaalcapsule', 'vaginaalcreme', 'vaginaaltablet', 'vernevel', 'vernevelvlst', 'vlst', 'Weefsellijm', 'zalf', 'zetpil', 'zuigtablet', 'OLEOGEL']
-            df_qn = df_qn[~df_qn['COVID24A'+str(question)+"TXT"].isin(application_forms)]
-
-            #Remove entries that are just manufacturers::
-       	    df_qn = df_qn[~df_qn['COVID24A'+str(question)+"TXT"].isin(manufacturers)]
-
-            #Remove entries that are other terms - fillwords like "plus":
-            df_qn = df_qn[~df_qn['COVID24A'+str(question)+"TXT"].isin(other_terms)]
-
-            #Saving the File with 3 Columns
-            df_qn.to_csv("./extractedColumns4/"+'COVID24A'+str(question)+"TXT"+"_column.csv", sep= "\t", index = False, quotechar='"', quoting = csv.QUOTE_MINIMAL )
-
-            #Taking just the answers
-            #Changing the column head to "Name" because this is a keyword for SORTA.
-            df_qn.columns = ['PSEUDOIDEXT', 'Name', 'Synonym']
-            #Drop the Identifiers
-            df_qn_anonymous = df_qn.drop("PSEUDOIDEXT", 1)
-
-            #Remove duplicates
-            df_qn_anonymous.drop_duplicates(inplace = True)
 
-            #Write the second file
-            df_qn_anonymous.to_csv("./extractedColumns4/anonymous/"+'COVID24A'+str(question)+"TXT"+"_column_anonymous.csv", sep= ";", header = True, index = False, quotechar='"', quoting = csv.QUOTE_MINIMAL )
+        if options.download:
+            resources.download()
+        if options.without_punkt:
+            resources.allowLineTokenizer()
+        print("Startup: %.2f s" % (time.time() - startup_begin))
+
+        #additional words to exclude, loaded once
+        if options.excludefile:
+            for termfile in options.excludefile:
+                exclude_words.extend(TermDictionary.from_file(termfile))
+
+        if options.spelling:
+            useSpellingCorrection()
+
+        #Data cleaning and splitting are done once per distinct answer, the results are kept in the answer cache
+        if options.no_cache:
+            cache = AnswerCache(max_size=options.cache_size)
+        else:
+            cache = AnswerCache(options.cache, options.cache_size, cacheFingerprint())
+
+        store = CurationStore(options.curation_store) if options.curation_store else None
+
+        if options.profile:
+            global profile
+            profile = RuleProfile()
+            #the tokenizer is loaded before, so its loading time isn't counted for the first answer
+            resources.word_tokenizer()
+            resources.dutch_stopwords()
+
+        if options.chunksize:
+            #Streaming: only one part of the file is in memory at a time, the results are appended to the output files
+            streams = [QuestionStream(question, chunksize=options.chunksize, store=store) for question in range(2,11)]
+            for df in readAnswers(path, options.chunksize):
+                for stream in streams:
+                    stream.add(df, cache)
+            print(questionnaire_reader.report())
+            for stream in streams:
+                stream.finish()
+        else:
+            #Open file
+            df = readAnswers(path)
+            print(questionnaire_reader.report())
+
+            for question in range(2,11):
+                extractQuestion(df, question, cache, store=store)
+
+        cache.save()
+        print("Answer cache: " + cache.report())
+        if store is not None:
+            print("Curation store: " + store.report())
+        if speller is not None:
+            print("Spelling: " + speller.report())
+
+        #Time needed to load the stopwords and the tokenizer (on first use)
+        print("Loading of resources: " + resources.report())
+
+        if options.profile:
+            print(profile.summary())
+            profile.save(options.profile)
             
 
 if __name__ == '__main__':
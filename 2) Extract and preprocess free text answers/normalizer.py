@@ -0,0 +1,86 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This module contains the cleaning chain that extract_drugs4.py applies to the free text answers
+# before they are split into terms.
+#
+# Before, every cleaning step was a separate str.replace on the whole column, which means that each
+# column was scanned about 15 times and all the regular expressions were compiled again for every column.
+# The Normalizer compiles all the rules once and runs the whole chain on a single cell in one go.
+#
+# The rules (and their order) are the same as in the former column by column version:
+# - lowercase
+# - a comma directly followed by a letter or digit is replaced by ", " (this also removes that character)
+# - special signs and escape characters are replaced by a space
+# - volumes, weights and dosage information are removed
+# - semicolons are replaced by commas, since the semicolon is the separator for SORTA
+# - entries with less than 3 letters are removed
+# - commas (and " .") at the end of the line are removed
+# - whitespaces at the beginning and end are stripped and multiple whitespaces are replaced
+# - some regex symbols and "i.v.m." are replaced by a space
+#
+# The rules are kept as a list of named functions, so rule_profile.py can measure each of them.
+
+import re
+
+
+#special signs and escape characters
+spec_chars = ['"', "'", "`", "\t", "--"]
+
+#regex symbols that are left over after the removal of the dosage information
+regex_symbols = ["()", "( )", "( / )", "+", "i.v.m."]
+
+#things like volume or weight
+dosage_pattern = r'(elke( +)?)?\d+((,\d*)|(\.\d*))?( *)?(m?\.?((gram)|(gr)|(g)|(l)))?\.?( *)?\/?( +)?(m?\.?((gram)|(gr)|(g)|(l)))?\.?( +)?(half(e)?)?(pch)?(pcn)?(ie)?(keer)?(kker)?(st)?(st\.)?((( +)?(per\W|x|\*))+)?( +)?((dag)(\w{0,2}))?(p\/d)?(p\/dag)?( +)?(daags)?(dgs)?(dg)?(smorgens)?(savonds)?(\d?( +)?dd( +)?\d?( +)?t?)?(dgs)?( +)?(week)?'
+
+
+def replaceAll(text, strings):
+    for string in strings:
+        text = text.replace(string, ' ')
+    return text
+
+
+class Normalizer:
+    def __init__(self):
+        #All patterns are compiled once and reused for every cell
+        self.comma = re.compile(r',\w')
+        self.dosage = re.compile(dosage_pattern)
+        self.short_entry = re.compile(r'^(\W*)?[a-zA-Z]{0,2}(\W*)?$')
+        self.trailing_comma = re.compile(r'(,|( \.))\s*$')
+        #The rules in the order of the chain, with their names for the profile (see rule_profile.py)
+        self.rules = [
+            #use lowercase
+            ("lowercase", str.lower),
+            #add a space after commas without of a space
+            ("comma space", lambda text: self.comma.sub(', ', text)),
+            #remove special signs and escape characters
+            ("special characters", lambda text: replaceAll(text, spec_chars)),
+            #remove things like volume or weight
+            ("dosage", lambda text: self.dosage.sub('', text)),
+            #replace semicoli with comma, since this is a key for SORTA
+            ("semicolon", lambda text: text.replace(';', ',')),
+            #remove entries with less than 3 letters
+            ("short entry", lambda text: self.short_entry.sub('', text)),
+            #remove kommas at the end of the line
+            ("trailing comma", lambda text: self.trailing_comma.sub('', text)),
+            #Strip whitspaces at beginning and end and replace multiple Whitespaces
+            ("whitespace", lambda text: " ".join(text.split())),
+            #replace some regex symbols
+            ("regex symbols", lambda text: replaceAll(text, regex_symbols)),
+        ]
+
+    def normalize(self, text, profile=None):
+        #Missing answers (NaN) stay missing
+        if not isinstance(text, str):
+            return text
+        if profile is None:
+            for name, rule in self.rules:
+                text = rule(text)
+        else:
+            for name, rule in self.rules:
+                text = profile.apply(name, rule, text)
+        return text
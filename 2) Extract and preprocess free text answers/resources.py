@@ -0,0 +1,89 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This module provides the language resources of extract_drugs4.py without any network access.
+#
+# Before, extract_drugs4.py called nltk.download('stopwords') and nltk.download('punkt') every time it was
+# imported, which stalls on processing nodes without internet access.
+# - The Dutch stop words are shipped with this program in dutch_stopwords.txt (the same list as the
+#   "dutch" list of the NLP-toolkit), so NLTK is not needed for them at all.
+# - The tokenizer is only imported on first use. The punkt model is looked up in the normal NLTK data
+#   directories and in the local cache ./nltk_data next to this file. If it isn't there, word_tokenizer()
+#   stops with a LookupError, because without the model the text isn't split into sentences first and the
+#   terms can differ from the ones of a computer with the model. The tokenization without sentence splitting
+#   is only used after allowLineTokenizer() (the option --without-punkt of the programs).
+# - download() fills the local cache. This is the only function that connects to the internet.
+#
+# The time needed to load each resource is stored in "timings".
+
+import codecs
+import os
+import time
+
+resource_dir = os.path.dirname(os.path.abspath(__file__))
+nltk_cache = os.path.join(resource_dir, "nltk_data")
+stopwords_file = os.path.join(resource_dir, "dutch_stopwords.txt")
+
+timings = {}
+loaded = {}
+allow_line_tokenizer = False
+
+
+def dutch_stopwords():
+    if "stopwords" not in loaded:
+        start = time.time()
+        with codecs.open(stopwords_file, 'r', encoding="utf-8") as f:
+            loaded["stopwords"] = set(line.strip() for line in f if line.strip() != "")
+        timings["stopwords"] = time.time() - start
+    return loaded["stopwords"]
+
+
+def word_tokenizer():
+    if "tokenizer" not in loaded:
+        start = time.time()
+        import nltk
+        from nltk import word_tokenize
+        if os.path.isdir(nltk_cache) and nltk_cache not in nltk.data.path:
+            nltk.data.path.append(nltk_cache)
+        try:
+            #loads the punkt model
+            word_tokenize("test.")
+            loaded["tokenizer"] = word_tokenize
+            loaded["tokenizer_mode"] = "punkt"
+        except LookupError:
+            if not allow_line_tokenizer:
+                raise LookupError("The punkt model of NLTK was not found. Use the option --download-resources once to store it in "
+                                  + nltk_cache + ", or the option --without-punkt to tokenize the answers without sentence splitting"
+                                  + " (the terms can differ from the ones with the model).")
+            print("The punkt model of NLTK was not found, the answers are tokenized without sentence splitting (--without-punkt).")
+            loaded["tokenizer"] = lambda text: word_tokenize(text, preserve_line=True)
+            loaded["tokenizer_mode"] = "without sentence splitting"
+        timings["tokenizer"] = time.time() - start
+    return loaded["tokenizer"]
+
+
+def allowLineTokenizer():
+    #Without the punkt model the answers are tokenized without sentence splitting, instead of stopping with an error
+    global allow_line_tokenizer
+    allow_line_tokenizer = True
+
+
+def tokenizer_mode():
+    word_tokenizer()
+    return loaded["tokenizer_mode"]
+
+
+def download(target=nltk_cache):
+    import nltk
+    for package in ['punkt', 'punkt_tab']:
+        nltk.download(package, download_dir=target)
+    loaded.pop("tokenizer", None)
+    loaded.pop("tokenizer_mode", None)
+
+
+def report():
+    return ", ".join(name + ": " + "%.3f s" % seconds for name, seconds in timings.items())
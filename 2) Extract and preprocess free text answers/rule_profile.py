@@ -0,0 +1,204 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This module measures the cleaning rules of extract_drugs4.py (option --profile), to find the rules that take the most time
+# or change the answers in an unexpected way.
+#
+# Every rule of the chain (the rules of the Normalizer, the removal of stopwords and manufacturers, the splitting, the rules for
+# each term and the filters) is run through RuleProfile.apply(), which measures its time and notes whether it changed the text.
+# The chain runs once per distinct answer (see answer_cache.py), so the measuring costs a few timer calls per distinct answer,
+# which is small compared to the tokenizer. NoProfile is used when nothing is measured.
+#
+# For each question and rule:
+# - seconds:          the time the rule needed
+# - answers:          number of distinct answers the rule was applied to
+# - changed answers:  number of distinct answers the rule changed
+# For each question, column (text field) and rule:
+# - changed cells:    number of cells whose answer was changed by the rule
+# - dropped rows:     number of rows that were removed by the rule (empty answers, codes for empty answers, terms that are removed)
+# The statistics of each distinct answer (the rules that changed it and the terms each rule dropped, see answerStats()) are kept
+# with its result in the answer cache. So the cells are counted for every answer, also if it was processed in an earlier question,
+# part of the file (--chunksize) or run, and the memory of the profile doesn't grow with the number of distinct answers (the
+# answer cache has a maximal size). Cells whose answer has no statistics (the answer cache is smaller than the number of distinct
+# answers of a question) are counted as "unmeasured cells".
+# The slowest single applications of a rule are kept with their answer (e.g. a regular expression that backtracks on a long answer).
+#
+# The results can be written as JSON (save()) and shown as a table per rule (summary()).
+
+import heapq
+import json
+import time
+import pandas as pd
+from time import perf_counter
+
+
+class NoProfile:
+    question = None
+    measuring = False
+
+    def begin(self):
+        pass
+
+    def apply(self, rule, function, value):
+        return function(value)
+
+    def drop(self, rule, count=1):
+        pass
+
+    def end(self, answer):
+        pass
+
+    def countCells(self, df, columns, cache):
+        pass
+
+    def countRows(self, rule, dropped):
+        pass
+
+
+class RuleProfile(NoProfile):
+    measuring = True
+
+    def __init__(self, slowest=10):
+        self.rules = []             #the names of the rules in the order of the chain
+        self.bits = {}
+        self.seconds = {}           #(question, rule) -> seconds
+        self.answers = {}           #(question, rule) -> [answers, changed answers]
+        self.cells = {}             #(question, column, rule) -> [changed cells, dropped rows]
+        self.unmeasured = {}        #(question, column) -> cells whose answer has no statistics
+        self.shared = {}            #the statistics of the answers, each distinct one is kept once
+        self.last = ((), ())
+        self.slowest = []           #heap of (seconds, rule, question, answer)
+        self.max_slowest = slowest
+        self.threshold = 0.0        #time of the fastest of the slowest applications (once there are enough)
+        self.start = time.time()
+        self.begin()
+
+    def bit(self, rule):
+        if rule not in self.bits:
+            self.bits[rule] = 1 << len(self.rules)
+            self.rules.append(rule)
+        return self.bits[rule]
+
+    def begin(self):
+        #a new answer: the rules that changed it, the terms that were dropped and the time of each rule
+        self.changed = 0
+        self.dropped = {}
+        self.times = {}
+
+    def apply(self, rule, function, value):
+        start = perf_counter()
+        result = function(value)
+        times = self.times
+        times[rule] = times.get(rule, 0.0) + perf_counter() - start
+        #splitting changes an answer if it gives more than one term
+        if (len(result) > 1) if isinstance(result, list) else (result != value):
+            self.changed |= self.bits.get(rule) or self.bit(rule)
+        return result
+
+    def drop(self, rule, count=1):
+        if count:
+            self.bit(rule)
+            self.dropped[rule] = self.dropped.get(rule, 0) + count
+
+    def end(self, answer):
+        changed = self.changed
+        for rule, seconds in self.times.items():
+            key = (self.question, rule)
+            self.seconds[key] = self.seconds.get(key, 0.0) + seconds
+            counts = self.answers.get(key)
+            if counts is None:
+                counts = self.answers[key] = [0, 0]
+                self.bit(rule)
+            counts[0] += 1
+            if changed & self.bits[rule]:
+                counts[1] += 1
+            if seconds > self.threshold:
+                self.keepSlowest((seconds, rule, str(self.question), answer))
+        stats = (tuple(rule for rule in self.rules if changed & self.bits[rule]), tuple(self.dropped.items()))
+        self.last = self.shared.setdefault(stats, stats)
+
+    def answerStats(self):
+        #The statistics of the answer processed last, kept in the answer cache: the names of the rules that changed it and
+        #the number of terms each rule dropped (names, since the bits of the rules can differ between runs)
+        return self.last
+
+    def keepSlowest(self, entry):
+        if len(self.slowest) < self.max_slowest:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heapreplace(self.slowest, entry)
+        if len(self.slowest) == self.max_slowest:
+            self.threshold = self.slowest[0][0]
+
+    def countCells(self, df, columns, cache):
+        #Adds the cells of each column to the rules that changed or dropped their answers (statistics of the answer cache)
+        for column in columns:
+            values = df[column]
+            empty = int(values.isna().sum())
+            if empty:
+                self.addCells(column, "empty answer", 0, empty)
+            counts = values.value_counts()
+            for answer, count in zip(counts.index, counts.to_numpy()):
+                stats = cache.stats.get(answer)
+                if stats is None:
+                    key = (self.question, column)
+                    self.unmeasured[key] = self.unmeasured.get(key, 0) + int(count)
+                    continue
+                changed, dropped = stats
+                for rule in changed:
+                    self.addCells(column, rule, int(count), 0)
+                for rule, terms in dropped:
+                    self.addCells(column, rule, 0, int(count) * terms)
+
+    def addCells(self, column, rule, changed, dropped):
+        self.bit(rule)
+        counts = self.cells.setdefault((self.question, column, rule), [0, 0])
+        counts[0] += changed
+        counts[1] += dropped
+
+    def countRows(self, rule, dropped):
+        #rows removed from the table of the question after the splitting
+        if dropped:
+            self.addCells(None, rule, 0, dropped)
+
+    def toDict(self):
+        return {
+            "total seconds": time.time() - self.start,
+            "rules": [{"question": question, "rule": rule, "seconds": seconds, "answers": self.answers[(question, rule)][0],
+                       "changed answers": self.answers[(question, rule)][1]} for (question, rule), seconds in self.seconds.items()],
+            "columns": [{"question": question, "column": column, "rule": rule, "changed cells": changed, "dropped rows": dropped}
+                        for (question, column, rule), (changed, dropped) in self.cells.items()],
+            "unmeasured cells": [{"question": question, "column": column, "cells": cells} for (question, column), cells in self.unmeasured.items()],
+            "slowest": [{"seconds": seconds, "rule": rule, "question": question, "answer": answer}
+                        for seconds, rule, question, answer in sorted(self.slowest, reverse=True)],
+        }
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.toDict(), f, indent=1)
+
+    def summary(self):
+        #A table with one line per rule (all questions and columns together) and the slowest answers
+        table = pd.DataFrame(0, index=pd.Index(self.rules, name="rule"), columns=["seconds", "answers", "changed answers", "changed cells", "dropped rows"], dtype=float)
+        for (question, rule), seconds in self.seconds.items():
+            table.loc[rule, "seconds"] += seconds
+            table.loc[rule, ["answers", "changed answers"]] += self.answers[(question, rule)]
+        for (question, column, rule), counts in self.cells.items():
+            table.loc[rule, ["changed cells", "dropped rows"]] += counts
+        total = max(table["seconds"].sum(), 1e-9)
+        lines = ["%-28s %9s %6s %9s %9s %13s %12s" % ("rule", "seconds", "%", "answers", "changed", "changed cells", "dropped rows")]
+        for rule, row in table.iterrows():
+            lines.append("%-28s %9.3f %5.1f%% %9d %9d %13d %12d" % (rule, row["seconds"], 100 * row["seconds"] / total, row["answers"],
+                         row["changed answers"], row["changed cells"], row["dropped rows"]))
+        unmeasured = sum(self.unmeasured.values())
+        if unmeasured:
+            lines.append("%d cells are not counted, their answers were removed from the answer cache before (use a bigger --cache-size)" % unmeasured)
+        if self.slowest:
+            lines.append("slowest rule applications:")
+            for seconds, rule, question, answer in sorted(self.slowest, reverse=True):
+                lines.append("  %8.4f s  %-22s %-14s %r" % (seconds, rule, question, answer[:80]))
+        return "\n".join(lines)
@@ -0,0 +1,186 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This module corrects misspelled words of the terms of extract_drugs4.py (option --spelling), e.g. "paracetamoll" or "sandox".
+#
+# Before, misspellings were only handled by listing the variants in the term lists (e.g. 'SADOZ', 'dandoz', 'sandox' for Sandoz).
+# Other misspelled drug names went to SORTA, got a low score and had to be reviewed by hand.
+#
+# The dictionary contains the words of the drug names of "dbpedia_corrected.tsv" (Dutch names and English labels), of the products
+# of the SFK ("ATC_codes_from_sfk.xlsx"), of the names of all ATC codes ("Preferred Label" of "Nice to get an overview/ATC Levels.xlsx",
+# the Excel files are read through "Pipeline tools/workbook_cache.py") and of the term lists of extract_drugs4.py (manufacturers,
+# application forms, fill words, words to exclude). Without the ATC names valid drug names that are missing in dbpedia and the SFK
+# were "corrected" into other drugs with other ATC codes (e.g. "tolonidine" into "clonidine", "mosapride" into "cisapride"). The number of times a word appears in the sources is its
+# frequency. The stop words are known words: they are not changed, but no other word is changed into a stop word
+# (e.g. "weken" would become "wezen").
+#
+# Index (symmetric delete): every word of the dictionary is stored under all the strings that result from deleting up to
+# 1 or 2 of its letters. A word of an answer is looked up with its own deletes, so only the few words that share a delete
+# are compared with it (Damerau-Levenshtein distance, a swap of two letters counts as one edit). The time per word doesn't
+# depend on the size of the dictionary.
+#
+# Rules:
+# - words of the dictionary, known words, words with digits and words shorter than 5 letters are not changed
+# - words with 5-8 letters are corrected with 1 edit, longer words with up to 2 edits
+# - the word with the smallest distance wins, then the most frequent one. If two words are equally good, nothing is changed.
+# The corrections are kept in a cache (every distinct word is looked up once per run), report() shows the numbers.
+
+import codecs
+import collections
+import hashlib
+import os
+import re
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "..", "Pipeline tools"))
+from workbook_cache import WorkbookCache
+
+datasources_dir = os.path.join(script_dir, "..", "Datasources used to create Ontology")
+dbpedia_file = os.path.join(datasources_dir, "Dbpedia (Dutch)", "dbpedia_corrected.tsv")
+sfk_file = os.path.join(datasources_dir, "Original data from sfk (uncurated)", "ATC_codes_from_sfk.xlsx")
+atc_levels_file = os.path.join(script_dir, "..", "Nice to get an overview", "ATC Levels.xlsx")
+
+word_pattern = re.compile(r"[^\W\d_]+")
+token_pattern = re.compile(r"\w+")
+
+
+def readDbpediaWords(path=dbpedia_file):
+    #The words of the Dutch names and the English labels
+    words = []
+    with codecs.open(path, 'r', encoding="utf-8-sig") as f:
+        header = f.readline().rstrip("\r\n").split("\t")
+        columns = [header.index("Name"), header.index("label")]
+        for line in f:
+            row = line.rstrip("\r\n").split("\t")
+            for column in columns:
+                if column < len(row):
+                    words += word_pattern.findall(row[column].strip('"').lower())
+    return words
+
+def readExcelWords(path, column, sheet_name=0):
+    words = []
+    for label in WorkbookCache.open(path).sheet(sheet_name).column(column):
+        if label is not None:
+            words += word_pattern.findall(str(label).lower())
+    return words
+
+def readSfkWords(path=sfk_file):
+    return readExcelWords(path, "GPK Omschrijving")
+
+def readAtcLevelsWords(path=atc_levels_file):
+    #The words of the names of the ATC codes (the English INNs)
+    return readExcelWords(path, "Preferred Label", "Tabelle1")
+
+def deletes(word, distance):
+    #All the strings made by deleting up to "distance" letters of the word (including the word)
+    result = {word}
+    current = {word}
+    for i in range(distance):
+        current = {text[:position] + text[position + 1:] for text in current for position in range(len(text))}
+        result |= current
+    return result
+
+def editDistance(first, second, limit):
+    #Damerau-Levenshtein distance (optimal string alignment), limit + 1 if it is bigger than the limit
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    before = None
+    previous = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        current = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+class SpellingCorrector:
+    def __init__(self, words=(), known=()):
+        self.frequencies = collections.Counter()
+        self.known = set(known)
+        self.index = {}         #delete -> words of the dictionary
+        self.cache = {}         #word -> correction
+        self.corrected = 0
+        self.extend(words)
+
+    @classmethod
+    def fromSources(cls, terms=(), known=(), dbpedia_path=dbpedia_file, sfk_path=sfk_file, atc_levels_path=atc_levels_file):
+        #The drug names of dbpedia, the SFK and the ATC codes and the words of the term lists
+        words = readDbpediaWords(dbpedia_path) + readSfkWords(sfk_path) + readAtcLevelsWords(atc_levels_path)
+        for term in terms:
+            words += word_pattern.findall(term.lower())
+        return cls(words, [word.lower() for word in known])
+
+    @staticmethod
+    def maxDistance(length):
+        return 0 if length < 5 else 1 if length < 9 else 2
+
+    def extend(self, words):
+        new = [word for word in words if word not in self.frequencies]
+        self.frequencies.update(words)
+        for word in dict.fromkeys(new):
+            for text in deletes(word, self.maxDistance(len(word))):
+                self.index.setdefault(text, []).append(word)
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.frequencies)
+
+    def correctWord(self, word):
+        #The word of the dictionary for a misspelled word, otherwise the word itself
+        correction = self.cache.get(word)
+        if correction is None:
+            correction = self.cache[word] = self.lookup(word)
+            if correction != word:
+                self.corrected += 1
+        return correction
+
+    def lookup(self, word):
+        lower = word.lower()
+        distance = self.maxDistance(len(lower))
+        if distance == 0 or lower in self.frequencies or lower in self.known or not lower.isalpha():
+            return word
+        best = []
+        best_distance = distance + 1
+        for candidate in set(match for text in deletes(lower, distance) for match in self.index.get(text, ())):
+            limit = min(best_distance, min(distance, self.maxDistance(len(candidate))))
+            found = editDistance(lower, candidate, limit)
+            if found > limit:
+                continue
+            if found < best_distance:
+                best, best_distance = [candidate], found
+            else:
+                best.append(candidate)
+        if not best:
+            return word
+        best.sort(key=lambda candidate: -self.frequencies[candidate])
+        if len(best) > 1 and self.frequencies[best[0]] == self.frequencies[best[1]]:
+            return word
+        return best[0]
+
+    def correctTerm(self, term):
+        #Corrects every word of a term, the rest of the term stays as it is
+        return token_pattern.sub(lambda match: self.correctWord(match.group(0)), term)
+
+    def fingerprint(self):
+        #identifies the dictionary (for the answer cache of extract_drugs4.py)
+        fingerprint = hashlib.md5()
+        for word in sorted(self.frequencies):
+            fingerprint.update(("%s\t%d\n" % (word, self.frequencies[word])).encode("utf-8"))
+        fingerprint.update("\n".join(sorted(self.known)).encode("utf-8"))
+        with open(os.path.abspath(__file__), 'rb') as f:
+            fingerprint.update(f.read())
+        return fingerprint.hexdigest()
+
+    def report(self):
+        return "%d words in the dictionary, %d distinct words looked up, %d corrected" % (len(self), len(self.cache), self.corrected)
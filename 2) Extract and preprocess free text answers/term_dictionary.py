@@ -0,0 +1,136 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This module contains the term lists engine used by extract_drugs4.py.
+#
+# Before, the words to exclude were removed with one big regular expression (\b(?:word1|word2|...)\b)
+# and the answers were split with a regular expression containing more than 100 lookaheads.
+# Both have to test every term of the list at every position of the text, so the time grows with
+# the number of terms times the length of the text.
+#
+# A TermDictionary stores the terms in sets grouped by their length. Looking up whether a term starts
+# or ends at a certain position of a text is therefore a handful of set lookups, no matter how many terms
+# are in the list. The terms are loaded once (from a list or a file with one term per line).
+#
+# The matching rules are the same as the ones of the former regular expressions:
+# - remove_words() removes the terms at word boundaries. If several terms match at the same position,
+#   the one listed first wins (like in a regex alternation).
+# - TermSplitter.split() splits at spaces and (back)slashes, unless the text before the separator ends
+#   with a term of no_split_after or the text after the separator starts with a term of no_split_before.
+
+import codecs
+import re
+
+
+def isWordCharacter(char):
+    #same definition as \w in regular expressions
+    return char.isalnum() or char == '_'
+
+def isWordBoundary(text, position):
+    #same definition as \b in regular expressions
+    before = position > 0 and isWordCharacter(text[position - 1])
+    after = position < len(text) and isWordCharacter(text[position])
+    return before != after
+
+
+class TermDictionary:
+    def __init__(self, terms=()):
+        self.terms = {}         #term -> position in the list (the first one wins)
+        self.by_length = {}     #length -> set of terms with this length
+        self.lengths = []
+        self.extend(terms)
+
+    @classmethod
+    def from_file(cls, path, encoding="iso-8859-1"):
+        #Reads a file with one term per line, empty lines are skipped
+        with codecs.open(path, 'r', encoding=encoding) as f:
+            terms = [line.strip() for line in f]
+        return cls([term for term in terms if term != ""])
+
+    def extend(self, terms):
+        for term in terms:
+            if term == "" or term in self.terms:
+                continue
+            self.terms[term] = len(self.terms)
+            self.by_length.setdefault(len(term), set()).add(term)
+        self.lengths = sorted(self.by_length)
+        return self
+
+    def __contains__(self, term):
+        return term in self.terms
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def startswith_term(self, text, position):
+        #True if one of the terms starts at the position of the text
+        for length in self.lengths:
+            if position + length > len(text):
+                break
+            if text[position:position + length] in self.by_length[length]:
+                return True
+        return False
+
+    def endswith_term(self, text, position):
+        #True if one of the terms ends right before the position of the text
+        for length in self.lengths:
+            if length > position:
+                break
+            if text[position - length:position] in self.by_length[length]:
+                return True
+        return False
+
+    def remove_words(self, text):
+        #Removes all the terms that start and end at a word boundary
+        if not isinstance(text, str):
+            return text
+        pieces = []
+        start = 0
+        for boundary in word_boundaries.finditer(text):
+            position = boundary.start()
+            if position < start:
+                continue
+            best = None
+            for length in self.lengths:
+                end = position + length
+                if end > len(text):
+                    break
+                rank = self.terms.get(text[position:end])
+                if rank is not None and (best is None or rank < best[0]) and isWordBoundary(text, end):
+                    best = (rank, end)
+            if best is not None:
+                pieces.append(text[start:position])
+                start = best[1]
+        if start == 0:
+            return text
+        pieces.append(text[start:])
+        return "".join(pieces)
+
+
+class TermSplitter:
+    def __init__(self, no_split_after, no_split_before, separators=" \\/"):
+        self.no_split_after = no_split_after
+        self.no_split_before = no_split_before
+        self.separators = re.compile("[" + re.escape(separators) + "]")
+
+    def split(self, text):
+        pieces = []
+        start = 0
+        for separator in self.separators.finditer(text):
+            position = separator.start()
+            if self.no_split_after.endswith_term(text, position) or self.no_split_before.startswith_term(text, position + 1):
+                continue
+            pieces.append(text[start:position])
+            start = position + 1
+        pieces.append(text[start:])
+        return pieces
+
+
+word_boundaries = re.compile(r'\b')
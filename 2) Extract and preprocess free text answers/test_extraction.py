@@ -0,0 +1,156 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# Checks that the extraction of extract_drugs4.py gives the same results as the former version:
+# - TermDictionary.remove_words() against the former regular expression \b(?:word1|word2|...)\b (the first listed term wins)
+# - TermSplitter.split() against the former regular expression with a lookbehind for every term of no_split_after and a
+#   lookahead for every term of no_split_before
+# - processAnswer() on answers with dosages, word groups, manufacturers, codes for empty answers, ... (the expected results are
+#   the ones of the former column by column version)
+# - the output files of the streaming mode (--chunksize) are the same as the ones of the file read at once
+# Without the punkt model of NLTK the answers are tokenized without sentence splitting (like the option --without-punkt),
+# the answers of the tests have no sentences.
+# Run with: python -m pytest "2) Extract and preprocess free text answers/test_extraction.py"
+
+import os
+import re
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Pipeline tools"))
+import numpy as np
+import pytest
+import extract_drugs4
+import resources
+import synthetic_data
+from answer_cache import AnswerCache
+from term_dictionary import TermDictionary, TermSplitter
+
+
+@pytest.fixture(autouse=True)
+def tokenizer():
+    try:
+        resources.word_tokenizer()
+    except LookupError:
+        resources.allowLineTokenizer()
+
+
+def randomTexts(words, count, seed=0):
+    #texts made of the terms, parts of them, other words and separators
+    rng = np.random.default_rng(seed)
+    pieces = list(words) + [word[:-1] for word in words if len(word) > 2] + ["paracetamol", "d", "b12", "500mg", "-", "(", ")", "x2"]
+    separators = [" ", "  ", "/", "\\", ", ", "-", ""]
+    texts = []
+    for i in range(count):
+        text = pieces[rng.integers(len(pieces))]
+        for j in range(int(rng.integers(0, 5))):
+            text += separators[rng.integers(len(separators))] + pieces[rng.integers(len(pieces))]
+        texts.append(text)
+    return texts
+
+
+#TermDictionary
+
+def test_remove_words_first_listed_term_wins():
+    assert TermDictionary(["ab", "ab c"]).remove_words("x ab c d") == "x  c d"
+    assert TermDictionary(["ab c", "ab"]).remove_words("x ab c d") == "x  d"
+    assert TermDictionary(["van"]).remove_words("vanaf van") == "vanaf "
+    assert TermDictionary(["i.v.m."]).remove_words("i.v.m. pijn") == "i.v.m. pijn"
+
+def test_remove_words_like_the_regular_expression():
+    words = [word.strip() for word in extract_drugs4.words_to_exclude]
+    former = re.compile(r'\b(?:{})\b'.format('|'.join(re.escape(word) for word in words)))
+    for text in randomTexts(words, 3000):
+        assert extract_drugs4.exclude_words.remove_words(text) == former.sub('', text), text
+
+
+#TermSplitter
+
+def formerSeparator():
+    return re.compile("".join("(?<!%s)" % re.escape(term) for term in extract_drugs4.no_split_after) + r"[ \\\/]"
+                      + "".join("(?!%s)" % re.escape(term) for term in extract_drugs4.no_split_before))
+
+def test_split_word_groups():
+    split = extract_drugs4.splitter.split
+    assert split("vitamine d") == ["vitamine d"]
+    assert split("multi vitamine") == ["multi vitamine"]
+    assert split("multi  vitamine") == ["multi  vitamine"]
+    assert split("tert-/butyl") == ["tert-/butyl"]
+    assert split("omeprazol tablet") == ["omeprazol tablet"]
+    assert split("timolol oog druppels") == ["timolol oog druppels"]
+    assert split("paracetamol\\inj/infopl") == ["paracetamol\\inj/infopl"]
+    assert split("ibuprofen/diclofenac zalf") == ["ibuprofen", "diclofenac zalf"]
+    assert split("vitamine d3 calcium") == ["vitamine d3", "calcium"]
+    assert split(" calcium ") == ["", "calcium", ""]
+
+def test_split_like_the_regular_expression():
+    former = formerSeparator()
+    for text in randomTexts(extract_drugs4.no_split_after + extract_drugs4.no_split_before, 3000, seed=1):
+        assert extract_drugs4.splitter.split(text) == former.split(text), text
+
+def test_split_with_own_terms():
+    splitter = TermSplitter(TermDictionary(["ab"]), TermDictionary(["cd", "c d"]))
+    assert splitter.split("ab x y cd z c d") == ["ab x", "y cd", "z c", "d"]
+    assert splitter.split("ab/ab\\cd") == ["ab/ab\\cd"]
+
+
+#processAnswer
+
+@pytest.mark.parametrize("answer, original, terms", [
+    ("Paracetamol 500mg, Omeprazol 20 mg", "paracetamol , omeprazol", ("paracetamol", "omeprazol")),
+    ("vitamine d en multi vitamine", "vitamine d en multi vitamine", ("vitamine d", "multi vitamine")),
+    ("omeprazol tablet sandoz", "omeprazol tablet sandoz", ("omeprazol tablet",)),
+    ("9999", "", ()),
+    ("  ", "", ()),
+    ("a", "", ()),
+    ("Ibuprofen/diclofenac zalf", "ibuprofen/diclofenac zalf", ("ibuprofen", "diclofenac zalf")),
+    ("metoprolol 2 dd 1 i.v.m. hoofdpijn", "metoprolol   hoofdpijn", ("metoprolol",)),
+    ("Salbutamol (sinds maart); Seretide", "salbutamol (sinds maart), seretide", ("salbutamol", "sinds", "seretide")),
+    ("Levothyroxine 50 microgram + calcium", "levothyroxine microgram   calcium", ("levothyroxine", "calcium")),
+    ("tert-butyl\\aspirine", "tert-butyl\\aspirine", ("tert-butyl", "aspirine")),
+    ("oog druppels latanoprost", "oog druppels latanoprost", ("oog druppels", "latanoprost")),
+    ("paracetamol teva 1000mg 3 x daags", "paracetamol teva", ("paracetamol",)),
+    ("Vitamin B12 injectie", "vitamin binjectie", ("vitamin binjectie",)),
+    ("geen idee", "geen idee", ()),
+])
+def test_processAnswer(answer, original, terms):
+    assert extract_drugs4.processAnswer(answer) == (original, terms)
+
+
+#Streaming
+
+def outputFiles(output_dir):
+    files = {}
+    for question in range(2, 11):
+        for path in [extract_drugs4.columnFile(output_dir, question), extract_drugs4.anonymousFile(output_dir, question)]:
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    files[os.path.relpath(path, output_dir)] = f.read()
+    return files
+
+def test_chunksize_gives_the_same_files(tmp_path):
+    week_file = str(tmp_path / "week.dat")
+    synthetic_data.QuestionnaireGenerator(seed=3, pool_size=300).writeWeek(week_file, 2000, extra_columns=5)
+    whole, parts = str(tmp_path / "whole"), str(tmp_path / "parts")
+    for output_dir in [whole, parts]:
+        os.makedirs(os.path.join(output_dir, "anonymous"))
+
+    df = extract_drugs4.readAnswers(week_file)
+    cache = AnswerCache()
+    for question in range(2, 11):
+        extract_drugs4.extractQuestion(df, question, cache, whole)
+
+    streams = [extract_drugs4.QuestionStream(question, parts, chunksize=150) for question in range(2, 11)]
+    cache = AnswerCache()
+    for df in extract_drugs4.readAnswers(week_file, 150):
+        for stream in streams:
+            stream.add(df, cache)
+    for stream in streams:
+        stream.finish()
+
+    expected = outputFiles(whole)
+    assert len(expected) == 18
+    assert outputFiles(parts) == expected
@@ -0,0 +1,43 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# Checks that the spelling correction of extract_drugs4.py (option --spelling) corrects misspelled drug names, but leaves valid
+# drug names alone, also the ones that are only in ATC Levels.xlsx and not in dbpedia or the SFK.
+# Run with: python -m pytest "2) Extract and preprocess free text answers/test_spelling_corrector.py"
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import pytest
+import extract_drugs4
+import spelling_corrector
+
+
+@pytest.fixture(scope="module")
+def speller():
+    #the dictionary of --spelling, switched off again for the other tests
+    speller = extract_drugs4.useSpellingCorrection()
+    yield speller
+    extract_drugs4.speller = None
+
+
+def test_misspellings_are_corrected(speller):
+    assert speller.correctWord("paracetemol") == "paracetamol"
+    assert speller.correctWord("omeprazool") == "omeprazol"
+    assert speller.correctTerm("paracetemol 500") == "paracetamol 500"
+
+
+def test_valid_drug_names_are_not_changed(speller):
+    #INNs that are close to another drug with another ATC code
+    for word in ["tolonidine", "buclizine", "piketoprofen", "fludiazepam", "mosapride", "actinomycines", "chlorite"]:
+        assert speller.correctWord(word) == word
+
+
+def test_atc_names_are_not_changed(speller):
+    words = set(spelling_corrector.readAtcLevelsWords())
+    assert len(words) > 1000
+    assert {word: speller.correctWord(word) for word in words if speller.correctWord(word) != word} == {}
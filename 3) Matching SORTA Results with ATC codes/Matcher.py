@@ -0,0 +1,98 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+import csv
+import glob
+import numpy as np
+import pandas as pd
+from optparse import OptionParser
+from atc_index import AtcIndex
+
+#Description:
+#This file is supposed to match the SORTA results with the related ATC codes.
+#Therefore it uses the SORTA results and the file rainbowtable_all.tsv (see atc_index.py).
+#There are two ways how to represent multiple ATC codes per drug:
+#Each ATC code in a separate line, duplicating the rest of the line for multiple ATC codes (long format, "...long_format.tsv")
+#Or all ATC codes in the same line with a separator (wide format, "..._wide_format.tsv").
+#The wide format can be used for the manual curation step in Excel. It groups the SORTA results by the "synonym" and lists groups
+#with terms flagged for review at the top.
+#
+#This file looks up the ATC codes once per SORTA result file and writes both formats (or only one of them with the option -f).
+#Several SORTA result files (or patterns like "*_processed.csv") can be given at once.
+#Matcher_long_format.py and Matcher_wide_format.py do the same for a single file and a single format.
+
+
+def readSortaResults(file):
+    #Read the SORTA output
+    return pd.read_csv(file, usecols=['Name', 'Synonym', 'ontologyTermName', 'ontologyTermIRI', 'score','review','validated'], header=0, sep=";")
+
+def lookupAtcCodes(df, rainbowtable):
+    #Look up all the ATC codes for the output from SORTA, URIs without ATC code get "nan"
+    final_df = df.copy()
+    final_df['Atccode'] = rainbowtable.joined(final_df['ontologyTermIRI'], missing='nan')
+    return final_df
+
+def longFormat(final_df):
+    #Write the ATC codes in long format: one line per ATC code
+    final_df = final_df.assign(Atccode=final_df['Atccode'].str.split(', ')).explode('Atccode')
+
+    #Grouping duplicate lines that may only differ in the Name column.
+    final_df = final_df.groupby(['Synonym', 'ontologyTermName', 'ontologyTermIRI', 'score','validated','review','Atccode'])['Name'].agg(', '.join).reset_index(name='Name')
+
+    #Order the columns
+    final_df = final_df[['Name','Synonym', 'ontologyTermName','score','validated','Atccode','review']] # 'ontologyTermIRI',
+
+    #Order the results
+    return final_df.sort_values(by=["Synonym","review","Atccode","validated","score"],ascending=[False,True,True,False,True])
+
+def wideFormat(final_df):
+    #Order the results, the answers flagged for review first
+    final_df = final_df.sort_values(by=["review","Synonym","Atccode","validated","score"],ascending=[False,True,True,False,True])
+
+    #Group the lines by the synonym (in the order of their first line) and sort each group by review.
+    #A stable sort keeps the order of the lines within a group for the same review value.
+    final_df = final_df.dropna(subset=['Synonym'])
+    groups = pd.factorize(final_df['Synonym'])[0]
+    review, values = pd.factorize(final_df['review'], sort=True)
+    #missing values last
+    review = np.where(review < 0, len(values), review)
+    return final_df.iloc[np.lexsort((review, groups))]
+
+def writeFormats(file, final_df, formats):
+    if "long" in formats:
+        #Write the output as tsv file:
+        longFormat(final_df).to_csv(str.replace(file, ".csv", "long_format.tsv"), sep= "\t", index = False, quoting=csv.QUOTE_ALL )
+    if "wide" in formats:
+        #Write the output to a tsv file:
+        wideFormat(final_df).to_csv(str.replace(file, ".csv", "_wide_format.tsv"), sep= "\t", index = False, quoting=csv.QUOTE_ALL )
+
+def matchFiles(files, formats=("long", "wide"), rainbowtable_path='rainbowtable_all.tsv'):
+    #The index is opened once for all the files
+    rainbowtable = AtcIndex.open(rainbowtable_path)
+    for file in files:
+        print(file)
+        writeFormats(file, lookupAtcCodes(readSortaResults(file), rainbowtable), formats)
+
+
+class Matcher:
+    def __init__(self):
+        parser = OptionParser(usage="%prog [options] SORTA result files or patterns")
+        parser.add_option("-f","--format", choices=["long", "wide", "both"], default="both", help="the output format: long, wide or both (default: both)")
+        parser.add_option("-r","--rainbowtable", default="rainbowtable_all.tsv", help="the table with the URIs and their ATC codes (default: rainbowtable_all.tsv)")
+        (options, args) = parser.parse_args()
+
+        files = []
+        for argument in args:
+            files += sorted(glob.glob(argument)) or [argument]
+        if len(files) == 0:
+            print("please specify a file")
+            return
+
+        formats = ("long", "wide") if options.format == "both" else (options.format,)
+        matchFiles(list(dict.fromkeys(files)), formats, options.rainbowtable)
+
+
+if __name__ == '__main__':
+    Matcher()
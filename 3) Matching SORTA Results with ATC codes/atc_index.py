@@ -0,0 +1,131 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This module contains a prebuilt index of rainbowtable_all.tsv for the Matcher scripts.
+#
+# rainbowtable_all.tsv contains the relationship between the URIs of the ontology used in SORTA and the ATC codes (one line per pair).
+# Before, every Matcher run read the whole table, grouped the ATC codes per URI into one string and split these strings again
+# to remove duplicates.
+#
+# The index stores the same information in a few numpy files in the directory "rainbowtable_all.tsv.index":
+# - iris.npy:    the URIs (utf-8, sorted), the position of a URI is its integer id
+# - offsets.npy: the ATC codes of URI i are codes[offsets[i]:offsets[i+1]]
+# - codes.npy:   the integer ids of the ATC codes (without duplicates per URI, in the order of the table)
+# - atc.npy:     the ATC code for each ATC code id
+# - meta.json:   the sha256 hash of the rainbowtable the index was built from and the version of build()
+#
+# AtcIndex.open() builds the index if it doesn't exist or the hash of the rainbowtable or the version has changed, otherwise the files are
+# opened memory-mapped. This takes only a few milliseconds, and all the processes that open the index share the same memory.
+
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+
+def fileHash(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class AtcIndex:
+    files = ["iris", "offsets", "codes", "atc"]
+    #changes when build() reads the rainbowtable differently, the indexes of an older version are built again
+    version = 2
+
+    def __init__(self, iris, offsets, codes, atc):
+        self.iris = iris
+        self.offsets = offsets
+        self.codes = codes
+        self.atc = atc
+
+    def __len__(self):
+        return len(self.iris)
+
+    @classmethod
+    def build(cls, rainbowtable_path):
+        #Read the file "rainbowtable_all". It contains the link between the ATC codes and the selfmade URIs for the drugs.
+        rainbowtable = pd.read_csv(rainbowtable_path, usecols=['ontologyTermIRI', 'Atccode'], names=['ontologyTermIRI', 'Atccode'], sep="\t", dtype=str)
+        atc_ids = {}
+        codes_per_iri = {}
+        for iri, atccode in zip(rainbowtable['ontologyTermIRI'], rainbowtable['Atccode']):
+            codes = codes_per_iri.setdefault(iri, [])
+            #an empty cell is read as NaN, the URI has no ATC code in this line
+            if pd.isna(atccode):
+                continue
+            #a line can contain several ATC codes separated by commas
+            for code in str(atccode).split(','):
+                code = code.strip()
+                if code == "":
+                    continue
+                code_id = atc_ids.setdefault(code, len(atc_ids))
+                if code_id not in codes:
+                    codes.append(code_id)
+
+        iris = sorted(codes_per_iri, key=lambda iri: iri.encode("utf-8"))
+        counts = np.array([len(codes_per_iri[iri]) for iri in iris], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        codes = np.array([code for iri in iris for code in codes_per_iri[iri]], dtype=np.int32)
+        return cls(np.array([iri.encode("utf-8") for iri in iris], dtype=bytes), offsets, codes,
+                   np.array([code.encode("utf-8") for code in atc_ids], dtype=bytes))
+
+    def save(self, index_dir, source_hash):
+        os.makedirs(index_dir, exist_ok=True)
+        for name in self.files:
+            np.save(os.path.join(index_dir, name + ".npy"), getattr(self, name))
+        #meta.json is written last, an index without it is incomplete and built again
+        with open(os.path.join(index_dir, "meta.json.tmp"), 'w') as f:
+            json.dump({"sha256": source_hash, "version": self.version, "iris": len(self.iris), "atc codes": len(self.atc)}, f)
+        os.replace(os.path.join(index_dir, "meta.json.tmp"), os.path.join(index_dir, "meta.json"))
+
+    @classmethod
+    def load(cls, index_dir):
+        return cls(*[np.load(os.path.join(index_dir, name + ".npy"), mmap_mode='r') for name in cls.files])
+
+    @classmethod
+    def open(cls, rainbowtable_path="rainbowtable_all.tsv", index_dir=None):
+        #Opens the index of the rainbowtable, it is (re)built if the rainbowtable has changed
+        if index_dir is None:
+            index_dir = rainbowtable_path + ".index"
+        source_hash = fileHash(rainbowtable_path)
+        try:
+            with open(os.path.join(index_dir, "meta.json")) as f:
+                meta = json.load(f)
+                if meta["sha256"] == source_hash and meta.get("version") == cls.version:
+                    return cls.load(index_dir)
+        except (OSError, ValueError, KeyError):
+            pass
+        print("building the index of " + rainbowtable_path)
+        cls.build(rainbowtable_path).save(index_dir, source_hash)
+        return cls.load(index_dir)
+
+    def ids(self, iris):
+        #The integer id of each URI, -1 for URIs that are not in the rainbowtable (or missing)
+        codes, uniques = pd.factorize(pd.Series(iris, dtype=object))
+        keys = np.array([iri.encode("utf-8") if isinstance(iri, str) else b"" for iri in uniques], dtype=bytes)
+        if len(keys) == 0 or len(self.iris) == 0:
+            return np.full(len(codes), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.iris, keys), len(self.iris) - 1)
+        found = (self.iris[positions] == keys) & (keys != b"")
+        unique_ids = np.append(np.where(found, positions, -1), -1)
+        #missing values have the code -1, which points to the -1 at the end
+        return unique_ids[codes]
+
+    def atc_codes(self, iri_id):
+        #The ATC codes of one URI
+        return [self.atc[code].decode("utf-8") for code in self.codes[self.offsets[iri_id]:self.offsets[iri_id + 1]]]
+
+    def joined(self, iris, sep=', ', missing=np.nan):
+        #The ATC codes of each URI as one string, "missing" for URIs without ATC code
+        ids = self.ids(iris)
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        strings = np.array([sep.join(self.atc_codes(iri_id)) if iri_id >= 0 else missing for iri_id in unique_ids], dtype=object)
+        return strings[inverse.reshape(-1)]
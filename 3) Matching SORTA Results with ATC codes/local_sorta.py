@@ -0,0 +1,263 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This program is a local stand-in for Molgenis SORTA. It maps the anonymous files of step 2
+# ("extractedColumns4/anonymous/COVID24A*TXT_column_anonymous.csv" with the columns Name;Synonym) to the ontology
+# and writes a csv file in the format of the SORTA export, which can be used by Matcher.py, Matcher_long_format.py and
+# Matcher_wide_format.py without any changes ("..._processed.csv" with the columns Name;Synonym;ontologyTermName;ontologyTermIRI;score;review;validated).
+#
+# The ontology labels are taken from:
+# - "Datasources used to create Ontology/Dbpedia (Dutch)/dbpedia.ttl" (rdfs:label of the dbpedia URIs)
+# - "Datasources used to create Ontology/Original data from sfk (uncurated)/ATC_codes_from_sfk.xlsx" ("GPK Omschrijving")
+# - "Nice to get an overview/ATC Levels.xlsx" ("Preferred Label")
+# - additional files given with -l (tab separated: label and URI, e.g. an export of the ontology used in SORTA)
+# The Excel files are read from their cache (see "Pipeline tools/workbook_cache.py"), they are parsed again only if they have changed.
+# The selfmade URIs are http://www.UMCG.nl/ + the MD5 hash of the lowercase label (see "Pipeline tools/ontology_iri.py"). Only labels with a URI in rainbowtable_all.tsv are used,
+# so every match has an ATC code.
+#
+# Matching: every label is split into character trigrams (with a space at the beginning and end), weighted with TF-IDF.
+# Labels that only differ in upper and lower case or spaces and have the same URI (e.g. "Paracetamol" and "paracetamol") have the same
+# trigrams, they are kept once. The Names of all the input files are matched together as one sparse matrix product, the best k URIs of
+# each Name are kept (option -k), each with its most similar label: a URI with several labels (e.g. a Dutch and an English one) is
+# given once.
+# The sparse product goes through the labels of each trigram of a Name (the label matrix is an inverted index from the trigrams to
+# the labels). Since most Names share a common trigram with most labels, the similarities of a batch of Names are kept as a dense
+# matrix (4 bytes per Name and label, plus up to 9 bytes for the sparse product it is made from and for giving each URI once).
+# The number of Names per batch is chosen so they take at most the memory given with -m (default: 64 MB), whatever the number of labels.
+# The score is the cosine similarity * 100. Matches with a score below the threshold (option -t) are flagged for review, like in SORTA.
+#
+# With the option -b the program is run as a benchmark: the Names of saved SORTA outputs are matched again and the rankings
+# (how often the URI of SORTA is the first or one of the k best local matches) and the speed are shown.
+
+import codecs
+import glob
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse
+import sys
+from optparse import OptionParser
+from atc_index import AtcIndex
+from sorta_client import outputFile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Pipeline tools"))
+from workbook_cache import WorkbookCache
+from ontology_iri import umcgIri
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+datasources_dir = os.path.join(script_dir, "..", "Datasources used to create Ontology")
+dbpedia_file = os.path.join(datasources_dir, "Dbpedia (Dutch)", "dbpedia.ttl")
+sfk_file = os.path.join(datasources_dir, "Original data from sfk (uncurated)", "ATC_codes_from_sfk.xlsx")
+atc_levels_file = os.path.join(script_dir, "..", "Nice to get an overview", "ATC Levels.xlsx")
+
+ttl_label = re.compile(r'^<([^>]*)> rdfs:label "((?:[^"\\]|\\.)*)"')
+
+
+def readDbpediaLabels(path=dbpedia_file):
+    labels = []
+    with codecs.open(path, 'r', encoding="utf-8") as f:
+        for line in f:
+            match = ttl_label.match(line)
+            if match:
+                labels.append((match.group(2).replace('\\"', '"'), match.group(1)))
+    return labels
+
+def readExcelLabels(path, column, sheet_name=0):
+    labels = pd.Series(WorkbookCache.open(path).sheet(sheet_name).column(column), dtype=object).dropna().astype(str).str.strip()
+    return [(label, umcgIri(label)) for label in labels.drop_duplicates() if label != ""]
+
+def readLabelFile(path):
+    #tab separated: label and URI
+    labels = pd.read_csv(path, sep="\t", header=None, usecols=[0, 1], names=["label", "iri"], dtype=str).dropna()
+    return list(zip(labels["label"].str.strip(), labels["iri"].str.strip()))
+
+
+def trigrams(text):
+    text = " " + " ".join(str(text).lower().split()) + " "
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+
+class LocalSorta:
+    batch_memory = 64           #MB for the similarities of a batch of texts with all the labels
+
+    def __init__(self, labels):
+        #labels: list of (label, URI), duplicates are removed. The weights of the trigrams are computed from all of them (as before),
+        #but labels with the same trigrams and URI (e.g. "Paracetamol" and "paracetamol") are only one row of the matrix
+        labels = list(dict.fromkeys(labels))
+        unique = {}
+        for position, (label, iri) in enumerate(labels):
+            unique.setdefault((" ".join(label.lower().split()), iri), position)
+        rows = np.array(list(unique.values()), dtype=np.int64)
+        self.names = np.array([label for label, iri in labels], dtype=object)[rows]
+        self.iris = np.array([iri for label, iri in labels], dtype=object)[rows]
+        #the URI of each label as a number, and whether other labels have the same URI
+        self.iri_codes, uniques = pd.factorize(self.iris)
+        self.shared_iri = (np.bincount(self.iri_codes, minlength=len(uniques)) > 1)[self.iri_codes]
+        self.iri_count = len(uniques)
+        self.vocabulary = {}
+        matrix = self.countMatrix([label for label, iri in labels], grow=True)
+        document_frequency = np.bincount(matrix.indices, minlength=len(self.vocabulary))
+        self.idf = (np.log((1.0 + len(labels)) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+        self.labels = self.weight(matrix[rows]).T.tocsr()
+
+    @classmethod
+    def fromSources(cls, rainbowtable_path=os.path.join(script_dir, "rainbowtable_all.tsv"), label_files=()):
+        labels = readDbpediaLabels()
+        labels += readExcelLabels(sfk_file, "GPK Omschrijving")
+        labels += readExcelLabels(atc_levels_file, "Preferred Label", "Tabelle1")
+        for path in label_files:
+            labels += readLabelFile(path)
+        #only the labels with ATC codes
+        rainbowtable = AtcIndex.open(rainbowtable_path)
+        known = rainbowtable.ids([iri for label, iri in labels]) >= 0
+        return cls([label for label, keep in zip(labels, known) if keep])
+
+    def __len__(self):
+        return len(self.names)
+
+    def countMatrix(self, texts, grow=False):
+        #sparse matrix with the number of each trigram per text
+        rows, columns = [], []
+        for row, text in enumerate(texts):
+            for gram in trigrams(text):
+                column = self.vocabulary.get(gram)
+                if column is None:
+                    if not grow:
+                        continue
+                    column = self.vocabulary[gram] = len(self.vocabulary)
+                rows.append(row)
+                columns.append(column)
+        matrix = scipy.sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(len(texts), len(self.vocabulary)))
+        matrix.sum_duplicates()
+        return matrix
+
+    def weight(self, matrix):
+        #TF-IDF with length 1 per row
+        matrix = matrix.multiply(self.idf[np.newaxis, :]).tocsr()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return (scipy.sparse.diags((1.0 / norms).astype(np.float32)) @ matrix).tocsr()
+
+    def batchSize(self):
+        #number of texts whose similarities fit into batch_memory: 13 bytes per label (the sparse product, the dense float32 matrix
+        #and the mask of the labels of a URI)
+        return max(1, int(self.batch_memory * 2 ** 20) // (13 * max(len(self.names), 1)))
+
+    def match(self, texts, k=1, batch_size=None):
+        #The best k URIs for each text: arrays of label positions (the most similar label of the URI) and scores (-1 and 0 where
+        #nothing matched). There are min(k, number of URIs) columns, at least one.
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        k = max(min(k, self.iri_count), 1)
+        best = np.full((len(texts), k), -1, dtype=np.int64)
+        scores = np.zeros((len(texts), k))
+        if len(self.names) == 0:
+            return best, scores
+        batch_size = batch_size or self.batchSize()
+        for start in range(0, len(texts), batch_size):
+            #the similarities of a batch of texts with all the labels
+            similarity = (self.weight(self.countMatrix(texts[start:start + batch_size])) @ self.labels).toarray()
+            #k times the best label per row (k is small, this is faster than sorting the rows)
+            rows = np.arange(len(similarity))
+            for rank in range(k):
+                top = similarity.argmax(axis=1)
+                values = similarity[rows, top]
+                best[start + rows, rank] = np.where(values > 0, top, -1)
+                scores[start + rows, rank] = np.maximum(values, 0)
+                similarity[rows, top] = -1
+                #the other labels of the URI aren't used again for this text
+                shared = rows[self.shared_iri[top]]
+                if rank + 1 < k and len(shared):
+                    block = similarity[shared]
+                    block[self.iri_codes[np.newaxis, :] == self.iri_codes[top[shared]][:, np.newaxis]] = -1
+                    similarity[shared] = block
+        return best, np.round(scores * 100, 2)
+
+    def sortaResults(self, df, k=1, threshold=80.0):
+        #The SORTA export for a table with Name and Synonym: k lines per Name
+        codes, names = pd.factorize(df['Name'].astype(str))
+        best, scores = self.match(list(names), k)
+        k = best.shape[1]
+        rows = np.repeat(np.arange(len(df)), k)
+        best = best[codes].ravel()
+        scores = scores[codes].ravel()
+        #lines without match are kept once (like in SORTA), the other empty ranks are dropped
+        keep = (best >= 0) | (np.arange(len(best)) % k == 0)
+        rows, best, scores = rows[keep], best[keep], scores[keep]
+        found = best >= 0
+        names = np.full(len(best), None, dtype=object)
+        iris = np.full(len(best), None, dtype=object)
+        names[found] = self.names[best[found]]
+        iris[found] = self.iris[best[found]]
+        return pd.DataFrame({'Name': df['Name'].to_numpy()[rows],
+                             'Synonym': df['Synonym'].to_numpy()[rows],
+                             'ontologyTermName': names,
+                             'ontologyTermIRI': iris,
+                             'score': scores,
+                             'review': scores < threshold,
+                             'validated': False})
+
+
+def benchmark(sorta, files, k):
+    #Compares the local rankings with saved SORTA outputs
+    for path in files:
+        saved = pd.read_csv(path, sep=";", usecols=['Name', 'ontologyTermIRI', 'score'])
+        saved = saved.dropna(subset=['ontologyTermIRI']).sort_values('score', ascending=False, kind="stable").drop_duplicates('Name')
+        names = list(saved['Name'].astype(str))
+        start = time.time()
+        best, scores = sorta.match(names, k)
+        seconds = time.time() - start
+        local = np.where(best >= 0, sorta.iris[np.maximum(best, 0)], None)
+        expected = saved['ontologyTermIRI'].to_numpy()[:, np.newaxis]
+        first = np.mean(local[:, 0] == expected[:, 0]) if len(names) else 0.0
+        any_k = np.mean((local == expected).any(axis=1)) if len(names) else 0.0
+        print("%s: %d names in %.2f s (%.0f per second), same first match as SORTA: %.1f%%, SORTA match in the best %d: %.1f%%"
+              % (path, len(names), seconds, len(names) / max(seconds, 1e-9), 100 * first, k, 100 * any_k))
+
+
+class LocalSortaMatcher:
+    def __init__(self):
+        parser = OptionParser(usage="%prog [options] anonymous files or patterns (with -b: saved SORTA outputs)")
+        parser.add_option("-k", type="int", default=1, help="number of matches per Name (default: 1)")
+        parser.add_option("-t","--threshold", type="float", default=80.0, help="matches with a lower score are flagged for review (default: 80)")
+        parser.add_option("-l","--labels", action="append", default=[], help="additional file with labels and URIs (tab separated), can be used multiple times")
+        parser.add_option("-r","--rainbowtable", default=os.path.join(script_dir, "rainbowtable_all.tsv"), help="the table with the URIs and their ATC codes")
+        parser.add_option("-o","--output", help="directory for the output files (default: next to the input files)")
+        parser.add_option("-m","--memory", type="float", default=LocalSorta.batch_memory, help="MB for the similarities of a batch of Names with all the labels (default: 64)")
+        parser.add_option("-b","--benchmark", action="store_true", help="compare the matches and the speed with saved SORTA outputs")
+        (options, args) = parser.parse_args()
+
+        if options.k < 1:
+            parser.error("-k must be at least 1")
+        files = []
+        for argument in args:
+            files += sorted(glob.glob(argument)) or [argument]
+        if len(files) == 0:
+            print("please specify a file")
+            return
+
+        start = time.time()
+        sorta = LocalSorta.fromSources(options.rainbowtable, options.labels)
+        sorta.batch_memory = options.memory
+        print("%d labels indexed in %.2f s" % (len(sorta), time.time() - start))
+
+        if options.benchmark:
+            benchmark(sorta, files, options.k)
+            return
+
+        for path in files:
+            df = pd.read_csv(path, sep=";", dtype=str, keep_default_na=False)
+            start = time.time()
+            results = sorta.sortaResults(df, options.k, options.threshold)
+            seconds = time.time() - start
+            results.to_csv(outputFile(path, options.output), sep=";", index=False)
+            print("%s: %d lines (%d distinct Names) in %.2f s" % (path, len(df), df['Name'].nunique(), seconds))
+
+
+if __name__ == '__main__':
+    LocalSortaMatcher()
@@ -0,0 +1,213 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This program uploads the anonymous files of step 2 ("COVID24A*TXT_column_anonymous.csv") to a SORTA server,
+# waits for the matching jobs and downloads the results, so the files don't have to be uploaded and downloaded one by one by hand.
+#
+# The files are submitted concurrently by a pool of threads (option -p). Every thread keeps its connection to the server open
+# and reuses it for all its requests. For every file:
+# 1) POST   <url>/jobs              the csv file (Name;Synonym) is uploaded, the answer contains the id of the job
+# 2) GET    <url>/jobs/<id>         the status of the job is polled ("RUNNING", "SUCCESS" or "FAILED"), the time between
+#                                   two polls doubles up to a maximum (options --poll and --max-poll). A job that hasn't finished
+#                                   after --job-timeout seconds fails (it is not submitted again, the server may be overloaded)
+# 3) GET    <url>/jobs/<id>/results the SORTA export (Name;Synonym;ontologyTermName;ontologyTermIRI;score;review;validated)
+# Requests that fail (no connection, timeout, server error) are repeated with increasing waiting times (option -r), failed jobs
+# are submitted again. An upload (POST) is only repeated if it didn't reach the server (no connection, error while sending) or
+# if the server refused it (503, 429). If the answer to an upload is lost (timeout, closed connection, other server errors), the
+# server may have created the job, so the file is not uploaded again (this would start a second job) and the file fails.
+#
+# The results are written next to the input files as "..._processed.csv" (or into the directory given with -o), where
+# Matcher.py, Matcher_long_format.py and Matcher_wide_format.py can use them.
+# An access token for the server can be given with -t (it is sent as "x-molgenis-token").
+#
+# sorta_mock_server.py is a local server with the same interface for testing without a SORTA server.
+
+import glob
+import json
+import os
+import threading
+import time
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from optparse import OptionParser
+
+
+class SortaError(Exception):
+    pass
+
+class RetryableError(SortaError):
+    pass
+
+
+class SortaClient:
+    def __init__(self, url, token=None, retries=5, poll=1.0, max_poll=30.0, timeout=60.0, job_timeout=None):
+        parsed = urllib.parse.urlsplit(url)
+        self.scheme = parsed.scheme
+        self.host = parsed.netloc
+        self.path = parsed.path.rstrip("/")
+        self.token = token
+        self.retries = retries
+        self.poll = poll
+        self.max_poll = max_poll
+        self.timeout = timeout
+        #seconds a job may run, None: no limit
+        self.job_timeout = job_timeout
+        #one connection per thread, it is kept open between the requests
+        self.connections = threading.local()
+        self.statistics = {"requests": 0, "retries": 0, "resubmitted jobs": 0}
+        self.lock = threading.Lock()
+
+    def count(self, key):
+        with self.lock:
+            self.statistics[key] += 1
+
+    def connection(self):
+        if getattr(self.connections, "connection", None) is None:
+            connection_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            self.connections.connection = connection_class(self.host, timeout=self.timeout)
+        return self.connections.connection
+
+    def closeConnection(self):
+        if getattr(self.connections, "connection", None) is not None:
+            self.connections.connection.close()
+            self.connections.connection = None
+
+    def request(self, method, path, body=None, content_type=None):
+        #Sends a request, repeats it with increasing waiting times if it fails. Returns the body of the answer.
+        #Only GET is repeated in any case. A POST is repeated only if it can't have been processed by the server.
+        idempotent = method == "GET"
+        headers = {"Connection": "keep-alive"}
+        if self.token:
+            headers["x-molgenis-token"] = self.token
+        if content_type:
+            headers["Content-Type"] = content_type
+        for attempt in range(self.retries + 1):
+            sent = False
+            try:
+                self.count("requests")
+                if not idempotent:
+                    #a kept connection may have been closed by the server in the meantime, which can't be told apart from
+                    #a lost answer afterwards
+                    self.closeConnection()
+                connection = self.connection()
+                connection.request(method, self.path + path, body=body, headers=headers)
+                sent = True
+                response = connection.getresponse()
+                data = response.read()
+                if response.status in (503, 429):
+                    raise RetryableError("%s %s: %d %s" % (method, path, response.status, response.reason))
+                if response.status >= 500:
+                    error = "%s %s: %d %s" % (method, path, response.status, response.reason)
+                    if not idempotent:
+                        raise SortaError(error + " (not repeated, the server may have processed the request)")
+                    raise RetryableError(error)
+                if response.status >= 400:
+                    raise SortaError("%s %s: %d %s" % (method, path, response.status, data.decode("utf-8", "replace")))
+                return data
+            except (OSError, http.client.HTTPException, RetryableError) as error:
+                #the connection may be broken, a new one is opened for the next attempt
+                self.closeConnection()
+                if sent and not idempotent and not isinstance(error, RetryableError):
+                    raise SortaError("%s %s: no answer (%s), not repeated, the server may have processed the request" % (method, path, error))
+                if attempt == self.retries:
+                    raise SortaError("%s %s failed after %d attempts: %s" % (method, path, attempt + 1, error))
+                self.count("retries")
+                time.sleep(min(self.max_poll, self.poll * 2 ** attempt))
+
+    def submit(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        query = urllib.parse.urlencode({"name": os.path.basename(path)})
+        answer = json.loads(self.request("POST", "/jobs?" + query, data, "text/csv; charset=utf-8"))
+        return answer["jobId"]
+
+    def wait(self, job_id):
+        #Polls the status of the job, the time between two polls doubles up to max_poll
+        interval = self.poll
+        deadline = None if self.job_timeout is None else time.time() + self.job_timeout
+        while True:
+            status = json.loads(self.request("GET", "/jobs/" + urllib.parse.quote(job_id)))
+            if status["status"] == "SUCCESS":
+                return
+            if status["status"] == "FAILED":
+                raise RetryableError("job " + job_id + " failed: " + str(status.get("message", "")))
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise SortaError("job %s didn't finish within %g s (status %s)" % (job_id, self.job_timeout, status["status"]))
+                time.sleep(min(interval, remaining))
+            else:
+                time.sleep(interval)
+            interval = min(self.max_poll, interval * 2)
+
+    def match(self, path, output):
+        #Uploads the file, waits for the job and writes the results. Failed jobs are submitted again.
+        start = time.time()
+        for attempt in range(self.retries + 1):
+            job_id = self.submit(path)
+            try:
+                self.wait(job_id)
+                break
+            except RetryableError:
+                if attempt == self.retries:
+                    raise
+                self.count("resubmitted jobs")
+        results = self.request("GET", "/jobs/" + urllib.parse.quote(job_id) + "/results")
+        with open(output, 'wb') as f:
+            f.write(results)
+        return time.time() - start
+
+
+def outputFile(path, output_dir=None):
+    #COVID24A2TXT_column_anonymous.csv -> COVID24A2TXT_column_anonymous_processed.csv
+    name = os.path.splitext(os.path.basename(path))[0] + "_processed.csv"
+    return os.path.join(output_dir if output_dir else os.path.dirname(path), name)
+
+def matchFiles(client, files, processes=4, output_dir=None):
+    #Submits all the files concurrently, returns the number of files that failed
+    failed = 0
+    with ThreadPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(client.match, path, outputFile(path, output_dir)): path for path in files}
+        for future in as_completed(futures):
+            try:
+                print("%s: %.2f s" % (futures[future], future.result()))
+            except SortaError as error:
+                failed += 1
+                print("%s: %s" % (futures[future], error))
+    return failed
+
+
+class SortaUploader:
+    def __init__(self):
+        parser = OptionParser(usage="%prog [options] anonymous files or patterns")
+        parser.add_option("-u","--url", default="http://localhost:8080/api/sorta", help="address of the SORTA jobs interface (default: http://localhost:8080/api/sorta)")
+        parser.add_option("-t","--token", help="access token for the server")
+        parser.add_option("-p","--processes", type="int", default=4, help="number of files that are submitted at the same time (default: 4)")
+        parser.add_option("-r","--retries", type="int", default=5, help="number of times a failed request or job is repeated (default: 5)")
+        parser.add_option("--poll", type="float", default=1.0, help="seconds between the first two polls of a job (default: 1)")
+        parser.add_option("--max-poll", type="float", default=30.0, help="maximal seconds between two polls of a job (default: 30)")
+        parser.add_option("--job-timeout", type="float", help="maximal seconds to wait for a job, the file fails afterwards (default: no limit)")
+        parser.add_option("-o","--output", help="directory for the results (default: next to the input files)")
+        (options, args) = parser.parse_args()
+
+        files = []
+        for argument in args:
+            files += sorted(glob.glob(argument)) or [argument]
+        if len(files) == 0:
+            print("please specify a file")
+            return
+
+        client = SortaClient(options.url, options.token, options.retries, options.poll, options.max_poll, job_timeout=options.job_timeout)
+        start = time.time()
+        failed = matchFiles(client, list(dict.fromkeys(files)), options.processes, options.output)
+        print("%d files in %.2f s, %d failed, %d requests, %d retries, %d resubmitted jobs" % (len(files), time.time() - start, failed,
+              client.statistics["requests"], client.statistics["retries"], client.statistics["resubmitted jobs"]))
+
+
+if __name__ == '__main__':
+    SortaUploader()
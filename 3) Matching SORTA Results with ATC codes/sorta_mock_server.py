@@ -0,0 +1,166 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This program is a local server with the interface that sorta_client.py uses, to test the client (and its load) without a SORTA server.
+#
+# POST /api/sorta/jobs?name=...      upload of a csv file (Name;Synonym), returns {"jobId": ..., "status": "RUNNING"}
+# GET  /api/sorta/jobs/<id>          returns {"jobId": ..., "status": "RUNNING" | "SUCCESS" | "FAILED", "progress": 0-100}
+# GET  /api/sorta/jobs/<id>/results  returns the SORTA export (Name;Synonym;ontologyTermName;ontologyTermIRI;score;review;validated)
+#
+# The matching is done with local_sorta.py, so the results have the same shape and similar content as the ones of SORTA.
+# With the option --no-matching every line is returned without match (faster start, for load tests).
+# A job takes the time given with -d. With --error-rate a part of the requests is answered with "503 Service Unavailable",
+# with --job-failure-rate a part of the jobs fails, to test the retries of the client.
+#
+# Start: python sorta_mock_server.py -P 8080
+# Then:  python sorta_client.py -u http://localhost:8080/api/sorta ../../extractedColumns4_week1/anonymous/*.csv
+
+import io
+import json
+import random
+import threading
+import time
+import uuid
+import urllib.parse
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from optparse import OptionParser
+
+
+class MockSorta:
+    def __init__(self, matcher=None, duration=1.0, error_rate=0.0, job_failure_rate=0.0, threshold=80.0):
+        self.matcher = matcher
+        self.duration = duration
+        self.error_rate = error_rate
+        self.job_failure_rate = job_failure_rate
+        self.threshold = threshold
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def results(self, data):
+        df = pd.read_csv(io.BytesIO(data), sep=";", dtype=str, keep_default_na=False)
+        if self.matcher is not None:
+            results = self.matcher.sortaResults(df, 1, self.threshold)
+        else:
+            results = pd.DataFrame({'Name': df['Name'], 'Synonym': df['Synonym'], 'ontologyTermName': None, 'ontologyTermIRI': None,
+                                    'score': 0.0, 'review': True, 'validated': False})
+        return results.to_csv(sep=";", index=False).encode("utf-8")
+
+    def submit(self, name, data):
+        job_id = uuid.uuid4().hex
+        job = {"jobId": job_id, "name": name, "status": "RUNNING", "started": time.time(), "results": None}
+        with self.lock:
+            self.jobs[job_id] = job
+        threading.Thread(target=self.run, args=(job, data), daemon=True).start()
+        return job
+
+    def run(self, job, data):
+        time.sleep(self.duration)
+        if random.random() < self.job_failure_rate:
+            job["status"] = "FAILED"
+            job["message"] = "simulated failure"
+            return
+        try:
+            job["results"] = self.results(data)
+            job["status"] = "SUCCESS"
+        except Exception as error:
+            job["status"] = "FAILED"
+            job["message"] = str(error)
+
+    def status(self, job):
+        progress = 100 if job["status"] != "RUNNING" else min(99, int(100 * (time.time() - job["started"]) / max(self.duration, 1e-9)))
+        answer = {"jobId": job["jobId"], "status": job["status"], "progress": progress}
+        if "message" in job:
+            answer["message"] = job["message"]
+        return answer
+
+
+class SortaRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"     #keep the connections open
+    sorta = None
+    prefix = "/api/sorta/jobs"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def simulatedError(self):
+        if random.random() < self.sorta.error_rate:
+            self.send(503, {"error": "simulated error"})
+            return True
+        return False
+
+    def do_POST(self):
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        url = urllib.parse.urlsplit(self.path)
+        if url.path.rstrip("/") != self.prefix:
+            self.send(404, {"error": "unknown path"})
+            return
+        if self.simulatedError():
+            return
+        name = urllib.parse.parse_qs(url.query).get("name", [""])[0]
+        job = self.sorta.submit(name, data)
+        self.send(201, self.sorta.status(job))
+
+    def do_GET(self):
+        parts = urllib.parse.urlsplit(self.path).path[len(self.prefix):].strip("/").split("/")
+        if not self.path.startswith(self.prefix) or parts[0] not in self.sorta.jobs:
+            self.send(404, {"error": "unknown job"})
+            return
+        if self.simulatedError():
+            return
+        job = self.sorta.jobs[parts[0]]
+        if len(parts) == 1:
+            self.send(200, self.sorta.status(job))
+        elif parts[1] == "results" and job["status"] == "SUCCESS":
+            self.send(200, job["results"], "text/csv; charset=utf-8")
+        else:
+            self.send(409, {"error": "no results for job with status " + job["status"]})
+
+
+def startServer(sorta, port=8080, host="localhost"):
+    #Starts the server in a background thread and returns it (server.shutdown() stops it)
+    handler = type("Handler", (SortaRequestHandler,), {"sorta": sorta})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class MockServer:
+    def __init__(self):
+        parser = OptionParser()
+        parser.add_option("-P","--port", type="int", default=8080, help="port of the server (default: 8080)")
+        parser.add_option("-d","--duration", type="float", default=1.0, help="seconds a job takes (default: 1)")
+        parser.add_option("--error-rate", type="float", default=0.0, help="part of the requests that are answered with an error (default: 0)")
+        parser.add_option("--job-failure-rate", type="float", default=0.0, help="part of the jobs that fail (default: 0)")
+        parser.add_option("--no-matching", action="store_true", help="return every line without match")
+        (options, args) = parser.parse_args()
+
+        matcher = None
+        if not options.no_matching:
+            from local_sorta import LocalSorta
+            matcher = LocalSorta.fromSources()
+        sorta = MockSorta(matcher, options.duration, options.error_rate, options.job_failure_rate)
+        server = startServer(sorta, options.port)
+        print("SORTA mock server on http://localhost:%d/api/sorta" % options.port)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    MockServer()
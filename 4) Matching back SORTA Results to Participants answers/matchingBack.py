@@ -0,0 +1,172 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+# This program matches the ATC codes to the participants answers for all questions and weeks in one run.
+#
+# It expects:
+# -a  the tables with PSEUDOIDEXT and Drugname (step 2, e.g. "../../extractedColumns4_week*/COVID24A*TXT_column.csv")
+# -c  the tables that contain the results from SORTA mapped to the ATC codes including a score (step 3, long format)
+# -o  the directory for the output
+#
+# The tables are paired by the question ("24A2", "24A10", ...) and the week ("week1", ...) in their file names.
+# A table with ATC codes without week in its name is used for all the weeks of its question.
+# For each pair two files are written from the same join:
+# - <week>_COVID24A<question>TXT_all.tsv: all the columns of both tables (like matchingBackAll.py)
+# - <week>_COVID24A<question>TXT_ATC.tsv: only PSEUDOIDEXT and Atccode, without duplicates (like matchingBackATCOnly.py)
+#
+# Every table with ATC codes is read once. Its answers ("Original") are stored as an index of integer keys, the answers of the
+# participants are translated to these keys and joined by them (a left join: all the answers of the participants are kept,
+# every answer gets all the ATC codes of its Original).
+#
+# With -s the curation store of earlier weeks is used (see "Pipeline tools/curation_store.py"): the answers that are not in the
+# table with ATC codes get the reviewed lines of the store. Then a week only needs a table with ATC codes for its new answers,
+# a week without table is matched with the store alone.
+
+import csv
+import glob
+import os
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+from optparse import OptionParser
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Pipeline tools"))
+from curation_store import CurationStore
+
+
+def readAnswers(path):
+    #read the participantsID and the drug
+    df2 = pd.read_csv(path, header=0, sep="\t")
+    #strip whitespaces
+    for col in df2.columns:
+        if pd.api.types.is_string_dtype(df2[col]):
+            df2[col] = df2[col].str.strip()
+    return df2.replace({"":np.nan})
+
+def readAtcCodes(path):
+    #read Name, ATC code and the score.
+    df = pd.read_csv(path, header=0, sep="\t")
+    df.rename(columns={"Synonym":"Original"}, inplace=True)
+    return df
+
+
+class AtcTable:
+    #The table with the ATC codes, grouped by the integer key of its Original
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        codes, self.keys = pd.factorize(self.df['Original'])
+        #the rows of each key are kept in the order of the table
+        self.order = np.argsort(codes, kind="stable")
+        self.counts = np.bincount(codes[codes >= 0], minlength=len(self.keys))
+        self.starts = np.cumsum(self.counts) - self.counts
+        if (codes < 0).any():
+            #rows without Original are at the start of order
+            self.starts += (codes < 0).sum()
+
+    def join(self, df2):
+        #Left join of the answers with the table on Original: the rows of each answer are repeated for each of its ATC codes
+        keys = self.keys.get_indexer(df2['Original'])
+        counts = np.where(keys >= 0, self.counts[np.maximum(keys, 0)], 0)
+        repeats = np.maximum(counts, 1)
+        left_rows = np.repeat(np.arange(len(df2)), repeats)
+        #position of each repeated row within its answer
+        positions = np.arange(len(left_rows)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        right_rows = np.where(np.repeat(counts, repeats) > 0, self.order[np.minimum(np.repeat(self.starts[np.maximum(keys, 0)], repeats) + positions, len(self.order) - 1)], -1)
+
+        left = df2.iloc[left_rows].reset_index(drop=True)
+        right = self.df.drop(columns='Original').reindex(right_rows).reset_index(drop=True)
+        return pd.concat([left, right], axis=1)
+
+def withStore(table, df2, store):
+    #The table with the lines of the curation store added for the answers that are not in the table
+    known = table.keys if table is not None else pd.Index([])
+    answers = pd.Series(pd.unique(df2['Original'].dropna()), dtype=object)
+    unknown = answers[known.get_indexer(answers) < 0]
+    found = store.known(unknown)
+    if not found.any():
+        return table
+    lines = store.lines(unknown[found]).rename(columns={"Synonym":"Original"})
+    if table is None:
+        return AtcTable(lines)
+    return AtcTable(pd.concat([table.df, lines], ignore_index=True))
+
+def atcOnly(finaldf):
+    finaldf = finaldf[['PSEUDOIDEXT', 'Atccode']]
+    return finaldf.dropna().drop_duplicates()
+
+def writeResult(finaldf, path):
+    finaldf.to_csv(path, sep="\t", index=False, quoting=csv.QUOTE_MINIMAL)
+
+
+def fileKey(path):
+    #question and week of a file: ("2", "week1") for ../extractedColumns4_week1/COVID24A2TXT_column.csv
+    question = re.search(r'24A(\d+)', os.path.basename(path))
+    week = re.search(r'week_?(\d+)', path)
+    return (question.group(1) if question else None, "week" + week.group(1) if week else None)
+
+def pairFiles(answer_files, atc_files, missing=False):
+    #Pairs each answers table with the table with ATC codes of the same question (and week), with missing=True tables without
+    #ATC codes are kept (with None)
+    atc_by_key = {fileKey(path): path for path in atc_files}
+    pairs = []
+    for path in answer_files:
+        question, week = fileKey(path)
+        atc_path = atc_by_key.get((question, week)) or atc_by_key.get((question, None))
+        if atc_path is None and not missing:
+            print("no ATC codes for " + path)
+            continue
+        pairs.append((path, atc_path, question, week))
+    return pairs
+
+def expandFiles(patterns):
+    files = []
+    for pattern in patterns:
+        files += sorted(glob.glob(pattern)) or [pattern]
+    return list(dict.fromkeys(files))
+
+
+class MatchingBack:
+    def __init__(self):
+        parser = OptionParser()
+        parser.add_option("-a","--answers", action="append", default=[], help="tables with PSEUDOIDEXT and Drugname (files or patterns), can be used multiple times")
+        parser.add_option("-c","--atccodes", action="append", default=[], help="tables with the SORTA results mapped to the ATC codes (files or patterns), can be used multiple times")
+        parser.add_option("-o","--output", default=".", help="directory for the output (default: .)")
+        parser.add_option("-s","--store", help="curation store with the reviewed ATC codes of earlier weeks, for the answers that are not in the tables of -c")
+        (options, args) = parser.parse_args()
+
+        store = CurationStore(options.store) if options.store else None
+        pairs = pairFiles(expandFiles(options.answers), expandFiles(options.atccodes), store is not None)
+        if len(pairs) == 0:
+            print("please specify the tables with the answers (-a) and the ATC codes (-c)")
+            return
+        os.makedirs(options.output, exist_ok=True)
+
+        start = time.time()
+        tables = {}
+        for answers_path, atc_path, question, week in pairs:
+            #every table with ATC codes is read and indexed once
+            if atc_path not in tables:
+                tables[atc_path] = AtcTable(readAtcCodes(atc_path)) if atc_path is not None else None
+            df2 = readAnswers(answers_path)
+            table = tables[atc_path] if store is None else withStore(tables[atc_path], df2, store)
+            if table is None:
+                print("no ATC codes for " + answers_path)
+                continue
+            finaldf = table.join(df2)
+
+            name = os.path.join(options.output, (week + "_" if week else "") + "COVID24A" + question + "TXT")
+            writeResult(finaldf, name + "_all.tsv")
+            writeResult(atcOnly(finaldf), name + "_ATC.tsv")
+            print("%s + %s: %d lines" % (answers_path, atc_path or options.store, len(finaldf)))
+        print("%d tables in %.2f s" % (len(pairs), time.time() - start))
+        if store is not None:
+            print("Curation store: " + store.report())
+
+
+if __name__ == '__main__':
+    MatchingBack()
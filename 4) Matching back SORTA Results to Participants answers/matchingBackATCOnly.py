@@ -12,10 +12,9 @@ __date__ = "11/08/2020"
 # Aim of this program is to match the ATC codes to the given answers for all the given answers
 
 
-import pandas as pd
 import csv
 import sys
-import numpy as np
+from matchingBack import readAnswers, readAtcCodes, AtcTable, atcOnly
 
 #default values
 answers = "../../extractedColumns4_week1/COVID24A2TXT_column.csv"
@@ -29,24 +28,15 @@ if len(sys.argv)>2:
 
 #Read the file with the ATC codes
 #try:
-df = pd.read_csv(atccodes, header=0, sep="\t") #read Name, ATC code and the score.
+df = readAtcCodes(atccodes) #read Name, ATC code and the score.
+df2 = readAnswers(answers) #read the participantsID and the drug, whitespaces are stripped
 
-df.rename(columns={"Synonym":"Original"}, inplace=True)
-df2= pd.read_csv(answers, header=0, sep="\t") #read the participantsID and the drug
-#strip whitespaces
-for col in df2.columns:
-        if pd.api.types.is_string_dtype(df2[col]):
-            df2[col] = df2[col].str.strip()
-        df2 = df2.replace({"":np.nan})
-
-#output the headers of the files        
+#output the headers of the files
 print(df.head())
 print(df2.head())
-#take the Table df2 and map the Atccode and the threshold to the drugname 
-finaldf = pd.merge(df2, df, left_on=['Original'], right_on = ['Original'], how = 'left', validate="m:m")
-finaldf = finaldf[['PSEUDOIDEXT', 'Atccode']]
-finaldf.dropna(inplace=True)
-finaldf.drop_duplicates(inplace=True)
+#take the Table df2 and map the Atccode and the threshold to the drugname (see matchingBack.py)
+finaldf = AtcTable(df).join(df2)
+finaldf = atcOnly(finaldf)
 
 #write the results down to a file
 resultpath="result.tsv"
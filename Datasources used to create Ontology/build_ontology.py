@@ -0,0 +1,182 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This program builds the ontology of the drug names for SORTA and the rainbow table with the ATC code of each URI from the sources:
+# - "Dbpedia (Dutch)/dbpedia_corrected.tsv": the URI of the dbpedia resource, its Dutch name and its ATC code
+# - "Original data from sfk (uncurated)/ATC_codes_from_sfk.xlsx": the products of the SFK (column "GPK Omschrijving") and their ATC code
+# The products of the SFK get selfmade URIs: http://www.UMCG.nl/ + the MD5 hash of the lowercase label (see "Pipeline tools/ontology_iri.py"),
+# so a label gets the same URI in every build.
+#
+# The rows of the sources are read one after another (the Excel file from its cache, see "Pipeline tools/workbook_cache.py") and each row is written
+# directly into the output files, no graph is built in memory. Only the URIs that have been written already are kept, so a URI
+# gets its rdfs:label once and each pair of URI and ATC code is written once.
+# The output files are:
+# - the ontology in turtle (default, ontology.ttl) or N-Triples (option -f nt):
+#   <URI> rdfs:label "label" ;
+#       rdfs:subClassOf <http://purl.bioontology.org/ontology/UATC/ATC code> .
+# - the rainbow table (default: rainbowtable_ontology.tsv), tab separated with the columns ontologyTermIRI and Atccode like
+#   rainbowtable_all.tsv
+# The files are written under a temporary name and renamed at the end, so a failed build doesn't leave half a file.
+#
+# The output can't replace rainbowtable_all.tsv (and the ontology used to create it) yet: of its 43834 rows with a UMCG URI
+# (42449 distinct URIs) only 1014 URIs are built from these sources. The other UMCG URIs were made from labels or a source
+# that is not in this repository, so matching the SORTA results of that ontology against the new rainbow table would lose
+# their ATC codes. Use the two outputs together, as a new ontology and its own rainbow table.
+#
+# Examples:
+# python build_ontology.py
+# python build_ontology.py -f nt -o ontology.nt -r rainbowtable_ontology.tsv
+# python build_ontology.py --no-sfk -o dbpedia.ttl        (only the dbpedia names)
+
+import codecs
+import csv
+import os
+import sys
+import time
+from optparse import OptionParser
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(script_dir, "..", "Pipeline tools"))
+from ontology_iri import umcgIri
+from workbook_cache import WorkbookCache
+
+dbpedia_file = os.path.join(script_dir, "Dbpedia (Dutch)", "dbpedia_corrected.tsv")
+sfk_file = os.path.join(script_dir, "Original data from sfk (uncurated)", "ATC_codes_from_sfk.xlsx")
+
+rdfs = "http://www.w3.org/2000/01/rdf-schema#"
+uatc = "http://purl.bioontology.org/ontology/UATC/"
+turtle_prefixes = ["@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .",
+                   "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .",
+                   "@prefix xml: <http://www.w3.org/XML/1998/namespace> .",
+                   "@prefix xsd: <http://www.w3.org/2001/XMLSchema#> ."]
+
+
+def dbpediaRows(path=dbpedia_file):
+    #(URI, label, ATC code) of each line: the dbpedia resource and its Dutch name
+    with codecs.open(path, 'r', encoding="utf-8-sig") as f:
+        reader = csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE)
+        header = next(reader)
+        resource, name, atc = header.index("Resource"), header.index("Name"), header.index("ATC")
+        for row in reader:
+            if len(row) > atc:
+                yield row[resource].strip('"').strip(), row[name].strip('"').strip(), row[atc].strip('"').strip()
+
+def sfkRows(path=sfk_file, column="GPK Omschrijving"):
+    #(URI, label, ATC code) of each product: the selfmade URI of the label
+    for label, atc in WorkbookCache.open(path).sheet(0).rowsOf([column, "ATC"]):
+        if label is None or atc is None:
+            continue
+        label = str(label).strip()
+        if label != "":
+            yield umcgIri(label), label, str(atc).strip()
+
+def escapeLiteral(text):
+    return text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+
+
+class OntologyWriter:
+    def __init__(self, ontology_path, rainbowtable_path, ontology_format="ttl", header=True):
+        self.ontology_path = ontology_path
+        self.rainbowtable_path = rainbowtable_path
+        self.format = ontology_format
+        self.subjects = set()       #URIs with a label
+        self.pairs = set()          #(URI, ATC code) that have been written
+        self.ontology = codecs.open(ontology_path + ".tmp", 'w', encoding="utf-8")
+        self.rainbowtable = codecs.open(rainbowtable_path + ".tmp", 'w', encoding="utf-8")
+        if self.format == "ttl":
+            self.ontology.write("\n".join(turtle_prefixes) + "\n\n")
+        if header:
+            self.rainbowtable.write("ontologyTermIRI\tAtccode\n")
+
+    def add(self, iri, label, atc):
+        #Writes the label of a new URI and the ATC code if this pair is new, returns True if anything was written
+        new_subject = iri not in self.subjects and label != ""
+        new_pair = atc != "" and (iri, atc) not in self.pairs
+        if new_subject:
+            self.subjects.add(iri)
+        if new_pair:
+            self.pairs.add((iri, atc))
+            self.rainbowtable.write(iri + "\t" + atc + "\n")
+        if self.format == "ttl":
+            if new_subject and new_pair:
+                self.ontology.write('<%s> rdfs:label "%s" ;\n    rdfs:subClassOf <%s%s> .\n\n' % (iri, escapeLiteral(label), uatc, atc))
+            elif new_subject:
+                self.ontology.write('<%s> rdfs:label "%s" .\n\n' % (iri, escapeLiteral(label)))
+            elif new_pair:
+                self.ontology.write('<%s> rdfs:subClassOf <%s%s> .\n\n' % (iri, uatc, atc))
+        else:
+            if new_subject:
+                self.ontology.write('<%s> <%slabel> "%s" .\n' % (iri, rdfs, escapeLiteral(label)))
+            if new_pair:
+                self.ontology.write('<%s> <%ssubClassOf> <%s%s> .\n' % (iri, rdfs, uatc, atc))
+        return new_subject or new_pair
+
+    def addRows(self, rows):
+        #Returns the number of rows and the number of rows that added something
+        count = added = 0
+        for iri, label, atc in rows:
+            count += 1
+            if self.add(iri, label, atc):
+                added += 1
+        return count, added
+
+    def close(self):
+        self.ontology.close()
+        self.rainbowtable.close()
+        os.replace(self.ontology_path + ".tmp", self.ontology_path)
+        os.replace(self.rainbowtable_path + ".tmp", self.rainbowtable_path)
+
+    def abort(self):
+        self.ontology.close()
+        self.rainbowtable.close()
+        for path in [self.ontology_path + ".tmp", self.rainbowtable_path + ".tmp"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def buildOntology(sources, ontology_path, rainbowtable_path, ontology_format="ttl", header=True):
+    #sources: list of (name, rows), returns the numbers of rows and of rows that added something per source
+    writer = OntologyWriter(ontology_path, rainbowtable_path, ontology_format, header)
+    counts = []
+    try:
+        for name, rows in sources:
+            counts.append((name,) + writer.addRows(rows))
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return counts
+
+
+class OntologyBuilder:
+    def __init__(self):
+        parser = OptionParser()
+        parser.add_option("-d","--dbpedia", default=dbpedia_file, help="the dbpedia names (default: Dbpedia (Dutch)/dbpedia_corrected.tsv)")
+        parser.add_option("-s","--sfk", default=sfk_file, help="the products of the SFK (default: Original data from sfk (uncurated)/ATC_codes_from_sfk.xlsx)")
+        parser.add_option("--no-sfk", action="store_true", help="don't use the products of the SFK")
+        parser.add_option("--no-dbpedia", action="store_true", help="don't use the dbpedia names")
+        parser.add_option("-f","--format", default="ttl", choices=["ttl", "nt"], help="format of the ontology: ttl (turtle) or nt (N-Triples) (default: ttl)")
+        parser.add_option("-o","--output", help="the ontology file (default: ontology.ttl or ontology.nt)")
+        parser.add_option("-r","--rainbowtable", default="rainbowtable_ontology.tsv", help="the rainbow table (default: rainbowtable_ontology.tsv)")
+        parser.add_option("--no-header", action="store_true", help="write the rainbow table without the header line (like dbpedia_rainbowtable.tsv)")
+        (options, args) = parser.parse_args()
+
+        sources = []
+        if not options.no_dbpedia:
+            sources.append(("dbpedia", dbpediaRows(options.dbpedia)))
+        if not options.no_sfk:
+            sources.append(("sfk", sfkRows(options.sfk)))
+        output = options.output or "ontology." + options.format
+
+        start = time.time()
+        for name, count, added in buildOntology(sources, output, options.rainbowtable, options.format, not options.no_header):
+            print("%s: %d rows, %d rows with a new URI or ATC code" % (name, count, added))
+        print("%s and %s written in %.2f s" % (output, options.rainbowtable, time.time() - start))
+
+
+if __name__ == '__main__':
+    OntologyBuilder()
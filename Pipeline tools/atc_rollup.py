@@ -0,0 +1,238 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This program rolls up the ATC codes of the final results to the ATC levels 1-5 and counts the participants per week and code.
+#
+# The final results are pairs of PSEUDOIDEXT and ATC code at different levels ("A10A", "R05CA", "C03CA01", ...):
+# - "Medication_use_multiplechoice.tsv" of step 1 (columns PSEUDOIDEXT and ATC)
+# - "..._COVID24A*TXT_ATC.tsv" of step 4 (columns PSEUDOIDEXT and Atccode)
+# The files of all sources and weeks are put together. The week of a file is taken from its name ("week1", ...), files without
+# week in their name belong to the week given with -w. A participant is counted once per week and code, even if the code was
+# found in several questions or in both the multiple choice and the free text answers.
+#
+# The hierarchy is taken from "Nice to get an overview/ATC Levels.xlsx" (the codes of all levels and their labels, see
+# workbook_cache.py). The level of a code is given by its length (1, 3, 4, 5 or 7 characters), its ancestors are its prefixes of
+# these lengths. Codes of the results that are not in the file (e.g. new codes) are added with their prefixes.
+# Every code gets an integer id, and AtcHierarchy.ancestors is a table with the id of the ancestor of each code at each level
+# (-1 if the code is less specific than the level). After the codes and the participants have been translated to integer ids
+# once, the rollup to a level and the counts per week are numpy operations on the integer arrays (sorting, np.bincount).
+#
+# Output (option -o, default: atc_rollup.tsv): week, level, ATC, label and the number of participants, for the levels given
+# with -l (default: 1,2,3,4,5). With -p the participants and their codes at the first of these levels are written, too.
+#
+# Example:
+# python atc_rollup.py -l 1,3 ../../Medication_use_multiplechoice_week*.tsv ../../results/week*_COVID24A*TXT_ATC.tsv
+
+import glob
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from optparse import OptionParser
+from workbook_cache import WorkbookCache
+
+tools_dir = os.path.dirname(os.path.abspath(__file__))
+atc_levels_file = os.path.join(tools_dir, "..", "Nice to get an overview", "ATC Levels.xlsx")
+
+
+class AtcHierarchy:
+    lengths = [1, 3, 4, 5, 7]   #length of the codes of the levels 1-5
+
+    def __init__(self):
+        self.codes = []         #id -> code
+        self.index = {}         #code -> id
+        self.labels = {}        #code -> label of ATC Levels.xlsx
+        self.rows = []          #id -> ids of the ancestors at the levels 1-5
+        self.table = np.empty((0, 5), dtype=np.int32)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @classmethod
+    def fromLevels(cls, path=atc_levels_file, sheet_name="Tabelle1"):
+        hierarchy = cls()
+        sheet = WorkbookCache.open(path).sheet(sheet_name)
+        for class_id, label in sheet.rowsOf(["Class ID", "Preferred Label"]):
+            if class_id is None:
+                continue
+            code = class_id.rsplit("/", 1)[-1]
+            if hierarchy.id(code) >= 0 and label is not None:
+                hierarchy.labels[hierarchy.clean(code)] = label
+        return hierarchy
+
+    @staticmethod
+    def clean(code):
+        return code.strip().upper()
+
+    @classmethod
+    def level(cls, code):
+        #1-5, None for a code that isn't an ATC code
+        if len(code) in cls.lengths and code[:1].isalpha():
+            return cls.lengths.index(len(code)) + 1
+        return None
+
+    def id(self, code):
+        #The id of a code, it is added with its prefixes if it's new (-1 for texts that aren't ATC codes)
+        code = self.clean(code)
+        known = self.index.get(code)
+        if known is not None:
+            return known
+        level = self.level(code)
+        if level is None:
+            return -1
+        parents = [self.id(code[:length]) for length in self.lengths[:level - 1]]
+        code_id = len(self.codes)
+        self.codes.append(code)
+        self.index[code] = code_id
+        self.rows.append(parents + [code_id] + [-1] * (5 - level))
+        return code_id
+
+    def ids(self, codes):
+        #The ids of many codes, each distinct code is looked up once
+        keys, uniques = pd.factorize(pd.Series(codes, dtype=object))
+        unique_ids = np.array([self.id(code) if isinstance(code, str) else -1 for code in uniques] + [-1], dtype=np.int32)
+        return unique_ids[keys]
+
+    @property
+    def ancestors(self):
+        #Table (codes x 5 levels) with the id of the ancestor at each level, -1 below the level of the code
+        if len(self.table) != len(self.rows):
+            self.table = np.array(self.rows, dtype=np.int32).reshape(-1, 5)
+        return self.table
+
+    def rollup(self, code_ids, level):
+        #The ids of the ancestors at a level (1-5), -1 for codes that are less specific
+        return self.ancestors[code_ids, level - 1]
+
+    def label(self, code_id):
+        return self.labels.get(self.codes[code_id], "")
+
+
+class AtcRollup:
+    #The pairs of participant, week and ATC code of all sources, as integer arrays without duplicates
+    def __init__(self, hierarchy=None):
+        self.hierarchy = AtcHierarchy.fromLevels() if hierarchy is None else hierarchy
+        self.tables = []        #(participants, week, code ids) of each added table
+        self.participants = np.empty(0, dtype=object)
+        self.weeks = []
+        self.pairs = None
+        self.unknown = 0        #values that aren't ATC codes
+
+    def add(self, participants, codes, week):
+        #Adds the codes of a table (a cell can contain several codes separated by commas)
+        df = pd.DataFrame({"participant": participants, "code": codes}, dtype=object).dropna()
+        if df["code"].str.contains(",", regex=False).any():
+            df = df.assign(code=df["code"].str.split(",")).explode("code")
+        code_ids = self.hierarchy.ids(df["code"].to_numpy())
+        self.unknown += int((code_ids < 0).sum())
+        keep = code_ids >= 0
+        self.tables.append((df["participant"].to_numpy()[keep], str(week), code_ids[keep]))
+        self.pairs = None
+
+    def addFile(self, path, week=None):
+        df = pd.read_csv(path, sep="\t", dtype=str)
+        column = "Atccode" if "Atccode" in df.columns else "ATC"
+        self.add(df["PSEUDOIDEXT"].str.strip(), df[column], fileWeek(path) or week or "")
+        return len(df)
+
+    def table(self):
+        #participant, week and code ids of all the tables, each combination once
+        if self.pairs is None:
+            tables = self.tables or [(np.empty(0, dtype=object), "", np.empty(0, dtype=np.int32))]
+            participants, uniques = pd.factorize(np.concatenate([table[0] for table in tables]))
+            self.participants = np.asarray(uniques, dtype=object)
+            self.weeks = sorted(set(table[1] for table in tables), key=weekKey)
+            week_ids = {week: number for number, week in enumerate(self.weeks)}
+            weeks = np.repeat(np.array([week_ids[table[1]] for table in tables], dtype=np.int32), [len(table[2]) for table in tables])
+            codes = np.concatenate([table[2] for table in tables])
+            self.pairs = self.unique(participants.astype(np.int32), weeks, codes)
+        return self.pairs
+
+    def unique(self, participants, weeks, codes):
+        #Removes duplicate combinations: one int64 key per combination, sorted
+        codes_count = max(len(self.hierarchy), 1)
+        participants_count = max(len(self.participants), 1)
+        keys = (weeks.astype(np.int64) * participants_count + participants) * codes_count + codes
+        keys = sortedUnique(keys)
+        return ((keys // codes_count) % participants_count).astype(np.int32), \
+               (keys // codes_count // participants_count).astype(np.int32), (keys % codes_count).astype(np.int32)
+
+    def atLevel(self, level):
+        #participant, week and code ids at a level, each participant is counted once per week and code
+        participants, weeks, codes = self.table()
+        codes = self.hierarchy.rollup(codes, level)
+        keep = codes >= 0
+        return self.unique(participants[keep], weeks[keep], codes[keep])
+
+    def counts(self, level):
+        #Number of participants per week and code at a level
+        participants, weeks, codes = self.atLevel(level)
+        codes_count = max(len(self.hierarchy), 1)
+        counts = np.bincount(weeks.astype(np.int64) * codes_count + codes, minlength=len(self.weeks) * codes_count)
+        week_ids, code_ids = np.divmod(np.flatnonzero(counts), codes_count)
+        return pd.DataFrame({"week": np.array(self.weeks, dtype=object)[week_ids] if len(week_ids) else [],
+                             "level": level,
+                             "ATC": [self.hierarchy.codes[code_id] for code_id in code_ids],
+                             "label": [self.hierarchy.label(code_id) for code_id in code_ids],
+                             "participants": counts[counts > 0]})
+
+    def participantCodes(self, level):
+        #PSEUDOIDEXT, week and ATC code at a level
+        participants, weeks, codes = self.atLevel(level)
+        return pd.DataFrame({"PSEUDOIDEXT": np.array(self.participants, dtype=object)[participants] if len(participants) else [],
+                             "week": np.array(self.weeks, dtype=object)[weeks] if len(weeks) else [],
+                             "ATC": np.array(self.hierarchy.codes, dtype=object)[codes] if len(codes) else []})
+
+
+def sortedUnique(keys):
+    #Like np.unique for integer keys, but by sorting (faster than np.unique for millions of keys)
+    keys = np.sort(keys)
+    return keys[np.concatenate([[True], keys[1:] != keys[:-1]])] if len(keys) else keys
+
+def weekKey(week):
+    #week2 before week10
+    number = re.search(r'\d+', week)
+    return (int(number.group(0)) if number else -1, week)
+
+def fileWeek(path):
+    #"week1" for ../extractedColumns4_week1/... or Medication_use_multiplechoice_week1.tsv
+    week = re.search(r'week_?(\d+)', path)
+    return "week" + week.group(1) if week else None
+
+
+class Rollup:
+    def __init__(self):
+        parser = OptionParser(usage="%prog [options] result files or patterns")
+        parser.add_option("-l","--levels", default="1,2,3,4,5", help="the ATC levels, separated by commas (default: 1,2,3,4,5)")
+        parser.add_option("-w","--week", default="week", help="week of the files without week in their name (default: week)")
+        parser.add_option("-a","--atc-levels", default=atc_levels_file, help="the hierarchy of the ATC codes (default: Nice to get an overview/ATC Levels.xlsx)")
+        parser.add_option("-o","--output", default="atc_rollup.tsv", help="file for the numbers of participants (default: atc_rollup.tsv)")
+        parser.add_option("-p","--participants", help="file for the participants and their codes at the first level given with -l")
+        (options, args) = parser.parse_args()
+
+        levels = [int(level) for level in options.levels.split(",")]
+        paths = [path for argument in args for path in sorted(glob.glob(argument)) or [argument]]
+        if not paths:
+            parser.error("no result files given")
+
+        start = time.time()
+        rollup = AtcRollup(AtcHierarchy.fromLevels(options.atc_levels))
+        rows = sum(rollup.addFile(path, options.week) for path in paths)
+        participants, weeks, codes = rollup.table()
+        print("%d files, %d rows, %d participants, %d weeks, %d pairs without duplicates, %d values without ATC code (%.2f s)"
+              % (len(paths), rows, len(rollup.participants), len(rollup.weeks), len(codes), rollup.unknown, time.time() - start))
+
+        start = time.time()
+        pd.concat([rollup.counts(level) for level in levels]).to_csv(options.output, sep="\t", index=False)
+        if options.participants:
+            rollup.participantCodes(levels[0]).to_csv(options.participants, sep="\t", index=False)
+        print("rollup to the levels %s in %.2f s" % (options.levels, time.time() - start))
+
+
+if __name__ == '__main__':
+    Rollup()
@@ -0,0 +1,247 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This program measures the time and the memory of the steps of the pipeline on synthetic data (see synthetic_data.py),
+# so the speed of the programs can be compared between versions without the private Lifelines data.
+#
+# For every number of participants (option -n, e.g. "-n 1000,10000,100000") a week file is created and the steps are run on it:
+# - extract_hardcoded_ATC   step 1, the multiple choice questions
+# - extract_drugs4          step 2, the free text questions (without answer cache)
+# - Matcher_long_format     step 3, the ATC codes of the synthetic SORTA results in long format
+# - Matcher_wide_format     step 3, the same in wide format
+# - matchingBack            step 4, the ATC codes matched back to the participants (both outputs)
+# The SORTA results between step 2 and 3 are created by synthetic_data.py, they are not measured.
+#
+# Every step runs in a new process, so the peak memory (resident set size) belongs to this step only (it includes the
+# Python interpreter and the imported modules, which are loaded before the time is measured). With -r the steps are run
+# several times, the shortest time and the highest memory are kept.
+#
+# The results are appended as JSON lines to the file given with -o (default: benchmark_results.jsonl), one line per step and
+# size, with the git commit, the versions of Python, pandas and numpy and the date, so the results of several versions
+# can be collected in one file. With -c the results are compared with the last results of another file (or of another commit
+# in the same file): steps that became slower than the tolerance (option --tolerance) are marked, and the program ends
+# with exit code 1.
+
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from optparse import OptionParser
+
+tools_dir = os.path.dirname(os.path.abspath(__file__))
+step_dirs = [os.path.join(tools_dir, "..", name) for name in ["1) Extract hardcoded question results",
+                                                              "2) Extract and preprocess free text answers",
+                                                              "3) Matching SORTA Results with ATC codes",
+                                                              "4) Matching back SORTA Results to Participants answers"]]
+sys.path.extend(step_dirs)
+import questionnaire_reader
+import synthetic_data
+
+stages = ["extract_hardcoded_ATC", "extract_drugs4", "Matcher_long_format", "Matcher_wide_format", "matchingBack"]
+
+
+def peakMemory():
+    #Peak memory of this process in MB. ru_maxrss (questionnaire_reader.peakMemory) is kept by a new process that is started from
+    #this one, so the high water mark of /proc/self/status is used where it exists
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return questionnaire_reader.peakMemory()
+
+
+#The steps, each one is run in a new process
+
+def extractHardcoded(work_dir):
+    import extract_hardcoded_ATC
+    week_file = os.path.join(work_dir, "covid19-week1-1.dat")
+    start = time.time()
+    hardcoded = extract_hardcoded_ATC.readHardcodedQuestions(synthetic_data.hardcoded_file)
+    id_column = questionnaire_reader.readHeader(week_file)[0]
+    contents = questionnaire_reader.readColumns(week_file, lambda col: False, [row[0] for row in hardcoded], id_column)
+    extract_hardcoded_ATC.writeResults(os.path.join(work_dir, "Medication_use_multiplechoice.tsv"),
+                                       extract_hardcoded_ATC.extractAnswers(hardcoded, contents, id_column))
+    return time.time() - start
+
+def extractFreeText(work_dir, without_punkt=False):
+    import extract_drugs4
+    import resources
+    from answer_cache import AnswerCache
+    if without_punkt:
+        resources.allowLineTokenizer()
+    resources.dutch_stopwords()
+    resources.word_tokenizer()
+    output_dir = os.path.join(work_dir, "extractedColumns4")
+    os.makedirs(os.path.join(output_dir, "anonymous"), exist_ok=True)
+    start = time.time()
+    df = extract_drugs4.readAnswers(os.path.join(work_dir, "covid19-week1-1.dat"))
+    cache = AnswerCache()
+    for question in range(2, 11):
+        extract_drugs4.extractQuestion(df, question, cache, output_dir)
+    return time.time() - start
+
+def processedFiles(work_dir):
+    anonymous_dir = os.path.join(work_dir, "extractedColumns4", "anonymous")
+    return sorted(os.path.join(anonymous_dir, name) for name in os.listdir(anonymous_dir) if name.endswith("_processed.csv"))
+
+def matchAtcCodes(work_dir, formats, rainbowtable_path):
+    import Matcher
+    from atc_index import AtcIndex
+    AtcIndex.open(rainbowtable_path)
+    start = time.time()
+    Matcher.matchFiles(processedFiles(work_dir), formats, rainbowtable_path)
+    return time.time() - start
+
+def matchBack(work_dir):
+    import extract_drugs4
+    import matchingBack
+    output_dir = os.path.join(work_dir, "extractedColumns4")
+    start = time.time()
+    for path in processedFiles(work_dir):
+        question = matchingBack.fileKey(path)[0]
+        finaldf = matchingBack.AtcTable(matchingBack.readAtcCodes(path.replace(".csv", "long_format.tsv"))).join(
+                  matchingBack.readAnswers(extract_drugs4.columnFile(output_dir, question)))
+        name = os.path.join(work_dir, "COVID24A" + question + "TXT")
+        matchingBack.writeResult(finaldf, name + "_all.tsv")
+        matchingBack.writeResult(matchingBack.atcOnly(finaldf), name + "_ATC.tsv")
+    return time.time() - start
+
+def runStage(stage, work_dir, rainbowtable_path, without_punkt=False):
+    #Runs in its own process: returns the seconds and the peak memory in MB
+    if stage == "extract_hardcoded_ATC":
+        seconds = extractHardcoded(work_dir)
+    elif stage == "extract_drugs4":
+        seconds = extractFreeText(work_dir, without_punkt)
+    elif stage == "Matcher_long_format":
+        seconds = matchAtcCodes(work_dir, ("long",), rainbowtable_path)
+    elif stage == "Matcher_wide_format":
+        seconds = matchAtcCodes(work_dir, ("wide",), rainbowtable_path)
+    else:
+        seconds = matchBack(work_dir)
+    return seconds, peakMemory()
+
+def measure(stage, work_dir, rainbowtable_path, without_punkt=False):
+    #A new process for every run ("spawn" doesn't inherit the memory of this process)
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(runStage, stage, work_dir, rainbowtable_path, without_punkt).result()
+
+
+def gitCommit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=tools_dir, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    return {"date": datetime.datetime.now().isoformat(timespec="seconds"), "commit": gitCommit(), "python": platform.python_version(),
+            "pandas": pd.__version__, "numpy": np.__version__, "platform": platform.platform()}
+
+def prepare(work_dir, rows, seed):
+    #The week file with this number of participants (the SORTA results are made after step 2)
+    os.makedirs(work_dir, exist_ok=True)
+    generator = synthetic_data.QuestionnaireGenerator(seed)
+    generator.writeWeek(os.path.join(work_dir, "covid19-week1-1.dat"), rows, synthetic_data.hardcodedColumns())
+
+def createSortaResults(work_dir, seed, rainbowtable_path):
+    generator = synthetic_data.SortaGenerator(seed, rainbowtable_path)
+    anonymous_dir = os.path.join(work_dir, "extractedColumns4", "anonymous")
+    for name in sorted(os.listdir(anonymous_dir)):
+        if name.endswith("_anonymous.csv"):
+            generator.writeResults(os.path.join(anonymous_dir, name))
+
+def readResults(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip() != ""]
+
+def compareResults(results, baseline, tolerance):
+    #Compares with the last baseline result of the same step and size, returns the number of steps that became slower
+    last = {}
+    for result in baseline:
+        last[(result["stage"], result["rows"])] = result
+    slower = 0
+    for result in results:
+        before = last.get((result["stage"], result["rows"]))
+        if before is None:
+            continue
+        ratio = result["seconds"] / max(before["seconds"], 1e-9)
+        mark = ""
+        if ratio > 1 + tolerance:
+            mark = "  SLOWER"
+            slower += 1
+        print("%-22s %9d  %8.2f s -> %8.2f s  (x%.2f)%s" % (result["stage"], result["rows"], before["seconds"], result["seconds"], ratio, mark))
+    return slower
+
+
+class Benchmark:
+    def __init__(self):
+        parser = OptionParser()
+        parser.add_option("-n","--rows", default="1000,10000,100000", help="numbers of participants, separated by commas (default: 1000,10000,100000)")
+        parser.add_option("-s","--stages", default=",".join(stages), help="the steps to measure, separated by commas (default: all)")
+        parser.add_option("-r","--repeat", type="int", default=1, help="number of runs of each step (default: 1)")
+        parser.add_option("-w","--work", default="./benchmark_data", help="directory for the synthetic data and the outputs (default: ./benchmark_data)")
+        parser.add_option("-o","--output", default="benchmark_results.jsonl", help="file the results are appended to (default: benchmark_results.jsonl)")
+        parser.add_option("-c","--compare", help="file with earlier results to compare with (can be the same as -o)")
+        parser.add_option("--tolerance", type="float", default=0.2, help="a step is marked as slower if it takes this share longer than before (default: 0.2)")
+        parser.add_option("--seed", type="int", default=0, help="seed of the synthetic data (default: 0)")
+        parser.add_option("--rainbowtable", default=synthetic_data.rainbowtable_file, help="the table with the URIs and their ATC codes")
+        parser.add_option("--without-punkt", action="store_true", help="step 2: tokenize without sentence splitting if the punkt model of NLTK is missing")
+        (options, args) = parser.parse_args()
+
+        selected = options.stages.split(",")
+        unknown = [stage for stage in selected if stage not in stages]
+        if unknown:
+            print("unknown steps: " + ", ".join(unknown))
+            sys.exit(1)
+
+        #the results of this commit are compared with the earlier ones only
+        info = environment()
+        baseline = readResults(options.compare) if options.compare else []
+        baseline = [result for result in baseline if info["commit"] is None or result.get("commit") != info["commit"]]
+
+        results = []
+        print("%-22s %9s  %10s  %10s" % ("step", "rows", "time", "memory"))
+        for rows in [int(value) for value in options.rows.split(",")]:
+            work_dir = os.path.join(options.work, str(rows))
+            prepare(work_dir, rows, options.seed)
+            for stage in stages:
+                #the steps depend on the outputs of the steps before, they are run (once) even if they aren't measured
+                runs = [measure(stage, work_dir, options.rainbowtable, options.without_punkt) for i in range(options.repeat if stage in selected else 1)]
+                if stage == "extract_drugs4":
+                    createSortaResults(work_dir, options.seed, options.rainbowtable)
+                if stage not in selected:
+                    continue
+                seconds = min(run[0] for run in runs)
+                memory = max(run[1] for run in runs) if runs[0][1] is not None else None
+                result = dict(info, stage=stage, rows=rows, seconds=round(seconds, 4),
+                              peak_memory_mb=round(memory, 1) if memory is not None else None, repeat=options.repeat)
+                results.append(result)
+                print("%-22s %9d  %8.2f s  %s" % (stage, rows, seconds, "%7.0f MB" % memory if memory is not None else "      -"))
+
+        with open(options.output, "a") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+        print("results appended to " + options.output)
+
+        if baseline:
+            if compareResults(results, baseline, options.tolerance) > 0:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    Benchmark()
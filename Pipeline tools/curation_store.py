@@ -0,0 +1,107 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This module keeps the curated results of earlier weeks, so answers that were already mapped and reviewed don't have to go through
+# SORTA and the manual review again.
+#
+# The store is a tab separated file (default: curation_store.tsv) with the columns of the long format of step 3
+# (Name, Synonym, ontologyTermName, score, validated, Atccode, review). The lines are grouped by the normalized Synonym
+# (lowercase, single spaces), which is the key of the store.
+#
+# - Feeding: python curation_store.py add <reviewed long format files>
+#   All the lines of a reviewed file are added. If a Synonym is already in the store, its lines are replaced by the new ones.
+# - Step 2 (extract_drugs4.py, batch_extract.py, extract_week.py with the option --curation-store) writes only the Synonyms
+#   that are not in the store into the anonymous files for SORTA.
+# - Step 4 (matchingBack.py with the option -s) takes the ATC codes of the known Synonyms from the store.
+#
+# The number of known (hits) and unknown (misses) Synonyms are counted and can be shown with report().
+
+import csv
+import os
+import sys
+import pandas as pd
+from optparse import OptionParser
+
+columns = ['Name', 'Synonym', 'ontologyTermName', 'score', 'validated', 'Atccode', 'review']
+
+
+def normalizeSynonym(synonym):
+    if not isinstance(synonym, str):
+        return synonym
+    return " ".join(synonym.lower().split())
+
+
+class CurationStore:
+    def __init__(self, path="curation_store.tsv"):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            self.df = pd.read_csv(path, sep="\t", header=0, dtype={'Name': str, 'Synonym': str, 'Atccode': str})
+        else:
+            self.df = pd.DataFrame(columns=columns)
+        self.index()
+
+    def index(self):
+        self.keys = pd.Index(self.df['Synonym'].map(normalizeSynonym).dropna().unique())
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, df):
+        #Adds the lines of a reviewed long format table, the lines of Synonyms that are already known are replaced
+        df = df[[col for col in columns if col in df.columns]].dropna(subset=['Synonym'])
+        new_keys = set(df['Synonym'].map(normalizeSynonym))
+        kept = self.df[~self.df['Synonym'].map(normalizeSynonym).isin(new_keys)]
+        self.df = pd.concat([kept, df], ignore_index=True)
+        self.index()
+        return len(new_keys)
+
+    def known(self, synonyms):
+        #True for each synonym that is in the store, counts the hits and misses of the distinct synonyms
+        keys = pd.Series(synonyms, dtype=object).map(normalizeSynonym)
+        found = self.keys.get_indexer(keys) >= 0
+        distinct = pd.DataFrame({'key': keys, 'found': found}).drop_duplicates('key')
+        self.hits += int(distinct['found'].sum())
+        self.misses += int((~distinct['found']).sum())
+        return found
+
+    def lines(self, synonyms):
+        #The lines of the store for the given synonyms, the column Synonym contains the synonym as given (not normalized)
+        keys = pd.Series(pd.unique(pd.Series(synonyms, dtype=object).dropna()), dtype=object)
+        wanted = pd.DataFrame({'Synonym': keys, 'key': keys.map(normalizeSynonym)})
+        store = self.df.drop(columns='Synonym').assign(key=self.df['Synonym'].map(normalizeSynonym))
+        return wanted.merge(store, on='key', how='inner').drop(columns='key')[[col for col in columns if col in self.df.columns]]
+
+    def save(self):
+        self.df.to_csv(self.path, sep="\t", index=False, quoting=csv.QUOTE_MINIMAL)
+
+    def report(self):
+        total = self.hits + self.misses
+        return "%d synonyms in the store, %d known (%.1f%%), %d new" % (len(self), self.hits, 100.0 * self.hits / max(total, 1), self.misses)
+
+
+class CurationStoreTool:
+    def __init__(self):
+        parser = OptionParser(usage="%prog [options] add <reviewed long format files> | show")
+        parser.add_option("-s","--store", default="curation_store.tsv", help="the curation store (default: curation_store.tsv)")
+        (options, args) = parser.parse_args()
+
+        store = CurationStore(options.store)
+        if len(args) > 1 and args[0] == "add":
+            for path in args[1:]:
+                added = store.add(pd.read_csv(path, sep="\t", header=0, dtype={'Name': str, 'Synonym': str, 'Atccode': str}))
+                print("%s: %d synonyms" % (path, added))
+            store.save()
+        elif len(args) == 0 or args[0] != "show":
+            print("please specify add <files> or show")
+            sys.exit(1)
+        print("%s: %d synonyms, %d lines" % (options.store, len(store), len(store.df)))
+
+
+if __name__ == '__main__':
+    CurationStoreTool()
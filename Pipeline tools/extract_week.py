@@ -0,0 +1,135 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This program does the extraction of step 1 ("1) Extract hardcoded question results/extract_hardcoded_ATC.py") and
+# step 2 ("2) Extract and preprocess free text answers/extract_drugs4.py") with a single reading of each week file.
+#
+# Both programs need the ID of the participants and a few columns of the same questionnaire file. This program reads the ID,
+# the columns of the hardcoded multiple choice questions and the free text columns together (see questionnaire_reader.py),
+# so both outputs are made from the same reading of the file:
+# - "Medication_use_multiplechoice.tsv" (like extract_hardcoded_ATC.py)
+# - "extractedColumns4/COVID24A*TXT_column.csv" and "extractedColumns4/anonymous/COVID24A*TXT_column_anonymous.csv" (like extract_drugs4.py)
+#
+# The week file is given with -d (default: "../../data/raw/covid_questionnaires/week1/covid19-week1-1.dat").
+# Several weeks can be given as arguments (files, patterns or directories). In this case the output files get the name of the week
+# ("Medication_use_multiplechoice_week1.tsv" and "extractedColumns4_week1/").
+# The output is written into the current directory or the directory given with -o.
+#
+# The time needed for reading, for the multiple choice questions and for the free text questions is shown for each week.
+
+import os
+import re
+import sys
+import time
+from optparse import OptionParser
+
+tools_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(tools_dir, "..", "1) Extract hardcoded question results"))
+sys.path.append(os.path.join(tools_dir, "..", "2) Extract and preprocess free text answers"))
+import extract_hardcoded_ATC
+import extract_drugs4
+import questionnaire_reader
+from answer_cache import AnswerCache
+from curation_store import CurationStore
+from rule_profile import RuleProfile
+from term_dictionary import TermDictionary
+
+
+def outputNames(paths, output):
+    #Medication_use_multiplechoice.tsv and extractedColumns4 for one week, with the name of the week for several weeks
+    if len(paths) == 1:
+        return {paths[0]: (os.path.join(output, "Medication_use_multiplechoice.tsv"), os.path.join(output, "extractedColumns4"))}
+    weeks = questionnaire_reader.weekNames(paths)
+    return {path: (os.path.join(output, "Medication_use_multiplechoice_" + weeks[path] + ".tsv"),
+                   os.path.join(output, "extractedColumns4_" + weeks[path])) for path in paths}
+
+def readWeek(path, hardcoded):
+    #The ID, the multiple choice columns of the hardcoded questions and the free text columns
+    header = questionnaire_reader.readHeader(path)
+    expected = re.compile('|'.join(extract_drugs4.potentialColumns()))
+    flag_columns = [row[0] for row in hardcoded]
+    df = questionnaire_reader.readColumns(path, lambda col: expected.search(col) is not None, flag_columns, header[0])
+    return df, header[0]
+
+
+class WeekExtractor:
+    def __init__(self):
+        parser = OptionParser(usage="%prog [options] [week files, patterns or directories]")
+        parser.add_option("-d","--datasources", help="load the datasource file")
+        parser.add_option("-o","--output", default=".", help="directory for the output files (default: .)")
+        parser.add_option("-q","--questions", default=os.path.join(tools_dir, "..", "1) Extract hardcoded question results", "hardcoded_ATC_questions_week1-6.tsv"),
+                          help="file with the hardcoded questions and their ATC codes (default: hardcoded_ATC_questions_week1-6.tsv of step 1)")
+        parser.add_option("-c","--cache", default="./answer_cache.pickle", help="file to keep the processed answers between runs (default: ./answer_cache.pickle)")
+        parser.add_option("--cache-size", type="int", default=500000, help="maximal number of answers in the cache (default: 500000)")
+        parser.add_option("--no-cache", action="store_true", help="don't load or save the answer cache file")
+        parser.add_option("-e","--excludefile", action="append", default=[], help="file with additional words to exclude (one per line), can be used multiple times")
+        parser.add_option("--curation-store", help="write only the synonyms that are not in this curation store into the anonymous files (see curation_store.py)")
+        parser.add_option("--profile", help="measure the time and the changes of every cleaning rule of step 2, write them into this JSON file and show a summary")
+        parser.add_option("--spelling", action="store_true", help="correct misspelled drug and manufacturer names in the terms of step 2 (see spelling_corrector.py)")
+        parser.add_option("--without-punkt", action="store_true", help="tokenize the answers without sentence splitting if the punkt model of NLTK is missing (the terms can differ from the ones with the model)")
+        (options, args) = parser.parse_args()
+
+        paths = ["../../data/raw/covid_questionnaires/week1/covid19-week1-1.dat"]
+        if options.datasources:
+            paths = [options.datasources]
+        if args:
+            paths = questionnaire_reader.weekFiles(([options.datasources] if options.datasources else []) + args)
+        outputs = outputNames(paths, options.output)
+
+        hardcoded = extract_hardcoded_ATC.readHardcodedQuestions(options.questions)
+        for termfile in options.excludefile:
+            extract_drugs4.exclude_words.extend(TermDictionary.from_file(termfile))
+        if options.spelling:
+            extract_drugs4.useSpellingCorrection()
+        if options.without_punkt:
+            extract_drugs4.resources.allowLineTokenizer()
+        if options.no_cache:
+            cache = AnswerCache(max_size=options.cache_size)
+        else:
+            cache = AnswerCache(options.cache, options.cache_size, extract_drugs4.cacheFingerprint())
+        store = CurationStore(options.curation_store) if options.curation_store else None
+        if options.profile:
+            extract_drugs4.profile = RuleProfile()
+            extract_drugs4.resources.word_tokenizer()
+            extract_drugs4.resources.dutch_stopwords()
+
+        for path in paths:
+            print(path)
+            multiplechoice_file, output_dir = outputs[path]
+            os.makedirs(os.path.join(output_dir, "anonymous"), exist_ok=True)
+
+            start = time.time()
+            df, id_column = readWeek(path, hardcoded)
+            print(questionnaire_reader.report())
+            read_time = time.time() - start
+
+            #Step 1: the multiple choice questions
+            start = time.time()
+            extract_hardcoded_ATC.writeResults(multiplechoice_file, extract_hardcoded_ATC.extractAnswers(hardcoded, df, id_column))
+            multiplechoice_time = time.time() - start
+
+            #Step 2: the free text questions
+            start = time.time()
+            for question in range(2,11):
+                extract_drugs4.extractQuestion(df, question, cache, output_dir, store)
+            freetext_time = time.time() - start
+
+            print("Timings: reading %.2f s, multiple choice %.2f s, free text %.2f s" % (read_time, multiplechoice_time, freetext_time))
+
+        cache.save()
+        print("Answer cache: " + cache.report())
+        if store is not None:
+            print("Curation store: " + store.report())
+        if extract_drugs4.speller is not None:
+            print("Spelling: " + extract_drugs4.speller.report())
+        if options.profile:
+            print(extract_drugs4.profile.summary())
+            extract_drugs4.profile.save(options.profile)
+
+
+if __name__ == '__main__':
+    WeekExtractor()
@@ -0,0 +1,197 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This module makes the steps 2-4 usable from other Python programs, without running their command line programs and without
+# reading or writing the files between the steps:
+# - normalize(answers):            the slightly filtered answers ("Original", step 2)
+# - split(answers):                the terms ("Name") of each answer, one row per term (step 2)
+# - match(names):                  the best labels of the ontology for each Name and their ATC codes, in the format of the SORTA
+#                                  export with the column Atccode (local_sorta.py and Matcher.py, step 3)
+# - matchBack(answers, atc_codes): the ATC codes joined to the answers of the participants (matchingBack.py, step 4)
+# The arguments are lists, pandas Series or DataFrames, the results are DataFrames.
+#
+# The functions use the code of the steps (extract_drugs4.processAnswer, LocalSorta, AtcIndex, AtcTable), so the results are
+# the same as the ones of the programs. The matcher and the index of rainbowtable_all.tsv are loaded on first use and kept.
+#
+# MedicationPipeline keeps everything that is needed for one answer in memory (the term dictionaries, the stop words and the
+# tokenizer, the labels of the ontology, the index of the ATC codes, the processed answers and optionally the curation store
+# and the spelling dictionary). candidates() then maps one free text answer to its terms and the ATC codes of the best labels
+# in a few milliseconds. It is used by medication_service.py.
+#
+# Example:
+# import medication_api
+# medication_api.split(["paracetamol 500mg, omeprazol"])
+# pipeline = medication_api.MedicationPipeline.load()
+# pipeline.candidates("paracetamol 500mg en omeprazol", k=3)
+
+import os
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+tools_dir = os.path.dirname(os.path.abspath(__file__))
+for step in ["2) Extract and preprocess free text answers", "3) Matching SORTA Results with ATC codes",
+             "4) Matching back SORTA Results to Participants answers"]:
+    sys.path.append(os.path.join(tools_dir, "..", step))
+import extract_drugs4
+from answer_cache import AnswerCache
+from atc_index import AtcIndex
+from curation_store import CurationStore, normalizeSynonym
+from local_sorta import LocalSorta
+from matchingBack import AtcTable
+from Matcher import lookupAtcCodes
+
+rainbowtable_file = os.path.join(tools_dir, "..", "3) Matching SORTA Results with ATC codes", "rainbowtable_all.tsv")
+
+loaded = {}
+
+
+def defaultMatcher():
+    #The local SORTA matcher with the default labels, built on first use
+    if "matcher" not in loaded:
+        loaded["matcher"] = LocalSorta.fromSources(rainbowtable_file)
+    return loaded["matcher"]
+
+def defaultIndex():
+    if "index" not in loaded:
+        loaded["index"] = AtcIndex.open(rainbowtable_file)
+    return loaded["index"]
+
+def answerList(answers):
+    #The answers as a list of str (missing answers are kept as they are)
+    if isinstance(answers, str):
+        return [answers]
+    return list(answers)
+
+
+#Step 2
+
+def normalize(answers):
+    #The slightly filtered answer ("Original") of each answer
+    return [extract_drugs4.normalizer.normalize(answer) if isinstance(answer, str) else answer for answer in answerList(answers)]
+
+def split(answers, cache=None):
+    #The terms of the answers: one row per term with the answer, the Original and the term (Name).
+    #Answers without terms (empty answers, only stop words, ...) have no row. Each distinct answer is processed once.
+    answers = pd.Series(answerList(answers), dtype=object).dropna()
+    codes, distinct = pd.factorize(answers)
+    cache = AnswerCache(max_size=len(distinct) + 1) if cache is None else cache
+    results = cache.lookup(distinct, extract_drugs4.processAnswer)
+    counts = np.array([len(result[1]) for result in results], dtype=np.int64)
+    rows = np.repeat(np.arange(len(codes)), counts[codes])
+    return pd.DataFrame({'answer': answers.to_numpy()[rows],
+                         'Original': np.array([result[0] for result in results], dtype=object)[codes][rows] if len(rows) else [],
+                         'Name': [term for code in codes for term in results[code][1]]},
+                        index=answers.index[rows])
+
+
+#Step 3
+
+def match(names, matcher=None, index=None, k=1, threshold=80.0):
+    #The best k labels for each Name with their ATC codes (SORTA export + Atccode, like the input of the long and wide format).
+    #names: list of Names or a DataFrame with Name and Synonym (like the anonymous files of step 2) or Name and Original (like the
+    #result of split()). The Original is the Synonym, so matchBack() can join the result to the answers.
+    if isinstance(names, pd.DataFrame):
+        synonym = 'Synonym' if 'Synonym' in names.columns else 'Original' if 'Original' in names.columns else 'Name'
+        df = pd.DataFrame({'Name': names['Name'].to_numpy(), 'Synonym': names[synonym].to_numpy()}).drop_duplicates()
+    else:
+        names = answerList(names)
+        df = pd.DataFrame({'Name': names, 'Synonym': names})
+    matcher = defaultMatcher() if matcher is None else matcher
+    index = defaultIndex() if index is None else index
+    return lookupAtcCodes(matcher.sortaResults(df, k, threshold), index)
+
+
+#Step 4
+
+def matchBack(answers, atc_codes):
+    #Left join of the answers of the participants (PSEUDOIDEXT, ..., Original) with the table with ATC codes (Synonym or Original).
+    #Columns of the table with ATC codes that are also in the answers (e.g. Name after split()) get the suffix "_matched".
+    atc_codes = atc_codes.rename(columns={"Synonym": "Original"})
+    atc_codes = atc_codes.rename(columns={col: col + "_matched" for col in atc_codes.columns if col != "Original" and col in answers.columns})
+    return AtcTable(atc_codes).join(answers.reset_index(drop=True))
+
+
+class MedicationPipeline:
+    max_k = 50          #most labels per term that candidates() returns
+
+    def __init__(self, matcher, index, store=None, cache_size=100000, threshold=80.0):
+        self.matcher = matcher
+        self.index = index
+        self.store = store
+        self.threshold = threshold
+        self.cache = AnswerCache(max_size=cache_size)
+        self.atc = {}           #label position -> ATC codes
+        self.lock = threading.Lock()
+        self.requests = 0
+        #the tokenizer and the stop words are loaded now, not with the first answer
+        extract_drugs4.resources.word_tokenizer()
+        extract_drugs4.resources.dutch_stopwords()
+
+    @classmethod
+    def load(cls, rainbowtable_path=rainbowtable_file, label_files=(), store_path=None, spelling=False, cache_size=100000, threshold=80.0,
+             without_punkt=False):
+        #The spelling correction and the tokenizer without the punkt model are switched on for extract_drugs4 in this process
+        #(like the options --spelling and --without-punkt)
+        if spelling:
+            extract_drugs4.useSpellingCorrection()
+        if without_punkt:
+            extract_drugs4.resources.allowLineTokenizer()
+        return cls(LocalSorta.fromSources(rainbowtable_path, label_files), AtcIndex.open(rainbowtable_path),
+                   CurationStore(store_path) if store_path else None, cache_size, threshold)
+
+    def atcCodes(self, position):
+        codes = self.atc.get(position)
+        if codes is None:
+            iri_id = self.index.ids([self.matcher.iris[position]])[0]
+            codes = self.atc[position] = self.index.atc_codes(iri_id) if iri_id >= 0 else []
+        return codes
+
+    def curated(self, original):
+        #The reviewed lines of the curation store for an Original, empty if it isn't in the store
+        if self.store is None or normalizeSynonym(original) not in self.store.keys:
+            return []
+        lines = self.store.lines([original])
+        return [{"Name": line['Name'], "label": line['ontologyTermName'], "score": line['score'], "atc": line['Atccode'], "review": line['review']}
+                for line in lines.astype(object).where(lines.notna(), None).to_dict("records")]
+
+    def candidates(self, answer, k=3):
+        #The terms of one free text answer, each with its k best labels and their ATC codes (k: 1 to max_k)
+        if not isinstance(answer, str):
+            raise TypeError("the answer must be a text")
+        if not 1 <= k <= self.max_k:
+            raise ValueError("k must be between 1 and %d" % self.max_k)
+        start = time.time()
+        with self.lock:
+            self.requests += 1
+            original, terms = self.cache.lookup([answer], extract_drugs4.processAnswer)[0]
+            result = {"answer": answer, "Original": original, "terms": []}
+            if terms:
+                #the matcher gives each URI once, -1 if there are fewer than k URIs
+                best, scores = self.matcher.match(list(terms), k)
+                for term, positions, term_scores in zip(terms, best, scores):
+                    candidates = []
+                    for position, score in zip(positions, term_scores):
+                        if position >= 0:
+                            candidates.append({"label": self.matcher.names[position], "iri": self.matcher.iris[position], "score": float(score),
+                                               "review": bool(score < self.threshold), "atc": self.atcCodes(position)})
+                    result["terms"].append({"Name": term, "candidates": candidates})
+            if self.store is not None:
+                result["curated"] = self.curated(original)
+        result["milliseconds"] = round(1000 * (time.time() - start), 3)
+        return result
+
+    def clearCache(self):
+        #forgets the processed answers and the ATC codes of the labels, the next requests are answered like after loading
+        with self.lock:
+            self.cache = AnswerCache(max_size=self.cache.max_size)
+            self.atc = {}
+
+    def report(self):
+        return "%d labels, %d requests, answers: %s" % (len(self.matcher), self.requests, self.cache.report())
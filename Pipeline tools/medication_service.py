@@ -0,0 +1,281 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This program answers single free text answers with their terms and ATC candidates, e.g. for a form that checks an answer while
+# it is typed or for a quick look at how an answer is mapped.
+#
+# Running the steps 2-4 for one answer costs several seconds: the start of Python, the import of pandas and NLTK, the term lists,
+# the labels of the ontology and the rainbowtable. The service loads all of this once (see MedicationPipeline in medication_api.py)
+# and keeps it in memory, so an answer takes a few milliseconds.
+#
+# Commands:
+# python medication_service.py serve [-P 8090]            local HTTP server (only on localhost, unless -H is given):
+#     GET  /candidates?answer=paracetamol%20500mg&k=3      the terms of the answer, the k best labels of each term and their ATC codes
+#     POST /candidates  {"answers": [...], "k": 3}         the same for several answers
+#     GET  /status                                         number of labels and requests, answers in memory, startup time
+#     k is 1-50 (MedicationPipeline.max_k), wrong requests are answered with 400 and {"error": ...}, errors of the service with 500
+# python medication_service.py answer "paracetamol 500mg"  one answer without server (loads everything first)
+# python medication_service.py benchmark [-n 2000]         latency of the service (see below)
+#
+# The options -r, -l, -s, --spelling and --without-punkt are the ones of local_sorta.py, matchingBack.py (curation store: the answers
+# with reviewed ATC codes get them as "curated") and extract_drugs4.py.
+#
+# Benchmark: the requests are drawn from synthetic answers (synthetic_data.py, frequent answers are drawn more often) or taken from
+# the file given with -i (one answer per line). They are answered by the pipeline in this process and then through the HTTP server
+# (one connection that is kept open), the cache of the pipeline is cleared before the second pass, so both start with the same
+# state. The latency of new and repeated answers is shown separately (median, 95th and 99th percentile,
+# maximum). For comparison, one answer is answered by a new process with the command "answer". With -o the results are appended
+# as a JSON line to a file.
+
+import codecs
+import datetime
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from optparse import OptionParser
+
+service_start = time.time()
+from medication_api import MedicationPipeline, rainbowtable_file
+import synthetic_data
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"     #keep the connections open
+    disable_nagle_algorithm = True    #headers and body are written separately, without this each answer waits for the delayed ACK (40 ms)
+    pipeline = None
+    k = 3
+    startup = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body):
+        body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def checkedK(self, value):
+        #k as int between 1 and max_k, a ValueError otherwise
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError("k must be a number")
+        try:
+            k = int(value)
+        except ValueError:
+            raise ValueError("k must be a number")
+        if not 1 <= k <= self.pipeline.max_k:
+            raise ValueError("k must be between 1 and %d" % self.pipeline.max_k)
+        return k
+
+    def contentLength(self):
+        #the length of the body of a POST request, a ValueError if the header is not a number (a negative length would read until
+        #the client closes the connection)
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            raise ValueError("Content-Length must be a number")
+        if length < 0:
+            raise ValueError("Content-Length must not be negative")
+        return length
+
+    def answer(self, handle):
+        #Wrong requests (ValueError) are answered with 400, errors of the service with 500, the server keeps running
+        try:
+            status, body = handle()
+        except ValueError as error:
+            status, body = 400, {"error": str(error)}
+        except Exception as error:
+            #log_message is silent, the errors of the service are shown anyway
+            sys.stderr.write("%s %s: %s: %s\n" % (self.command, self.path, type(error).__name__, error))
+            status, body = 500, {"error": "%s: %s" % (type(error).__name__, error)}
+        self.send(status, body)
+
+    def do_GET(self):
+        self.answer(self.get)
+
+    def do_POST(self):
+        self.answer(lambda: self.post(self.rfile.read(self.contentLength())))
+
+    def get(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        if url.path == "/status":
+            return 200, {"labels": len(self.pipeline.matcher), "requests": self.pipeline.requests,
+                         "answers": self.pipeline.cache.report(), "startup seconds": round(self.startup, 3)}
+        if url.path == "/candidates" and "answer" in query:
+            return 200, self.pipeline.candidates(query["answer"][0], self.checkedK(query.get("k", [self.k])[0]))
+        return 404, {"error": "unknown path, use /candidates?answer=... or /status"}
+
+    def post(self, data):
+        if urllib.parse.urlsplit(self.path).path != "/candidates":
+            return 404, {"error": "unknown path"}
+        try:
+            request = json.loads(data.decode("utf-8"))
+        except ValueError:
+            raise ValueError('expected JSON: {"answers": [...], "k": 3}')
+        if not isinstance(request, dict) or not isinstance(request.get("answers"), list):
+            raise ValueError('expected {"answers": [...], "k": 3}, "answers" must be a list')
+        if not all(isinstance(answer, str) for answer in request["answers"]):
+            raise ValueError("the answers must be texts")
+        k = self.checkedK(request.get("k", self.k))
+        return 200, {"results": [self.pipeline.candidates(answer, k) for answer in request["answers"]]}
+
+
+def startServer(pipeline, port=8090, host="localhost", k=3, startup=0.0):
+    #Starts the server in a background thread and returns it (server.shutdown() stops it)
+    handler = type("Handler", (ServiceRequestHandler,), {"pipeline": pipeline, "k": k, "startup": startup})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+#Benchmark
+
+def latencies(milliseconds):
+    #median, 95th and 99th percentile and maximum in ms
+    if len(milliseconds) == 0:
+        return {"requests": 0}
+    values = np.array(milliseconds)
+    return {"requests": len(values), "median": round(float(np.percentile(values, 50)), 3), "p95": round(float(np.percentile(values, 95)), 3),
+            "p99": round(float(np.percentile(values, 99)), 3), "max": round(float(values.max()), 3)}
+
+def benchmarkAnswers(count, seed=0, path=None):
+    if path is not None:
+        with codecs.open(path, 'r', encoding="utf-8") as f:
+            answers = [line.strip() for line in f if line.strip() != ""]
+        return (answers * (count // max(len(answers), 1) + 1))[:count] if count else answers
+    generator = synthetic_data.QuestionnaireGenerator(seed, pool_size=max(count // 4, 1))
+    return list(generator.pool[generator.rng.choice(len(generator.pool), size=count, p=generator.frequencies)])
+
+def splitLatencies(answers, milliseconds):
+    #the latencies of the answers seen for the first time and the repeated ones
+    seen = set()
+    new, repeated = [], []
+    for answer, value in zip(answers, milliseconds):
+        (repeated if answer in seen else new).append(value)
+        seen.add(answer)
+    return {"new answers": latencies(new), "repeated answers": latencies(repeated)}
+
+def inProcess(pipeline, answers, k):
+    #ms per request
+    milliseconds = []
+    for answer in answers:
+        start = time.perf_counter()
+        pipeline.candidates(answer, k)
+        milliseconds.append(1000 * (time.perf_counter() - start))
+    return splitLatencies(answers, milliseconds)
+
+def overHttp(port, answers, k):
+    connection = http.client.HTTPConnection("localhost", port)
+    milliseconds = []
+    for answer in answers:
+        start = time.perf_counter()
+        connection.request("GET", "/candidates?" + urllib.parse.urlencode({"answer": answer, "k": k}))
+        response = connection.getresponse()
+        response.read()
+        milliseconds.append(1000 * (time.perf_counter() - start))
+        if response.status != 200:
+            raise RuntimeError("HTTP %d for %r" % (response.status, answer))
+    connection.close()
+    return splitLatencies(answers, milliseconds)
+
+def newProcess(answer, k, without_punkt=False):
+    #seconds for one answer in a new process (start of Python, imports, loading, answer)
+    start = time.time()
+    subprocess.run([sys.executable, os.path.abspath(__file__), "answer", "-k", str(k), answer] + (["--without-punkt"] if without_punkt else []),
+                   check=True, stdout=subprocess.DEVNULL)
+    return round(time.time() - start, 3)
+
+def showLatencies(name, values):
+    if values["requests"] == 0:
+        print("%-32s no requests" % name)
+    else:
+        print("%-32s %6d requests, median %.2f ms, p95 %.2f ms, p99 %.2f ms, max %.2f ms"
+              % (name, values["requests"], values["median"], values["p95"], values["p99"], values["max"]))
+
+
+class MedicationService:
+    def __init__(self):
+        parser = OptionParser(usage="%prog serve | answer \"free text answer\" | benchmark [options]")
+        parser.add_option("-P","--port", type="int", default=8090, help="port of the server (default: 8090)")
+        parser.add_option("-H","--host", default="localhost", help="address of the server (default: localhost)")
+        parser.add_option("-k", type="int", default=3, help="number of labels per term (default: 3)")
+        parser.add_option("-t","--threshold", type="float", default=80.0, help="labels with a lower score are flagged for review (default: 80)")
+        parser.add_option("-r","--rainbowtable", default=rainbowtable_file, help="the table with the URIs and their ATC codes")
+        parser.add_option("-l","--labels", action="append", default=[], help="additional file with labels and URIs (tab separated), can be used multiple times")
+        parser.add_option("-s","--store", help="curation store: the reviewed ATC codes of known answers are returned as \"curated\"")
+        parser.add_option("--spelling", action="store_true", help="correct misspelled drug and manufacturer names in the terms (see spelling_corrector.py)")
+        parser.add_option("--without-punkt", action="store_true", help="tokenize the answers without sentence splitting if the punkt model of NLTK is missing (the terms can differ from the ones with the model)")
+        parser.add_option("-n","--requests", type="int", default=2000, help="benchmark: number of requests (default: 2000)")
+        parser.add_option("-i","--input", help="benchmark: file with the answers, one per line (default: synthetic answers)")
+        parser.add_option("--seed", type="int", default=0, help="benchmark: seed of the synthetic answers (default: 0)")
+        parser.add_option("-o","--output", help="benchmark: append the results as a JSON line to this file")
+        (options, args) = parser.parse_args()
+
+        if not 1 <= options.k <= MedicationPipeline.max_k:
+            parser.error("-k must be between 1 and %d" % MedicationPipeline.max_k)
+        if not args or args[0] not in ["serve", "answer", "benchmark"] or (args[0] == "answer") != (len(args) == 2):
+            parser.error("please specify serve, answer \"free text answer\" or benchmark")
+        command = args[0]
+
+        start = time.time()
+        pipeline = MedicationPipeline.load(options.rainbowtable, options.labels, options.store, options.spelling, threshold=options.threshold,
+                                           without_punkt=options.without_punkt)
+        startup = time.time() - service_start
+        if command == "answer":
+            print(json.dumps(pipeline.candidates(args[1], options.k), indent=2))
+            return
+        print("%d labels loaded in %.2f s (%.2f s with the imports)" % (len(pipeline.matcher), time.time() - start, startup))
+
+        if command == "serve":
+            server = startServer(pipeline, options.port, options.host, options.k, startup)
+            print("Medication service on http://%s:%d/candidates?answer=..." % (options.host, options.port))
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                server.shutdown()
+                print(pipeline.report())
+            return
+
+        answers = benchmarkAnswers(options.requests, options.seed, options.input)
+        print("%d requests, %d distinct answers" % (len(answers), len(set(answers))))
+        results = {"date": datetime.datetime.now().isoformat(timespec="seconds"), "startup seconds": round(startup, 3),
+                   "labels": len(pipeline.matcher), "distinct answers": len(set(answers)), "k": options.k}
+        results["in process"] = inProcess(pipeline, answers, options.k)
+        #the HTTP pass starts with an empty cache like the first one
+        pipeline.clearCache()
+        server = startServer(pipeline, options.port, "localhost", options.k, startup)
+        try:
+            results["http"] = overHttp(server.server_address[1], answers, options.k)
+        finally:
+            server.shutdown()
+        results["new process seconds"] = newProcess(answers[0], options.k, options.without_punkt)
+
+        print("Startup of the service: %.2f s" % startup)
+        showLatencies("in process, new answers:", results["in process"]["new answers"])
+        showLatencies("in process, repeated answers:", results["in process"]["repeated answers"])
+        showLatencies("HTTP (keep-alive), new answers:", results["http"]["new answers"])
+        showLatencies("HTTP (keep-alive), repeated:", results["http"]["repeated answers"])
+        print("%-32s %.2f s" % ("one answer in a new process:", results["new process seconds"]))
+        print(pipeline.report())
+        if options.output:
+            with open(options.output, 'a') as f:
+                f.write(json.dumps(results) + "\n")
+
+
+if __name__ == '__main__':
+    MedicationService()
@@ -0,0 +1,230 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This program keeps the ATC codes of all participants and weeks in one sparse table on disk, for questions over several weeks
+# (the medication of a participant over time, the number of participants per code and week, who started or stopped a drug).
+#
+# The results of step 1 and step 4 of all weeks are read like in atc_rollup.py (the week is taken from the file names, each code
+# once per participant and week). The participants and the ATC codes get integer ids, and the codes are stored as one sparse
+# matrix in CSR format: row = week * number of participants + participant, column = id of the ATC code. The rows of a week are
+# a block, so the matrix of one week is a slice of the arrays. The store is a directory (option -s, default: medication_store):
+# - participants.npy: PSEUDOIDEXT (utf-8, sorted), the position is the id of the participant
+# - codes.npy:        the ATC codes (utf-8), the position is the id of the code
+# - ancestors.npy:    the ids of the ancestors of each code at the levels 1-5 (see atc_rollup.AtcHierarchy)
+# - indptr.npy:       the codes of row r are indices[indptr[r]:indptr[r+1]]
+# - indices.npy:      the ids of the codes, sorted within each row
+# - meta.json:        the weeks, the labels of the codes and the numbers of participants and codes
+# The files are opened memory-mapped, a query reads only the rows it needs and returns only the rows of its result
+# (no table of all participants and codes is made).
+#
+# Usage:
+# python medication_store.py build ../../Medication_use_multiplechoice_week*.tsv ../../results/week*_COVID24A*TXT_ATC.tsv
+# python medication_store.py timeline LL123456 [-l 3]
+# python medication_store.py prevalence [-l 1] [-o prevalence.tsv]
+# python medication_store.py changes week1 week2 [-l 4] [--present] [-o changes.tsv]
+# The option -l rolls the codes up to an ATC level (1-5) before the query. With --present only the participants with codes in both
+# weeks are compared (a participant without codes in a week may not have answered).
+
+import glob
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse
+from optparse import OptionParser
+from atc_rollup import AtcHierarchy, AtcRollup, atc_levels_file, sortedUnique
+
+
+class MedicationStore:
+    files = ["participants", "codes", "ancestors", "indptr", "indices"]
+
+    def __init__(self, participants, codes, ancestors, indptr, indices, weeks, labels):
+        self.participants = participants
+        self.codes = codes
+        self.ancestors = ancestors
+        self.indptr = indptr
+        self.indices = indices
+        self.weeks = weeks
+        self.labels = labels
+
+    @classmethod
+    def fromRollup(cls, rollup):
+        #The pairs of the rollup (without duplicates) as CSR, the participants sorted for the lookup of a PSEUDOIDEXT
+        participant_ids, week_ids, code_ids = rollup.table()
+        names = np.array([str(name).encode("utf-8") for name in rollup.participants], dtype=bytes)
+        order = np.argsort(names, kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        participants_count, codes_count = len(names), len(rollup.hierarchy)
+        keys = (week_ids.astype(np.int64) * participants_count + rank[participant_ids]) * codes_count + code_ids
+        keys.sort()
+        rows = keys // codes_count
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(rollup.weeks) * participants_count))]).astype(np.int64)
+        hierarchy = rollup.hierarchy
+        return cls(names[order], np.array([code.encode("utf-8") for code in hierarchy.codes], dtype=bytes), hierarchy.ancestors,
+                   indptr, (keys % codes_count).astype(np.int32), list(rollup.weeks), [hierarchy.labels.get(code, "") for code in hierarchy.codes])
+
+    @classmethod
+    def build(cls, paths, week=None, hierarchy=None):
+        rollup = AtcRollup(hierarchy)
+        for path in paths:
+            rollup.addFile(path, week)
+        return cls.fromRollup(rollup)
+
+    def save(self, store_dir):
+        os.makedirs(store_dir, exist_ok=True)
+        for name in self.files:
+            np.save(os.path.join(store_dir, name + ".npy"), getattr(self, name))
+        #meta.json is written last, a store without it is incomplete
+        with open(os.path.join(store_dir, "meta.json.tmp"), 'w') as f:
+            json.dump({"weeks": self.weeks, "labels": self.labels, "participants": len(self.participants), "codes": len(self.codes),
+                       "pairs": len(self.indices)}, f)
+        os.replace(os.path.join(store_dir, "meta.json.tmp"), os.path.join(store_dir, "meta.json"))
+
+    @classmethod
+    def load(cls, store_dir):
+        with open(os.path.join(store_dir, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = [np.load(os.path.join(store_dir, name + ".npy"), mmap_mode='r') for name in cls.files]
+        return cls(*arrays, weeks=meta["weeks"], labels=meta["labels"])
+
+    #Lookups
+
+    def participantId(self, pseudoid):
+        key = str(pseudoid).encode("utf-8")
+        position = int(np.searchsorted(self.participants, key))
+        if position < len(self.participants) and self.participants[position] == key:
+            return position
+        return -1
+
+    def weekId(self, week):
+        if week not in self.weeks:
+            raise KeyError("unknown week: %s (weeks: %s)" % (week, ", ".join(self.weeks)))
+        return self.weeks.index(week)
+
+    def code(self, code_id):
+        return self.codes[code_id].decode("utf-8")
+
+    def weekRows(self, week_id):
+        #indptr and indices of the rows of a week (rows are participants)
+        first = week_id * len(self.participants)
+        indptr = self.indptr[first:first + len(self.participants) + 1]
+        return indptr - indptr[0], self.indices[indptr[0]:indptr[-1]]
+
+    def weekMatrix(self, week_id, level=None):
+        #participants x codes of a week as a sparse matrix (codes rolled up to a level, if given)
+        indptr, indices = self.weekRows(week_id)
+        rows = np.repeat(np.arange(len(self.participants), dtype=np.int64), np.diff(indptr))
+        rows, codes = self.rollup(rows, np.asarray(indices), level)
+        return scipy.sparse.csr_matrix((np.ones(len(codes), dtype=bool), (rows, codes)), shape=(len(self.participants), len(self.codes)))
+
+    def rollup(self, rows, codes, level):
+        #The codes at a level, each code once per row (rows and codes are sorted by row and code)
+        if level is None:
+            return rows, codes
+        codes = np.asarray(self.ancestors)[codes, level - 1]
+        keep = codes >= 0
+        keys = sortedUnique(rows[keep] * len(self.codes) + codes[keep])
+        return keys // len(self.codes), (keys % len(self.codes)).astype(np.int32)
+
+    #Queries
+
+    def timeline(self, pseudoid, level=None):
+        #week and ATC code of one participant, in the order of the weeks
+        participant = self.participantId(pseudoid)
+        result = []
+        if participant >= 0:
+            for week_id, week in enumerate(self.weeks):
+                row = week_id * len(self.participants) + participant
+                codes = np.asarray(self.indices[self.indptr[row]:self.indptr[row + 1]])
+                codes = self.rollup(np.zeros(len(codes), dtype=np.int64), codes, level)[1]
+                result += [(week, self.code(code_id), self.labels[code_id]) for code_id in codes]
+        return pd.DataFrame(result, columns=["week", "ATC", "label"])
+
+    def prevalence(self, level=None):
+        #Number of participants per week and code, and the number of participants with any code in the week
+        frames = []
+        for week_id, week in enumerate(self.weeks):
+            indptr, indices = self.weekRows(week_id)
+            rows = np.repeat(np.arange(len(self.participants), dtype=np.int64), np.diff(indptr))
+            rows, codes = self.rollup(rows, np.asarray(indices), level)
+            counts = np.bincount(codes, minlength=len(self.codes))
+            code_ids = np.flatnonzero(counts)
+            frames.append(pd.DataFrame({"week": week, "ATC": [self.code(code_id) for code_id in code_ids],
+                                        "label": [self.labels[code_id] for code_id in code_ids], "participants": counts[code_ids],
+                                        "participants in week": int((np.diff(indptr) > 0).sum())}))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["week", "ATC", "label", "participants", "participants in week"])
+
+    def changes(self, week_before, week_after, level=None, present=False):
+        #The codes a participant started (only in the second week) or stopped (only in the first week)
+        keys = []
+        for week_id in [self.weekId(week_before), self.weekId(week_after)]:
+            indptr, indices = self.weekRows(week_id)
+            rows = np.repeat(np.arange(len(self.participants), dtype=np.int64), np.diff(indptr))
+            rows, codes = self.rollup(rows, np.asarray(indices), level)
+            keys.append((rows * len(self.codes) + codes, np.diff(indptr) > 0))
+        (before, answered_before), (after, answered_after) = keys
+        frames = []
+        for change, found in [("started", np.setdiff1d(after, before, assume_unique=True)), ("stopped", np.setdiff1d(before, after, assume_unique=True))]:
+            participants, codes = found // len(self.codes), found % len(self.codes)
+            if present:
+                keep = answered_before[participants] & answered_after[participants]
+                participants, codes = participants[keep], codes[keep]
+            frames.append(pd.DataFrame({"PSEUDOIDEXT": [name.decode("utf-8") for name in self.participants[participants]],
+                                        "ATC": [self.code(code_id) for code_id in codes], "change": change}))
+        return pd.concat(frames, ignore_index=True)
+
+
+class MedicationStoreTool:
+    def __init__(self):
+        parser = OptionParser(usage="%prog build result files or patterns | timeline PSEUDOIDEXT | prevalence | changes week week [options]")
+        parser.add_option("-s","--store", default="medication_store", help="directory of the store (default: medication_store)")
+        parser.add_option("-l","--level", type="int", help="roll the codes up to this ATC level (1-5)")
+        parser.add_option("-w","--week", default="week", help="build: week of the files without week in their name (default: week)")
+        parser.add_option("-a","--atc-levels", default=atc_levels_file, help="build: the hierarchy of the ATC codes (default: Nice to get an overview/ATC Levels.xlsx)")
+        parser.add_option("--present", action="store_true", help="changes: only the participants with codes in both weeks")
+        parser.add_option("-o","--output", help="write the result into this file (tab separated) instead of showing it")
+        (options, args) = parser.parse_args()
+
+        if not args:
+            parser.error("no command given")
+        command = args[0]
+        start = time.time()
+        if command == "build":
+            paths = [path for argument in args[1:] for path in sorted(glob.glob(argument)) or [argument]]
+            if not paths:
+                parser.error("no result files given")
+            store = MedicationStore.build(paths, options.week, AtcHierarchy.fromLevels(options.atc_levels))
+            store.save(options.store)
+            print("%s: %d participants, %d weeks, %d codes, %d pairs (%.2f s)" % (options.store, len(store.participants), len(store.weeks),
+                                                                               len(store.codes), len(store.indices), time.time() - start))
+            return
+
+        store = MedicationStore.load(options.store)
+        if command == "timeline" and len(args) == 2:
+            result = store.timeline(args[1], options.level)
+        elif command == "prevalence":
+            result = store.prevalence(options.level)
+        elif command == "changes" and len(args) == 3:
+            try:
+                result = store.changes(args[1], args[2], options.level, options.present)
+            except KeyError as error:
+                print(error.args[0])
+                sys.exit(1)
+        else:
+            parser.error("unknown command or wrong number of arguments")
+        if options.output:
+            result.to_csv(options.output, sep="\t", index=False)
+        else:
+            print(result.to_string(index=False))
+        print("%d rows (%.2f s)" % (len(result), time.time() - start))
+
+
+if __name__ == '__main__':
+    MedicationStoreTool()
@@ -0,0 +1,19 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# The selfmade URIs of the ontology for labels without a dbpedia resource (e.g. the products of the SFK): http://www.UMCG.nl/ + the
+# MD5 hash of the lowercase label, so a label gets the same URI in every build. Used by build_ontology.py (step 0), local_sorta.py
+# (step 3) and synthetic_data.py, without importing each other.
+
+import hashlib
+
+umcg_namespace = "http://www.UMCG.nl/"
+
+
+def umcgIri(label):
+    #The selfmade URIs are the MD5 hash of the lowercase label
+    return umcg_namespace + hashlib.md5(label.lower().encode("utf-8")).hexdigest()
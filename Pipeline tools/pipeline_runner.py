@@ -0,0 +1,339 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This program runs the steps 1-4 for all the weeks and only redoes the work whose inputs have changed.
+#
+# The pipeline is a graph of tasks. Every task reads some files (its inputs) and writes some files (its outputs):
+# - multiple choice  (one per week):            week file -> <week>/Medication_use_multiplechoice.tsv                 (step 1)
+# - free text        (one per week):            week file -> <week>/extractedColumns4/COVID24A*TXT_column.csv
+#                                                            and <week>/extractedColumns4/anonymous/COVID24A*TXT_column_anonymous.csv (step 2)
+# - sorta            (one per week and question): anonymous file -> ..._anonymous_processed.csv (local_sorta.py or a SORTA server)
+# - atc codes        (one per week and question): ..._processed.csv -> ..._processedlong_format.tsv and ..._processed_wide_format.tsv (step 3)
+# - matching back    (one per week and question): column file and long format -> <week>/COVID24A*TXT_all.tsv and _ATC.tsv (step 4)
+# The program files of a step, the term lists (-e), the hardcoded questions, the rainbowtable and the label sources are inputs as well.
+# With --spelling the misspelled words of the terms are corrected in step 2 (see spelling_corrector.py), the sources of its
+# dictionary (dbpedia_corrected.tsv, the SFK workbook and ATC Levels.xlsx) are then inputs of the free text tasks.
+# With --without-punkt the answers are tokenized without sentence splitting if the punkt model of NLTK is missing (see resources.py),
+# the tokenizer is a setting of the free text tasks, so they are run again when the model is installed.
+#
+# Every input is identified by the SHA-256 hash of its content. A task is skipped if the hashes of its inputs and its settings
+# are the same as in the last run and its outputs are unchanged. The hashes are kept in <output>/pipeline_state.json
+# (files whose size and modification time haven't changed are not hashed again).
+# Since the outputs are compared by their content as well, a change only goes as far down as it changes files: if a new word
+# in the term lists only changes the answers of question 5, the free text task of every week is run again, but SORTA, the
+# ATC codes and the matching back are only run for question 5.
+#
+# Tasks that don't depend on each other (different weeks and questions) run in parallel in a pool of processes (option -p).
+# If a task fails, the tasks that need its outputs are not run, the others go on. The failed task is run again next time.
+#
+# With "--sorta none" the SORTA results are not created by the pipeline: the files "..._anonymous_processed.csv" downloaded from
+# SORTA (and curated) are put next to the anonymous files and are inputs like the week files.
+#
+# Example: python pipeline_runner.py -o ../../pipeline ../../data/raw/covid_questionnaires/week*/*.dat
+
+import hashlib
+import json
+import os
+import sys
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from optparse import OptionParser
+
+tools_dir = os.path.dirname(os.path.abspath(__file__))
+step_dirs = [os.path.join(tools_dir, "..", name) for name in ["1) Extract hardcoded question results",
+                                                              "2) Extract and preprocess free text answers",
+                                                              "3) Matching SORTA Results with ATC codes",
+                                                              "4) Matching back SORTA Results to Participants answers"]]
+sys.path.extend(step_dirs)
+import questionnaire_reader
+import extract_hardcoded_ATC
+import extract_drugs4
+import resources
+import Matcher
+import matchingBack
+import local_sorta
+import spelling_corrector
+from answer_cache import AnswerCache
+from atc_index import AtcIndex
+from sorta_client import SortaClient, outputFile
+from term_dictionary import TermDictionary
+
+#The program files of each step, a change of one of them runs the tasks of the step again
+step_code = {
+    "multiple choice": [os.path.join(step_dirs[0], "extract_hardcoded_ATC.py"), os.path.join(tools_dir, "questionnaire_reader.py")],
+    "free text": [os.path.join(step_dirs[1], name) for name in ["extract_drugs4.py", "normalizer.py", "term_dictionary.py", "dutch_stopwords.txt",
+                                                                  "resources.py", "answer_cache.py", "rule_profile.py", "spelling_corrector.py"]]
+                 + [os.path.join(tools_dir, "questionnaire_reader.py")],
+    "sorta": [os.path.join(step_dirs[2], "local_sorta.py"), os.path.join(tools_dir, "workbook_cache.py"), os.path.join(tools_dir, "ontology_iri.py"),
+              local_sorta.dbpedia_file, local_sorta.sfk_file, local_sorta.atc_levels_file],
+    "atc codes": [os.path.join(step_dirs[2], "Matcher.py"), os.path.join(step_dirs[2], "atc_index.py")],
+    "matching back": [os.path.join(step_dirs[3], "matchingBack.py")],
+}
+#The sources of the dictionary of the spelling correction, inputs of the free text tasks with --spelling
+spelling_sources = [spelling_corrector.dbpedia_file, spelling_corrector.sfk_file, spelling_corrector.atc_levels_file,
+                    os.path.join(tools_dir, "workbook_cache.py")]
+
+
+def removeFiles(paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+#The tasks, they are run in the worker processes
+
+def initWorker(excludefiles, spelling=False, without_punkt=False):
+    if without_punkt:
+        resources.allowLineTokenizer()
+    for termfile in excludefiles:
+        extract_drugs4.exclude_words.extend(TermDictionary.from_file(termfile))
+    #the dictionary contains the words to exclude, so it is built after them
+    if spelling:
+        extract_drugs4.useSpellingCorrection()
+
+def multipleChoiceTask(week_file, questions_file, output):
+    #the free text task of the week may not have created the directory yet
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    hardcoded = extract_hardcoded_ATC.readHardcodedQuestions(questions_file)
+    id_column = questionnaire_reader.readHeader(week_file)[0]
+    contents = questionnaire_reader.readColumns(week_file, lambda col: False, [row[0] for row in hardcoded], id_column)
+    extract_hardcoded_ATC.writeResults(output, extract_hardcoded_ATC.extractAnswers(hardcoded, contents, id_column))
+
+def freeTextTask(week_file, output_dir, cache_size):
+    os.makedirs(os.path.join(output_dir, "anonymous"), exist_ok=True)
+    df = extract_drugs4.readAnswers(week_file)
+    cache = AnswerCache(max_size=cache_size)
+    for question in range(2, 11):
+        #questions without answers don't write files, old files of them must not stay
+        removeFiles([extract_drugs4.columnFile(output_dir, question), extract_drugs4.anonymousFile(output_dir, question)])
+        extract_drugs4.extractQuestion(df, question, cache, output_dir)
+
+#LocalSorta of each worker process, it is built on first use
+worker_sorta = {}
+
+def sortaTask(anonymous_file, output, sorta, rainbowtable_path, label_files, k, threshold):
+    if not os.path.exists(anonymous_file):
+        removeFiles([output])
+        return
+    if sorta == "local":
+        key = (rainbowtable_path, tuple(label_files))
+        if key not in worker_sorta:
+            worker_sorta[key] = local_sorta.LocalSorta.fromSources(rainbowtable_path, label_files)
+        df = pd.read_csv(anonymous_file, sep=";", dtype=str, keep_default_na=False)
+        worker_sorta[key].sortaResults(df, k, threshold).to_csv(output, sep=";", index=False)
+    else:
+        SortaClient(sorta).match(anonymous_file, output)
+
+def atcCodesTask(processed_file, outputs, rainbowtable_path):
+    if not os.path.exists(processed_file):
+        removeFiles(outputs)
+        return
+    Matcher.matchFiles([processed_file], ("long", "wide"), rainbowtable_path)
+
+def matchingBackTask(column_file, long_file, outputs):
+    if not (os.path.exists(column_file) and os.path.exists(long_file)):
+        removeFiles(outputs)
+        return
+    finaldf = matchingBack.AtcTable(matchingBack.readAtcCodes(long_file)).join(matchingBack.readAnswers(column_file))
+    matchingBack.writeResult(finaldf, outputs[0])
+    matchingBack.writeResult(matchingBack.atcOnly(finaldf), outputs[1])
+
+
+class Task:
+    def __init__(self, name, step, function, args, inputs, outputs, settings=None):
+        self.name = name
+        self.step = step
+        self.function = function
+        self.args = args
+        self.settings = settings or {}
+        self.inputs = [os.path.abspath(path) for path in inputs] + [os.path.abspath(path) for path in step_code[step]]
+        self.outputs = [os.path.abspath(path) for path in outputs]
+
+    def key(self, state):
+        #Hash of the function, its settings and the content of all its inputs
+        key = hashlib.sha256()
+        key.update(json.dumps([self.function.__name__, self.settings, [str(arg) for arg in self.args]]).encode("utf-8"))
+        for path in sorted(self.inputs):
+            key.update((path + "\t" + str(state.fileHash(path)) + "\n").encode("utf-8"))
+        return key.hexdigest()
+
+
+class PipelineState:
+    #The hashes of the files and the keys of the tasks of the last run
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.tasks = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            self.files = saved.get("files", {})
+            self.tasks = saved.get("tasks", {})
+
+    def fileHash(self, path):
+        #SHA-256 of the file (None if it doesn't exist), the hash is reused if size and modification time are the same
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        known = self.files.get(path)
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        self.files[path] = [stat.st_size, stat.st_mtime_ns, sha.hexdigest()]
+        return sha.hexdigest()
+
+    def upToDate(self, task, key):
+        saved = self.tasks.get(task.name)
+        if saved is None or saved["key"] != key:
+            return False
+        return all(self.fileHash(path) == saved["outputs"].get(path) for path in task.outputs)
+
+    def record(self, task, key):
+        self.tasks[task.name] = {"key": key, "outputs": {path: self.fileHash(path) for path in task.outputs}}
+
+    def forget(self, task):
+        self.tasks.pop(task.name, None)
+
+    def save(self):
+        with open(self.path + ".tmp", "w") as f:
+            json.dump({"files": self.files, "tasks": self.tasks}, f)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def buildTasks(paths, output, questions_file, excludefiles, rainbowtable_path, sorta, label_files, k, threshold, cache_size, spelling=False):
+    #The tasks of all the weeks, every task comes after the tasks that write its inputs
+    #the tokenizer and the spelling correction change the results of step 2
+    free_text_settings = {"tokenizer": resources.tokenizer_mode(), "spelling": bool(spelling)}
+    free_text_inputs = excludefiles + (spelling_sources if spelling else [])
+    weeks = questionnaire_reader.weekNames(paths)
+    tasks = []
+    for path in paths:
+        week = weeks[path]
+        week_dir = os.path.join(output, week)
+        extracted_dir = os.path.join(week_dir, "extractedColumns4")
+        tasks.append(Task(week + " multiple choice", "multiple choice", multipleChoiceTask,
+                          (path, questions_file, os.path.join(week_dir, "Medication_use_multiplechoice.tsv")),
+                          [path, questions_file], [os.path.join(week_dir, "Medication_use_multiplechoice.tsv")]))
+        free_text_outputs = []
+        for question in range(2, 11):
+            free_text_outputs += [extract_drugs4.columnFile(extracted_dir, question), extract_drugs4.anonymousFile(extracted_dir, question)]
+        tasks.append(Task(week + " free text", "free text", freeTextTask, (path, extracted_dir, cache_size),
+                          [path] + free_text_inputs, free_text_outputs, free_text_settings))
+
+        for question in range(2, 11):
+            name = "%s COVID24A%dTXT" % (week, question)
+            anonymous_file = extract_drugs4.anonymousFile(extracted_dir, question)
+            processed_file = outputFile(anonymous_file)
+            if sorta != "none":
+                tasks.append(Task(name + " sorta", "sorta", sortaTask,
+                                  (anonymous_file, processed_file, sorta, rainbowtable_path, label_files, k, threshold),
+                                  [anonymous_file, rainbowtable_path] + label_files, [processed_file]))
+            formats = [processed_file.replace(".csv", "long_format.tsv"), processed_file.replace(".csv", "_wide_format.tsv")]
+            tasks.append(Task(name + " atc codes", "atc codes", atcCodesTask, (processed_file, formats, rainbowtable_path),
+                              [processed_file, rainbowtable_path], formats))
+            results = [os.path.join(week_dir, "COVID24A%dTXT_all.tsv" % question), os.path.join(week_dir, "COVID24A%dTXT_ATC.tsv" % question)]
+            tasks.append(Task(name + " matching back", "matching back", matchingBackTask,
+                              (extract_drugs4.columnFile(extracted_dir, question), formats[0], results),
+                              [extract_drugs4.columnFile(extracted_dir, question), formats[0]], results))
+    return tasks
+
+def runTasks(tasks, state, processes, excludefiles, force=False, spelling=False, without_punkt=False):
+    #Runs the tasks whose inputs have changed, in parallel as soon as the tasks that write their inputs are done
+    writers = {}
+    for task in tasks:
+        for path in task.outputs:
+            writers[path] = task
+    needs = {task: {writers[path] for path in task.inputs if path in writers} for task in tasks}
+    done, failed = set(), set()
+    counts = {"run": 0, "up to date": 0, "failed": 0, "not run": 0}
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=initWorker, initargs=(excludefiles, spelling, without_punkt)) as pool:
+        waiting = list(tasks)
+        while waiting or running:
+            for task in list(waiting):
+                if needs[task] & failed:
+                    #an input is missing because a task failed
+                    waiting.remove(task)
+                    failed.add(task)
+                    counts["not run"] += 1
+                    print("%s: not run" % task.name)
+                elif needs[task] <= done:
+                    waiting.remove(task)
+                    key = task.key(state)
+                    if not force and state.upToDate(task, key):
+                        done.add(task)
+                        counts["up to date"] += 1
+                    else:
+                        state.forget(task)
+                        running[pool.submit(task.function, *task.args)] = (task, key, time.time())
+            if not running:
+                continue
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                task, key, start = running.pop(future)
+                try:
+                    future.result()
+                    state.record(task, key)
+                    done.add(task)
+                    counts["run"] += 1
+                    print("%s: %.2f s" % (task.name, time.time() - start))
+                except Exception as error:
+                    failed.add(task)
+                    counts["failed"] += 1
+                    print("%s: failed: %s" % (task.name, error))
+            state.save()
+    state.save()
+    return counts
+
+
+class PipelineRunner:
+    def __init__(self):
+        parser = OptionParser(usage="%prog [options] week files, patterns or directories")
+        parser.add_option("-o","--output", default=".", help="directory for the results, one directory per week (default: .)")
+        parser.add_option("-p","--processes", type="int", default=os.cpu_count(), help="number of worker processes (default: number of CPUs)")
+        parser.add_option("-q","--questions", default=os.path.join(step_dirs[0], "hardcoded_ATC_questions_week1-6.tsv"),
+                          help="file with the hardcoded questions and their ATC codes (default: hardcoded_ATC_questions_week1-6.tsv of step 1)")
+        parser.add_option("-e","--excludefile", action="append", default=[], help="file with additional words to exclude (one per line), can be used multiple times")
+        parser.add_option("-r","--rainbowtable", default=os.path.join(step_dirs[2], "rainbowtable_all.tsv"), help="the table with the URIs and their ATC codes (default: rainbowtable_all.tsv of step 3)")
+        parser.add_option("-s","--sorta", default="local", help="'local' (local_sorta.py), the address of a SORTA server (see sorta_client.py) or 'none' (the SORTA results are put next to the anonymous files) (default: local)")
+        parser.add_option("-l","--labels", action="append", default=[], help="additional file with labels and URIs for local_sorta.py, can be used multiple times")
+        parser.add_option("-k", type="int", default=1, help="number of matches per Name of local_sorta.py (default: 1)")
+        parser.add_option("-t","--threshold", type="float", default=80.0, help="matches with a lower score are flagged for review (default: 80)")
+        parser.add_option("--cache-size", type="int", default=500000, help="maximal number of answers in the answer cache of a week (default: 500000)")
+        parser.add_option("--spelling", action="store_true", help="correct misspelled drug and manufacturer names in the terms of step 2 (see spelling_corrector.py)")
+        parser.add_option("--without-punkt", action="store_true", help="tokenize the answers without sentence splitting if the punkt model of NLTK is missing (the terms can differ from the ones with the model)")
+        parser.add_option("-f","--force", action="store_true", help="run all the tasks, even if their inputs haven't changed")
+        (options, args) = parser.parse_args()
+
+        paths = questionnaire_reader.weekFiles(args)
+        if len(paths) == 0:
+            print("please specify the week files")
+            return
+        os.makedirs(options.output, exist_ok=True)
+        start = time.time()
+        if options.without_punkt:
+            resources.allowLineTokenizer()
+
+        tasks = buildTasks(paths, options.output, options.questions, options.excludefile, options.rainbowtable, options.sorta,
+                           options.labels, options.k, options.threshold, options.cache_size, options.spelling)
+        #the index of the rainbowtable is built once before the workers use it
+        AtcIndex.open(options.rainbowtable)
+
+        state = PipelineState(os.path.join(options.output, "pipeline_state.json"))
+        counts = runTasks(tasks, state, options.processes, options.excludefile, options.force, options.spelling, options.without_punkt)
+        print("%d tasks in %.2f s: %d run, %d up to date, %d failed, %d not run" % (len(tasks), time.time() - start,
+              counts["run"], counts["up to date"], counts["failed"], counts["not run"]))
+
+
+if __name__ == '__main__':
+    PipelineRunner()
@@ -0,0 +1,134 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This module reads the results of the Lifelines Covid Questionnaires ("covid19-weekN-1.dat") for the programs of all the steps.
+#
+# The questionnaire files have hundreds of columns, but every step only needs a few of them:
+# - "1) Extract hardcoded question results" needs the ID and the columns of the multiple choice questions
+# - "2) Extract and preprocess free text answers" needs the ID and the COVID24A*TXT* columns
+# Before, both programs read the whole file as text and selected the columns afterwards.
+#
+# readColumns() reads the header line first and lets pandas parse only the columns that are needed (usecols).
+# - The participants ID ("PSEUDOIDEXT") is stored as category.
+# - The multiple choice columns are stored as int8 (1 if the drug was selected, otherwise 0).
+# - All the other selected columns are read as text, like before.
+#
+# readChunks() does the same, but returns the file in parts of a fixed number of rows (for exports that don't fit in memory).
+#
+# weekFiles() and weekNames() find the files of several weeks and give them short names for the output files.
+#
+# The time needed for reading, the number of columns and the peak memory of the program are stored in "statistics" (see report()).
+#
+# The programs of the steps find this module by adding the directory "Pipeline tools" to their search path.
+
+import codecs
+import glob
+import os
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    #not available on Windows
+    resource = None
+
+encoding = "iso-8859-1"
+
+statistics = {}
+
+
+def weekFiles(arguments):
+    #The questionnaire files for the given files, patterns (e.g., "../../data/raw/covid_questionnaires/week*/*.dat") or directories
+    paths = []
+    for argument in arguments:
+        if os.path.isdir(argument):
+            paths += sorted(glob.glob(os.path.join(argument, "*.dat")))
+        else:
+            paths += sorted(glob.glob(argument))
+    return list(dict.fromkeys(paths))
+
+def weekNames(paths):
+    #week1 for covid19-week1-1.dat, or the whole file name if the week number isn't unique
+    names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    weeks = [re.search(r'week\d+', name) for name in names]
+    weeks = [week.group(0) if week else name for week, name in zip(weeks, names)]
+    return {path: (week if weeks.count(week) == 1 else name) for path, name, week in zip(paths, names, weeks)}
+
+def readHeader(path):
+    #Returns the column names of the questionnaire file
+    with codecs.open(path, 'r', encoding=encoding, errors='ignore') as f:
+        header = f.readline()
+    return header.rstrip("\r\n").split("\t")
+
+def peakMemory():
+    #Highest memory use (resident set size) of the program so far in MB, None if it can't be measured
+    if resource is None:
+        return None
+    #ru_maxrss is in bytes on macOS and in KB on Linux
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024.0 * 1024.0) if sys.platform == "darwin" else maxrss / 1024.0
+
+def columnTypes(header, select, flag_columns, id_column):
+    #The columns to read and their types
+    flag_columns = set(flag_columns)
+    columns = [col for col in header if col == id_column or col in flag_columns or select(col)]
+    dtypes = {col: np.dtype('str') for col in columns}
+    dtypes.update({col: "category" for col in columns if col in flag_columns})
+    if id_column in columns:
+        dtypes[id_column] = "category"
+    return columns, dtypes
+
+def toFlags(df, flag_columns):
+    for col in flag_columns:
+        if col in df:
+            df[col] = (df[col] == "1").astype(np.int8)
+    return df
+
+def readColumns(path, select, flag_columns=(), id_column="PSEUDOIDEXT"):
+    #Reads the ID and the columns for which select(column name) is true.
+    #The columns in flag_columns are converted to 0/1 flags (1 for the answer "1").
+    start = time.time()
+    header = readHeader(path)
+    columns, dtypes = columnTypes(header, select, flag_columns, id_column)
+    df = pd.read_csv(path, sep="\t", encoding=encoding, usecols=columns, dtype=dtypes)
+    df = toFlags(df, flag_columns)
+    storeStatistics(path, header, columns, len(df), time.time() - start)
+    return df
+
+def readChunks(path, select, chunksize, flag_columns=(), id_column="PSEUDOIDEXT"):
+    #Same as readColumns, but yields the file in parts of chunksize rows, so only one part is in memory at a time.
+    #The statistics are complete once the last part has been read.
+    start = time.time()
+    header = readHeader(path)
+    columns, dtypes = columnTypes(header, select, flag_columns, id_column)
+    participants = 0
+    with pd.read_csv(path, sep="\t", encoding=encoding, usecols=columns, dtype=dtypes, chunksize=chunksize) as reader:
+        for df in reader:
+            participants += len(df)
+            yield toFlags(df, flag_columns)
+    storeStatistics(path, header, columns, participants, time.time() - start)
+
+def storeStatistics(path, header, columns, participants, seconds):
+    statistics["file"] = path
+    statistics["columns in file"] = len(header)
+    statistics["columns read"] = len(columns)
+    statistics["participants"] = participants
+    statistics["parse time"] = seconds
+    statistics["peak memory"] = peakMemory()
+
+def report():
+    if "file" not in statistics:
+        return "no questionnaire read"
+    text = "%s: %d of %d columns, %d participants, parsed in %.2f s" % (statistics["file"], statistics["columns read"],
+            statistics["columns in file"], statistics["participants"], statistics["parse time"])
+    if statistics["peak memory"] is not None:
+        text += ", peak memory %.0f MB" % statistics["peak memory"]
+    return text
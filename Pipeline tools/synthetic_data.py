@@ -0,0 +1,228 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This module creates synthetic data in the format of the Lifelines Covid Questionnaires and of the SORTA export, so the programs
+# can be run and measured (see benchmark.py) without the private data.
+#
+# Week files ("covid19-weekN-1.dat", tab separated, iso-8859-1):
+# - PSEUDOIDEXT: a made-up ID per participant
+# - the multiple choice columns of the hardcoded questions ("1) Extract hardcoded question results/hardcoded_ATC_questions_week1-6.tsv"),
+#   "1" for a selected drug, otherwise "0" or empty
+# - the free text columns COVID24A2TXT1/2 ... COVID24A9TXT1/2 and COVID24A10TXT1..10
+# - a number of other columns with short answers (option -x), like the other questions of the questionnaire
+# The free text answers are made of one to three drug names of "dbpedia_corrected.tsv" (the Dutch or the English name) with
+# noise like in the real answers: upper case, typing errors, dosages ("500 mg", "2 dd 1"), application forms, manufacturers,
+# fill words ("i.v.m. hoofdpijn") and the codes for empty answers ("9999", "8888").
+# Like in the real data, a few answers are very frequent and most answers are rare: every participant gets an answer of a fixed
+# pool (option -p) drawn with Zipf-like frequencies. Most of the text fields are empty.
+#
+# SORTA results ("..._anonymous_processed.csv", separated by semicolons): for every Name of an anonymous file of step 2 the URI of
+# the drug it contains (with a high score) or a random URI of the rainbowtable (with a low score, flagged for review) or no match.
+#
+# Examples:
+# python synthetic_data.py -n 100000 -w 3 -o ../../synthetic                  (covid19-week1-1.dat ... covid19-week3-1.dat)
+# python synthetic_data.py --sorta ../../extractedColumns4/anonymous/*.csv   (..._anonymous_processed.csv next to the files)
+
+import codecs
+import glob
+import os
+import sys
+import numpy as np
+import pandas as pd
+from optparse import OptionParser
+
+tools_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(tools_dir, "..", "3) Matching SORTA Results with ATC codes"))
+import questionnaire_reader
+from atc_index import AtcIndex
+from ontology_iri import umcgIri
+from sorta_client import outputFile
+
+dbpedia_file = os.path.join(tools_dir, "..", "Datasources used to create Ontology", "Dbpedia (Dutch)", "dbpedia_corrected.tsv")
+hardcoded_file = os.path.join(tools_dir, "..", "1) Extract hardcoded question results", "hardcoded_ATC_questions_week1-6.tsv")
+rainbowtable_file = os.path.join(tools_dir, "..", "3) Matching SORTA Results with ATC codes", "rainbowtable_all.tsv")
+
+dosages = ["500 mg", "20mg", "10 mg", "1000mg", "2 dd 1", "1x per dag", "3 x daags", "10 mg/ml", "50 microgram", "0,5 mg", "2x 400mg", "1 tablet"]
+forms = ["tablet", "tabletten", "creme", "zalf", "oog druppels", "omh tabl", "capsule", "neusspray", "inhalatiepoeder", "bruistablet"]
+manufacturers = ["sandoz", "teva", "mylan", "ratiopharm", "apotex", "CF", "PCH", "actavis"]
+fill_words = ["i.v.m. hoofdpijn", "zonodig", "elke dag", "voor de bloeddruk", "'s ochtends", "tegen allergie", "weet niet", "(sinds maart)"]
+separators = [", ", " / ", " en ", "; ", " + ", "  ", "\\"]
+empty_codes = ["9999", "8888"]
+
+
+def readDrugNames(path=dbpedia_file):
+    #Dutch names and English labels of the drugs
+    df = pd.read_csv(path, sep="\t", encoding="utf-8-sig", dtype=str)
+    return df[['Name', 'label']].dropna()
+
+def freeTextColumns():
+    columns = []
+    for question in range(2, 10):
+        columns += ['COVID24A%dTXT1' % question, 'COVID24A%dTXT2' % question]
+    return columns + ['COVID24A10TXT%d' % line for line in range(1, 11)]
+
+def hardcodedColumns(path=hardcoded_file):
+    with codecs.open(path, 'r', encoding="iso-8859-1", errors='ignore') as f:
+        return [line.split("\t")[0].strip() for line in f if line.strip() != ""]
+
+
+class QuestionnaireGenerator:
+    def __init__(self, seed=0, pool_size=20000, drugs=None):
+        self.rng = np.random.default_rng(seed)
+        drugs = readDrugNames() if drugs is None else drugs
+        self.names = np.concatenate([drugs['Name'].to_numpy(dtype=object), drugs['label'].to_numpy(dtype=object)])
+        self.pool = np.array([self.answer() for i in range(pool_size)], dtype=object)
+        #Zipf-like frequencies: the answer at rank r is drawn with a probability proportional to 1 / r^1.1
+        weights = 1.0 / np.arange(1, pool_size + 1) ** 1.1
+        self.frequencies = weights / weights.sum()
+
+    def choice(self, values):
+        return values[self.rng.integers(len(values))]
+
+    def typo(self, word):
+        if len(word) < 4:
+            return word
+        position = int(self.rng.integers(1, len(word) - 1))
+        kind = self.rng.integers(3)
+        if kind == 0:
+            return word[:position] + word[position + 1:]
+        if kind == 1:
+            return word[:position] + word[position] + word[position:]
+        return word[:position - 1] + word[position] + word[position - 1] + word[position + 1:]
+
+    def drug(self):
+        name = self.choice(self.names)
+        noise = self.rng.random(6)
+        if noise[0] < 0.3:
+            name = name.capitalize()
+        elif noise[0] < 0.35:
+            name = name.upper()
+        if noise[1] < 0.1:
+            name = self.typo(name)
+        if noise[2] < 0.5:
+            name += " " + self.choice(dosages)
+        if noise[3] < 0.25:
+            name += " " + self.choice(forms)
+        if noise[4] < 0.15:
+            name += " " + self.choice(manufacturers)
+        if noise[5] < 0.1:
+            name += " " + self.choice(fill_words)
+        return name
+
+    def answer(self):
+        if self.rng.random() < 0.02:
+            return self.choice(empty_codes)
+        drugs = [self.drug() for i in range(int(self.rng.choice([1, 1, 1, 2, 2, 3])))]
+        text = drugs[0]
+        for drug in drugs[1:]:
+            text += self.choice(separators) + drug
+        return text
+
+    def answers(self, rows, filled):
+        #A column of answers of the pool, a share of "filled" of the fields is not empty
+        values = self.pool[self.rng.choice(len(self.pool), size=rows, p=self.frequencies)]
+        values[self.rng.random(rows) >= filled] = np.nan
+        return values
+
+    def week(self, rows, hardcoded=(), extra_columns=50, selected=0.05):
+        #The table of one week: ID, multiple choice columns, free text columns and other columns
+        columns = {'PSEUDOIDEXT': np.char.add("LL", self.rng.permutation(rows * 10)[:rows].astype(str))}
+        for name in hardcoded:
+            flags = np.where(self.rng.random(rows) < selected, "1", "0").astype(object)
+            flags[self.rng.random(rows) < 0.1] = np.nan
+            columns[name] = flags
+        for name in freeTextColumns():
+            question, line = name[len('COVID24A'):].split('TXT')
+            #the first field of a question is filled more often than the next ones
+            columns[name] = self.answers(rows, 0.3 / int(line) if question != '10' else 0.2 / int(line))
+        for number in range(extra_columns):
+            columns['COVID%dX%d' % (number // 10, number % 10)] = self.rng.integers(1, 6, rows).astype(str)
+        return pd.DataFrame(columns)
+
+    def writeWeek(self, path, rows, hardcoded=(), extra_columns=50):
+        self.week(rows, hardcoded, extra_columns).to_csv(path, sep="\t", index=False, encoding=questionnaire_reader.encoding, errors="replace")
+
+
+class SortaGenerator:
+    def __init__(self, seed=0, rainbowtable_path=rainbowtable_file, drugs=None):
+        self.rng = np.random.default_rng(seed)
+        drugs = readDrugNames() if drugs is None else drugs
+        index = AtcIndex.open(rainbowtable_path)
+        self.iris = np.array([iri.decode("utf-8") for iri in index.iris], dtype=object)
+        #the URI of each drug name (Dutch name or English label) that is in the rainbowtable
+        self.drugs = {}
+        for name, label in zip(drugs['Name'], drugs['label']):
+            for iri in [umcgIri(name), umcgIri(label)]:
+                if index.ids([iri])[0] >= 0:
+                    self.drugs[name.lower()] = (name, iri)
+                    self.drugs[label.lower()] = (label, iri)
+                    break
+
+    def match(self, name):
+        #(ontologyTermName, ontologyTermIRI, score) for a Name
+        words = str(name).lower().split()
+        #the drug names have up to three words
+        for length in (3, 2, 1):
+            for start in range(len(words) - length + 1):
+                drug = self.drugs.get(" ".join(words[start:start + length]))
+                if drug is not None:
+                    return drug[0], drug[1], round(float(self.rng.uniform(80, 100)), 2)
+        if self.rng.random() < 0.15:
+            return None, None, 0.0
+        iri = self.choice(self.iris)
+        return iri.rsplit("/", 1)[-1][:12], iri, round(float(self.rng.uniform(30, 80)), 2)
+
+    def choice(self, values):
+        return values[self.rng.integers(len(values))]
+
+    def results(self, df):
+        #The SORTA export for an anonymous table (Name and Synonym)
+        matches = {name: self.match(name) for name in pd.unique(df['Name'])}
+        found = [matches[name] for name in df['Name']]
+        scores = np.array([score for term, iri, score in found], dtype=float)
+        return pd.DataFrame({'Name': df['Name'], 'Synonym': df['Synonym'],
+                             'ontologyTermName': [term for term, iri, score in found],
+                             'ontologyTermIRI': [iri for term, iri, score in found],
+                             'score': scores, 'review': scores < 80, 'validated': False})
+
+    def writeResults(self, anonymous_file, output=None):
+        df = pd.read_csv(anonymous_file, sep=";", dtype=str, keep_default_na=False)
+        output = output or outputFile(anonymous_file)
+        self.results(df).to_csv(output, sep=";", index=False)
+        return output
+
+
+class SyntheticData:
+    def __init__(self):
+        parser = OptionParser(usage="%prog [options] | --sorta anonymous files or patterns")
+        parser.add_option("-n","--rows", type="int", default=10000, help="number of participants per week (default: 10000)")
+        parser.add_option("-w","--weeks", type="int", default=1, help="number of week files (default: 1)")
+        parser.add_option("-o","--output", default=".", help="directory for the week files (default: .)")
+        parser.add_option("-p","--pool", type="int", default=20000, help="number of distinct answers (default: 20000)")
+        parser.add_option("-x","--extra-columns", type="int", default=50, help="number of other columns (default: 50)")
+        parser.add_option("-s","--seed", type="int", default=0, help="seed of the random numbers (default: 0)")
+        parser.add_option("--sorta", action="store_true", help="create SORTA results for the given anonymous files instead of week files")
+        (options, args) = parser.parse_args()
+
+        if options.sorta:
+            generator = SortaGenerator(options.seed)
+            for argument in args:
+                for path in sorted(glob.glob(argument)) or [argument]:
+                    print(generator.writeResults(path))
+            return
+
+        os.makedirs(options.output, exist_ok=True)
+        hardcoded = hardcodedColumns()
+        for week in range(1, options.weeks + 1):
+            generator = QuestionnaireGenerator(options.seed + week, options.pool)
+            path = os.path.join(options.output, "covid19-week%d-1.dat" % week)
+            generator.writeWeek(path, options.rows, hardcoded, options.extra_columns)
+            print(path)
+
+
+if __name__ == '__main__':
+    SyntheticData()
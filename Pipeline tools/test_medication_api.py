@@ -0,0 +1,43 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# Checks that the functions of medication_api.py can be chained like the steps 2-4: split -> match -> matchBack.
+# Run with: python -m pytest "Pipeline tools/test_medication_api.py"
+# Without the punkt model of NLTK the answers are tokenized without sentence splitting (like the option --without-punkt),
+# the answers of the test have no sentences.
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import pytest
+import medication_api
+
+
+@pytest.fixture(autouse=True)
+def tokenizer():
+    resources = medication_api.extract_drugs4.resources
+    try:
+        resources.word_tokenizer()
+    except LookupError:
+        resources.allowLineTokenizer()
+
+
+def test_split_match_matchBack():
+    answers = ["paracetamol 500mg, omeprazol", "ibuprofen", "9999"]
+    terms = medication_api.split(answers)
+    assert list(terms.columns) == ['answer', 'Original', 'Name']
+    assert set(terms['Name']) == {'paracetamol', 'omeprazol', 'ibuprofen'}
+
+    atc_codes = medication_api.match(terms)
+    assert set(atc_codes['Synonym']) == set(terms['Original'])
+
+    final = medication_api.matchBack(terms, atc_codes)
+    assert final.columns.is_unique
+    assert 'Name_matched' in final.columns
+    assert final['Atccode'].notna().all()
+    codes = set(final.loc[final['answer'] == "paracetamol 500mg, omeprazol", 'Atccode'])
+    assert {'N02BE01', 'A02BC01'} <= codes
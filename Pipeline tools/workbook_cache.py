@@ -0,0 +1,208 @@
+# -*- coding: cp1252 -*-
+__author__ = "alexander kellmann"
+__license__ = "LGPL-3.0 License"
+__date__ = "18/10/2026"
+
+# Description:
+#
+# This module keeps the Excel files of the reference data (e.g. "ATC_codes_from_sfk.xlsx" and "ATC Levels.xlsx") as columns of
+# numpy files, so they are parsed only once.
+#
+# Reading an Excel file takes a few seconds each time, although the files change rarely. The first time a workbook is opened,
+# all its sheets are read (openpyxl in read only mode) and each column is saved in the directory "<workbook>.cache/<hash>", named
+# after the sha256 hash of the workbook:
+# - numbers:  int64 (or float64 if a cell is empty or not a whole number), <sheet>_<column>.npy
+# - texts:    the texts of all cells in utf-8, separated by "\0" (uint8), and a mask of the empty cells
+# - meta.json the sha256 hash of the workbook, the names of the sheets and columns and the type of each column
+# Empty rows are not kept.
+#
+# WorkbookCache.open() builds the cache if it doesn't exist or the hash of the workbook has changed, otherwise only meta.json is
+# read. The columns are loaded when they are used (memory-mapped), so opening a workbook and reading a column takes milliseconds.
+#
+# Several processes may open the workbook at the same time (e.g. the workers of pipeline_runner.py) while others memory-map its
+# columns. The files of a cache are therefore never written in place: a new cache is built in a temporary directory of its own
+# process and renamed to "<hash>" when it is complete. If another process was faster, its cache is used and the own one is
+# removed. The caches of older versions of the workbook are removed as well (processes that still map them keep their files).
+#
+# Example:
+# sheet = WorkbookCache.open("ATC Levels.xlsx").sheet("Tabelle1")
+# labels = sheet.column("Preferred Label")          #numpy array (object, None for empty cells)
+# df = sheet.frame(["Class ID", "ATC LEVEL"])       #like pd.read_excel(..., usecols=[...])
+
+import hashlib
+import json
+import numbers
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+
+def fileHash(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def columnType(values):
+    #int, float or text: the type pandas would give the column (bool cells are texts)
+    kinds = set()
+    for value in values:
+        if value is None:
+            kinds.add("empty")
+        elif isinstance(value, bool) or not isinstance(value, numbers.Number):
+            return "text"
+        elif isinstance(value, numbers.Integral):
+            kinds.add("int")
+        else:
+            kinds.add("float")
+    return "int" if kinds == {"int"} else "float" if kinds - {"empty"} else "text"
+
+def cellText(value):
+    #Whole numbers in a text column are written without ".0"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class WorkbookSheet:
+    def __init__(self, cache_dir, prefix, columns, types, rows):
+        self.cache_dir = cache_dir
+        self.prefix = prefix
+        self.columns = columns
+        self.types = types
+        self.rows = rows
+        self.loaded = {}
+
+    def __len__(self):
+        return self.rows
+
+    def path(self, index, suffix):
+        return os.path.join(self.cache_dir, "%s_%d%s.npy" % (self.prefix, index, suffix))
+
+    def column(self, name):
+        #The values of a column: int64 or float64 (memory-mapped), or an object array of str with None for empty cells
+        if name not in self.loaded:
+            index = self.columns.index(name)
+            if self.types[index] == "text":
+                data = np.load(self.path(index, ".text"), mmap_mode='r')
+                empty = np.load(self.path(index, ".empty"))
+                values = np.array(data.tobytes().decode("utf-8").split("\0") if self.rows else [], dtype=object)
+                values[empty] = None
+                self.loaded[name] = values
+            else:
+                self.loaded[name] = np.load(self.path(index, ""), mmap_mode='r')
+        return self.loaded[name]
+
+    def frame(self, columns=None):
+        #The sheet (or a few columns of it) as a DataFrame, empty cells are NaN
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({name: self.column(name) for name in columns}, columns=columns).fillna(np.nan)
+
+    def rowsOf(self, columns):
+        #The values of the columns row by row
+        return zip(*[self.column(name) for name in columns])
+
+    @staticmethod
+    def save(cache_dir, prefix, rows):
+        #Saves the rows (the first one are the names of the columns), returns the description of the sheet for meta.json
+        rows = iter(rows)
+        header = next(rows, ())
+        columns = [cellText(value).strip() if value is not None else "Unnamed: %d" % index for index, value in enumerate(header)]
+        cells = [[] for name in columns]
+        count = 0
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            count += 1
+            for index in range(len(columns)):
+                cells[index].append(row[index] if index < len(row) else None)
+        types = []
+        for index, values in enumerate(cells):
+            kind = columnType(values)
+            path = os.path.join(cache_dir, "%s_%d" % (prefix, index))
+            if kind == "int":
+                np.save(path + ".npy", np.array(values, dtype=np.int64))
+            elif kind == "float":
+                np.save(path + ".npy", np.array([np.nan if value is None else value for value in values], dtype=np.float64))
+            else:
+                text = "\0".join("" if value is None else cellText(value) for value in values)
+                np.save(path + ".text.npy", np.frombuffer(text.encode("utf-8"), dtype=np.uint8))
+                np.save(path + ".empty.npy", np.array([value is None for value in values], dtype=bool))
+            types.append(kind)
+        return {"prefix": prefix, "columns": columns, "types": types, "rows": count}
+
+
+class WorkbookCache:
+    def __init__(self, cache_dir, meta):
+        self.cache_dir = cache_dir
+        self.sheet_names = [sheet["name"] for sheet in meta["sheets"]]
+        self.sheets = {sheet["name"]: WorkbookSheet(cache_dir, sheet["prefix"], sheet["columns"], sheet["types"], sheet["rows"])
+                       for sheet in meta["sheets"]}
+
+    def sheet(self, name=0):
+        #A sheet by its name or its position (like sheet_name of pd.read_excel)
+        if isinstance(name, int):
+            name = self.sheet_names[name]
+        return self.sheets[name]
+
+    @staticmethod
+    def build(workbook_path, cache_dir, source_hash):
+        #Builds the cache in a temporary directory and renames it to cache_dir/<hash> (the cache of another process is kept)
+        version_dir = os.path.join(cache_dir, source_hash)
+        build_dir = "%s.tmp%d" % (version_dir, os.getpid())
+        shutil.rmtree(build_dir, ignore_errors=True)
+        os.makedirs(build_dir)
+        try:
+            workbook = load_workbook(workbook_path, read_only=True)
+            try:
+                sheets = []
+                for number, worksheet in enumerate(workbook.worksheets):
+                    sheet = WorkbookSheet.save(build_dir, "sheet%d" % number, worksheet.iter_rows(values_only=True))
+                    sheet["name"] = worksheet.title
+                    sheets.append(sheet)
+            finally:
+                workbook.close()
+            meta = {"sha256": source_hash, "workbook": os.path.basename(workbook_path), "sheets": sheets}
+            with open(os.path.join(build_dir, "meta.json"), 'w') as f:
+                json.dump(meta, f)
+            try:
+                os.rename(build_dir, version_dir)
+            except OSError:
+                if not os.path.isfile(os.path.join(version_dir, "meta.json")):
+                    raise
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+        #the caches of older versions of the workbook
+        for name in os.listdir(cache_dir):
+            if name != source_hash and ".tmp" not in name:
+                path = os.path.join(cache_dir, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        return WorkbookCache.readMeta(version_dir)
+
+    @staticmethod
+    def readMeta(version_dir):
+        with open(os.path.join(version_dir, "meta.json")) as f:
+            return json.load(f)
+
+    @classmethod
+    def open(cls, workbook_path, cache_dir=None):
+        #Opens the cache of the workbook, it is built if the workbook has changed
+        if cache_dir is None:
+            cache_dir = workbook_path + ".cache"
+        source_hash = fileHash(workbook_path)
+        version_dir = os.path.join(cache_dir, source_hash)
+        try:
+            return cls(version_dir, cls.readMeta(version_dir))
+        except (OSError, ValueError):
+            pass
+        print("building the cache of " + workbook_path)
+        return cls(version_dir, cls.build(workbook_path, cache_dir, source_hash))